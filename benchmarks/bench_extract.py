@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: HTML extraction on multi-megabyte profile pages.
+
+Compares the legacy character-loop shortcode scan (on decoded text) with
+the compiled-regex scan on raw bytes, and times the embedded-JSON path that
+recovers real post data from window._sharedData.
+
+Run with:
+- python -m benchmarks.bench_extract [--sizes-mb 1,4,8] [--links 3000]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable
+
+from src.utils.request_handler import RequestHandler, _unique_shortcodes
+
+from .corpus import profile_html
+from .legacy_extract import legacy_shortcodes
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes-mb", default="1,4,8")
+    ap.add_argument("--links", type=int, default=3000, help="distinct /p/ links per page")
+    ap.add_argument("--posts", type=int, default=12, help="posts in the embedded JSON blob")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    rh = RequestHandler({"mock": False})
+    print(f"{'page MB':>8}{'legacy scan ms':>16}{'regex scan ms':>15}{'speedup':>9}{'embedded ms':>13}")
+    for size in (float(x) for x in args.sizes_mb.split(",")):
+        page = profile_html("bench", args.posts, pad_bytes=int(size * 1024 * 1024))
+        # Spread many distinct links through the filler, as on real pages
+        links = "".join(f'<a href="/p/L{i:07d}/">' for i in range(args.links))
+        page = page.replace("<main>", "<main>" + links, 1)
+        text_page = page.replace("window._sharedData", "window._noData")
+        raw = text_page.encode("utf-8")
+
+        legacy = _best(lambda: legacy_shortcodes(text_page, None), args.repeat)
+        regex = _best(lambda: list(_unique_shortcodes(raw)), args.repeat)
+        assert legacy_shortcodes(text_page, None) == list(_unique_shortcodes(raw))
+        embedded = _best(lambda: rh._extract_from_html(page.encode("utf-8"), "bench", None), args.repeat)
+        print(f"{len(raw) / 2**20:>8.1f}{legacy * 1000:>16.1f}{regex * 1000:>15.1f}{legacy / regex:>8.1f}x{embedded * 1000:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Media download stage against two local static file servers ("CDN hosts"
+with per-request latency). Compares a serial downloader that buffers each
+body and saves one file per post and field with MediaDownloader (pooled,
+streaming, per-host limits, content-addressed), then checks a warm re-run
+against the manifest and resuming of transfers cut off halfway.
+
+Run with:
+- python -m benchmarks.bench_media [--posts 600] [--images 200] [--size 150000] [--latency 0.02]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+from src.utils.media_downloader import MediaDownloader
+
+from .static_server import StaticFileServer
+
+def _corpus(args: argparse.Namespace) -> Tuple[List[Dict[str, bytes]], List[Tuple[int, int, str]]]:
+    """
+    Files for two hosts plus (host, image, kind) per post. Posts outnumber
+    images, so images repeat across posts (reposts), and every tenth image
+    is also published under a second URL with the same bytes.
+    """
+    rng = random.Random(7)
+    hosts: List[Dict[str, bytes]] = [{}, {}]
+    for i in range(args.images):
+        body = rng.randbytes(args.size)
+        host = hosts[i % 2]
+        host[f"/m/{i}.jpg"] = body
+        host[f"/t/{i}.jpg"] = body[: args.size // 10]
+        if i % 10 == 0:
+            host[f"/alias/{i}.jpg"] = body
+    posts = [(i % 2, i, "alias" if i % 10 == 0 and n % 2 else "m") for n in range(args.posts) for i in [rng.randrange(args.images)]]
+    return hosts, posts
+
+def _rows(posts: List[Tuple[int, int, str]], servers: List[StaticFileServer]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": f"post{n}",
+            "username": "bench",
+            "displayUrl": f"{servers[h].base_url}/{kind}/{i}.jpg",
+            "thumbnailUrl": f"{servers[h].base_url}/t/{i}.jpg",
+        }
+        for n, (h, i, kind) in enumerate(posts)
+    ]
+
+def _serial(rows: List[Dict[str, Any]], out: Path) -> None:
+    out.mkdir(parents=True, exist_ok=True)
+    with requests.Session() as s:
+        for row in rows:
+            for field in ("displayUrl", "thumbnailUrl"):
+                resp = s.get(row[field], timeout=15)
+                resp.raise_for_status()
+                (out / f"{row['id']}_{field}.jpg").write_bytes(resp.content)
+
+def _pooled(rows: List[Dict[str, Any]], root: Path, args: argparse.Namespace) -> Dict[str, int]:
+    settings = {
+        "media_dir": "media",
+        "media_concurrency": args.concurrency,
+        "media_per_host": args.per_host,
+        "retry_backoff_base": 0.05,
+    }
+    with MediaDownloader(settings, root) as media:
+        media.submit(rows)
+    return media.stats()
+
+def _disk(path: Path) -> Tuple[int, int]:
+    files = [p for p in path.rglob("*") if p.is_file() and p.suffix == ".jpg"]
+    return len(files), sum(p.stat().st_size for p in files)
+
+def _verify(root: Path, hosts: List[Dict[str, bytes]]) -> int:
+    """Count stored files whose content does not hash to their name (should be 0)."""
+    bad = 0
+    for p in (root / "media" / "objects").rglob("*.jpg"):
+        if hashlib.sha256(p.read_bytes()).hexdigest() != p.stem:
+            bad += 1
+    return bad
+
+def _servers(hosts: List[Dict[str, bytes]], args: argparse.Namespace, cut_after: int = 0) -> List[StaticFileServer]:
+    return [StaticFileServer(files, latency=args.latency, cut_after=cut_after).start() for files in hosts]
+
+def _report(label: str, seconds: float, servers: List[StaticFileServer], disk: Tuple[int, int], extra: str = "") -> None:
+    requests_ = sum(s.requests for s in servers)
+    sent = sum(s.bytes_sent for s in servers) / 1e6
+    peak = max(s.max_active for s in servers)
+    print(f"{label:<22}{seconds:>8.2f}s{requests_:>10}{sent:>10.1f}{disk[0]:>8}{disk[1] / 1e6:>10.1f}{peak:>6}  {extra}")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--posts", type=int, default=600)
+    ap.add_argument("--images", type=int, default=200)
+    ap.add_argument("--size", type=int, default=150_000)
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--per-host", type=int, default=4)
+    args = ap.parse_args()
+
+    hosts, posts = _corpus(args)
+    print(f"{args.posts} posts, {args.images} images of {args.size:,} bytes on 2 hosts, {args.latency * 1000:.0f} ms latency\n")
+    print(f"{'':<22}{'time':>9}{'requests':>10}{'MB sent':>10}{'files':>8}{'MB disk':>10}{'peak':>6}")
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+
+        servers = _servers(hosts, args)
+        rows = _rows(posts, servers)
+        t0 = time.perf_counter()
+        _serial(rows, root / "serial")
+        _report("serial, buffered", time.perf_counter() - t0, servers, _disk(root / "serial"))
+        for s in servers:
+            s.stop()
+
+        servers = _servers(hosts, args)
+        rows = _rows(posts, servers)
+        t0 = time.perf_counter()
+        stats = _pooled(rows, root, args)
+        _report("pooled, cold", time.perf_counter() - t0, servers, _disk(root / "media"),
+                f"dedup={stats.get('deduplicated', 0)} reused={stats.get('reused', 0)}")
+        for s in servers:
+            s.requests = s.bytes_sent = s.max_active = 0
+        t0 = time.perf_counter()
+        _pooled(rows, root, args)
+        _report("pooled, warm re-run", time.perf_counter() - t0, servers, _disk(root / "media"))
+        for s in servers:
+            s.stop()
+
+        resume_root = root / "resume"
+        servers = _servers(hosts, args, cut_after=args.size // 2)
+        rows = _rows(posts, servers)
+        t0 = time.perf_counter()
+        stats = _pooled(rows, resume_root, args)
+        _report("pooled, cut off once", time.perf_counter() - t0, servers, _disk(resume_root / "media"),
+                f"resumed={stats.get('resumed', 0)} failed={stats.get('failed', 0)} "
+                f"bad hashes={_verify(resume_root, hosts)}")
+        for s in servers:
+            s.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: posts/second of the plan-based normalize_posts against the
+legacy enrich-then-normalize pipeline, per payload shape.
+
+Run with:
+- python -m benchmarks.bench_normalize [--posts 20000] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import time
+from typing import Any, Callable, Dict, List
+
+from src.extractors.profile_posts_parser import normalize_posts
+
+from .corpus import SHAPES, raw_posts
+from .legacy_normalize import legacy_pipeline
+
+def _best_rate(fn: Callable[[str, List[Dict[str, Any]]], Any], corpus: List[Dict[str, Any]], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # The legacy path mutates its input, so every round gets fresh copies
+        data = copy.deepcopy(corpus)
+        t0 = time.perf_counter()
+        fn("bench", data)
+        best = min(best, time.perf_counter() - t0)
+    return len(corpus) / best
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--posts", type=int, default=20_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"{'shape':<10}{'legacy posts/s':>16}{'plan posts/s':>16}{'speedup':>10}")
+    for shape in SHAPES:
+        corpus = raw_posts(shape, args.posts)
+        plan = _best_rate(normalize_posts, corpus, args.repeat)
+        try:
+            legacy = _best_rate(legacy_pipeline, corpus, args.repeat)
+        except Exception as e:
+            # e.g. v1 items: the old code did `"video" in media_type` on an int
+            print(f"{shape:<10}{'fails (' + type(e).__name__ + ')':>16}{plan:>16,.0f}{'-':>10}")
+            continue
+        print(f"{shape:<10}{legacy:>16,.0f}{plan:>16,.0f}{plan / legacy:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
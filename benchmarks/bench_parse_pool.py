@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Scaling benchmark for the process-pool parse stage: profiles/second of
+normalize as `parse_workers` grows, using the same marshal batches the
+Runner sends. Pages are decoded up front, as the fetchers do; the decode
+time per page is printed for comparison.
+
+Run with:
+- python -m benchmarks.bench_parse_pool [--workers 1,2,4,8,16] [--pages 512]
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.extractors.batch_parser import decode_results, encode_batch, init_worker, parse_batch
+from src.utils.request_handler import RequestHandler
+
+from .corpus import profile_html
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", default="1,2,4,8,16")
+    ap.add_argument("--profiles", type=int, default=512)
+    ap.add_argument("--posts", type=int, default=50, help="posts embedded per page")
+    ap.add_argument("--pad-kb", type=int, default=300)
+    ap.add_argument("--batch-size", type=int, default=16)
+    args = ap.parse_args()
+
+    # A handful of distinct pages reused round-robin keeps generation cheap
+    pages = [profile_html(f"user{i}", args.posts, pad_bytes=args.pad_kb * 1024).encode("utf-8") for i in range(8)]
+    rh = RequestHandler({"mock": False})
+    t0 = time.perf_counter()
+    posts = [rh._extract_from_html(page, f"user{i}", None) for i, page in enumerate(pages)]
+    print(f"decode: {(time.perf_counter() - t0) / len(pages) * 1000:.2f} ms/page on the fetching thread")
+    items = [(f"user{i}", posts[i % len(posts)]) for i in range(args.profiles)]
+    blobs = [encode_batch(items[i:i + args.batch_size]) for i in range(0, len(items), args.batch_size)]
+    ctx = multiprocessing.get_context("spawn")
+
+    print(f"{'workers':>8}{'profiles/s':>12}{'posts/s':>14}{'scaling':>10}")
+    base = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=init_worker,
+                                 initargs=({"mock": False},)) as pool:
+            # Warm up so worker start-up is not timed
+            list(pool.map(parse_batch, blobs[:workers]))
+            t0 = time.perf_counter()
+            rows = sum(len(result) for blob in pool.map(parse_batch, blobs) for _, _, result in decode_results(blob))
+            seconds = time.perf_counter() - t0
+        rate = args.profiles / seconds
+        base = base or rate
+        print(f"{workers:>8}{rate:>12,.0f}{rows / seconds:>14,.0f}{rate / base:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
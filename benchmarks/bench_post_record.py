@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Memory and throughput of Post records against the 21-key row dicts they
+replaced: bytes held per row, construction and normalize rate, export rate
+per format (against the old dict-copying writers) and the marshal round
+trip used by the process-pool parse stage.
+
+Run with:
+- python -m benchmarks.bench_post_record [--rows 200000] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gc
+import io
+import json
+import marshal
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from src.extractors.profile_posts_parser import normalize_posts
+from src.utils.json_exporter import CSV_COLUMNS, CsvWriter, NdjsonWriter
+from src.utils.post_record import POST_FIELDS, Post
+from src.utils.serialization import get_codec
+
+from .corpus import raw_posts
+
+def _held_bytes(build: Callable[[], List[Any]]) -> int:
+    """Bytes still allocated while the result of build() is alive."""
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    rows = build()
+    held = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del rows
+    return held
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _legacy_csv(rows: List[Dict[str, Any]]) -> None:
+    # The exporter before Post: DictWriter plus a copy of every row
+    w = csv.DictWriter(io.StringIO(), fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    w.writeheader()
+    for r in rows:
+        r2 = dict(r)
+        if isinstance(r2.get("taggedUsers"), (list, dict)):
+            r2["taggedUsers"] = json.dumps(r2["taggedUsers"], ensure_ascii=False)
+        w.writerow(r2)
+
+def _legacy_ndjson(rows: List[Dict[str, Any]]) -> None:
+    fh = io.StringIO()
+    for r in rows:
+        fh.write(json.dumps(r, ensure_ascii=False))
+        fh.write("\n")
+
+class _MemoryWriter:
+    """Run a RowWriter's per-row path against an in-memory buffer."""
+
+    def __init__(self, cls: type):
+        self.w = cls.__new__(cls)
+        self.w._fh = io.StringIO()
+        self.w.append = False
+        self.w.rows_written = 0
+        self.w.codec = get_codec("stdlib")
+        if cls is CsvWriter:
+            self.w.columns = tuple(CSV_COLUMNS)
+        self.w._open()
+
+    def write(self, rows: List[Any]) -> None:
+        for r in rows:
+            self.w._write(r)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    raw = raw_posts("mock", args.rows)
+    posts = normalize_posts("bench", raw)
+    dicts = [p.as_dict() for p in posts]
+
+    # Values (strings, tag lists) are shared, so this isolates container overhead
+    mem_posts = _held_bytes(lambda: [Post.from_tuple(p.as_tuple()) for p in posts])
+    mem_dicts = _held_bytes(lambda: [p.as_dict() for p in posts])
+    print(f"{'memory per row':<24}{mem_dicts / args.rows:>12,.0f} B dict{mem_posts / args.rows:>12,.0f} B Post"
+          f"{mem_dicts / max(mem_posts, 1):>9.2f}x")
+
+    values = [p.as_tuple() for p in posts]
+    t_dict = _best(lambda: [dict(zip(POST_FIELDS, v)) for v in values], args.repeat)
+    t_post = _best(lambda: [Post(*v) for v in values], args.repeat)
+    print(f"{'construct rows/s':<24}{args.rows / t_dict:>14,.0f} dict{args.rows / t_post:>14,.0f} Post"
+          f"{t_dict / t_post:>7.2f}x")
+    t_post = _best(lambda: normalize_posts("bench", raw), args.repeat)
+    print(f"{'normalize rows/s':<24}{'':>19}{args.rows / t_post:>14,.0f} Post")
+
+    for name, cls, legacy in (("csv", CsvWriter, _legacy_csv), ("ndjson", NdjsonWriter, _legacy_ndjson)):
+        t_old = _best(lambda: legacy(dicts), args.repeat)
+        t_new = _best(lambda: _MemoryWriter(cls).write(posts), args.repeat)
+        print(f"{'export ' + name + ' rows/s':<24}{args.rows / t_old:>14,.0f} dict{args.rows / t_new:>14,.0f} Post"
+              f"{t_old / t_new:>7.2f}x")
+
+    t_old = _best(lambda: marshal.loads(marshal.dumps(dicts)), args.repeat)
+    t_new = _best(lambda: [Post.from_tuple(t) for t in marshal.loads(marshal.dumps([p.as_tuple() for p in posts]))],
+                  args.repeat)
+    size_old = len(marshal.dumps(dicts))
+    size_new = len(marshal.dumps([p.as_tuple() for p in posts]))
+    print(f"{'marshal rows/s':<24}{args.rows / t_old:>14,.0f} dict{args.rows / t_new:>14,.0f} Post"
+          f"{t_old / t_new:>7.2f}x")
+    print(f"{'marshal bytes per row':<24}{size_old / args.rows:>14,.0f} dict{size_new / args.rows:>14,.0f} Post"
+          f"{size_old / size_new:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
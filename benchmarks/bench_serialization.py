@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+JSON codec throughput on rows shaped like data/sample_output.json, for
+every installed backend (stdlib, orjson, msgspec): compact and indent=2
+encode, NDJSON line decode, and the primary + latest.json export path
+with and without the shared encoding in TeeWriter. Also measures how long
+the lazy input reader takes to produce the first username and all of
+them, against loading the whole list up front.
+
+Run with:
+- python -m benchmarks.bench_serialization [--rows 100000] [--usernames 1000000] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+from src.extractors.profile_posts_parser import normalize_posts
+from src.utils.input_reader import iter_usernames
+from src.utils.json_exporter import JsonArrayWriter, NdjsonWriter, TeeWriter
+from src.utils.serialization import JsonCodec, get_codec
+
+from .corpus import raw_posts
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _codecs() -> List[JsonCodec]:
+    out = []
+    for name in ("stdlib", "orjson", "msgspec"):
+        try:
+            out.append(get_codec(name))
+        except RuntimeError:
+            print(f"({name} not installed; skipped)")
+    return out
+
+def _export(posts: List[Any], codec: JsonCodec, shared: bool, tmp: Path) -> None:
+    # ndjson output + compact latest.json: TeeWriter encodes once when both share the codec
+    latest_codec = codec if shared else type(codec)()
+    with TeeWriter([NdjsonWriter(tmp / "o.ndjson", codec=codec),
+                    JsonArrayWriter(tmp / "latest.json", indent=None, codec=latest_codec)]) as w:
+        for i in range(0, len(posts), 12):
+            w.write_rows(posts[i:i + 12])
+
+def _bench_codecs(args: argparse.Namespace) -> None:
+    posts = normalize_posts("bench", raw_posts("mock", args.rows))
+    rows = [p.as_dict() for p in posts]
+    mb = len(get_codec("stdlib").dumps(rows).encode("utf-8")) / 1e6
+    print(f"{args.rows:,} rows, {mb:.1f} MB compact\n")
+    print(f"{'codec':<10}{'encode':>12}{'encode i2':>12}{'decode':>12}{'export':>12}{'shared':>12}   (rows/s)")
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        for codec in _codecs():
+            lines = [codec.dumps(r) for r in rows]
+            t_enc = _best(lambda: [codec.dumps(r) for r in rows], args.repeat)
+            t_ind = _best(lambda: [codec.dumps(r, 2) for r in rows], args.repeat)
+            t_dec = _best(lambda: [codec.loads(line) for line in lines], args.repeat)
+            t_exp = _best(lambda: _export(posts, codec, False, tmp), args.repeat)
+            t_shr = _best(lambda: _export(posts, codec, True, tmp), args.repeat)
+            print(f"{codec.name:<10}" + "".join(f"{args.rows / t:>12,.0f}" for t in (t_enc, t_ind, t_dec, t_exp, t_shr)))
+
+def _bench_input(args: argparse.Namespace) -> None:
+    names = [f"user_{i:08d}" for i in range(args.usernames)]
+    print(f"\n{args.usernames:,} usernames{'first':>12}{'all':>12}   (seconds)")
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        (tmp / "u.json").write_text(json.dumps(names, indent=2), encoding="utf-8")
+        (tmp / "u.ndjson").write_text("".join(json.dumps(n) + "\n" for n in names), encoding="utf-8")
+        (tmp / "u.txt").write_text("".join(n + "\n" for n in names), encoding="utf-8")
+
+        def load_whole() -> Any:
+            with (tmp / "u.json").open(encoding="utf-8") as f:
+                return iter(json.load(f))
+
+        cases = [("json.load", load_whole)] + [
+            (f"lazy {p.suffix[1:]}", lambda p=p: iter_usernames(p)) for p in (tmp / "u.json", tmp / "u.ndjson", tmp / "u.txt")
+        ]
+        for label, make in cases:
+            t_first = _best(lambda: next(make()), args.repeat)
+            t_all = _best(lambda: sum(1 for _ in make()), args.repeat)
+            print(f"{label:<22}{t_first:>12.4f}{t_all:>12.3f}")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--usernames", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    _bench_codecs(args)
+    _bench_input(args)
+
+if __name__ == "__main__":
+    main()
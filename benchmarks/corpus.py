@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic synthetic corpora for benchmarks. Every generator takes a
+seed, so two runs with the same arguments produce identical data.
+"""
+from __future__ import annotations
+
+import json
+import random
+import zlib
+from typing import Any, Callable, Dict, List
+
+from src.utils.request_handler import RequestHandler
+
+SHAPES = ("mock", "graphql", "v1")
+
+_FIRST = ("Kris", "John", "Ana", "Mei", "Omar", "Lena", "Ravi", "Zoe")
+_LAST = ("Jenner", "Doe", "Silva", "Chen", "Haddad", "Berg", "Iyer", "Park")
+_PLACES = ("Menlo Park", "Lisbon", "Osaka", "Nairobi", "Reykjavik", "Austin")
+
+def _user(rng: random.Random) -> Dict[str, str]:
+    first, last = rng.choice(_FIRST), rng.choice(_LAST)
+    handle = f"{first}{last}".lower()
+    return {"full_name": f"{first} {last}", "username": handle, "profile_pic_url": f"https://cdn.example.com/{handle}.jpg"}
+
+def _location(rng: random.Random) -> Dict[str, Any] | None:
+    if rng.random() < 0.6:
+        return None
+    name = rng.choice(_PLACES)
+    return {"id": str(zlib.crc32(name.encode("utf-8"))), "name": name, "slug": name.lower().replace(" ", "-"), "has_public_page": True}
+
+def _mock_post(rng: random.Random, username: str, i: int, ts: int) -> Dict[str, Any]:
+    short = f"SYN{i:08d}"
+    video = rng.random() < 0.2
+    loc = _location(rng) or {"id": None, "name": None, "slug": None, "has_public_page": None}
+    return {
+        "id": RequestHandler._deterministic_id(username, i),
+        "shortcode": short,
+        "caption": f"Synthetic post {i} by @{username} #bench",
+        "timestamp": ts,
+        "likes": rng.randint(0, 200_000),
+        "comments": rng.randint(0, 5_000),
+        "mediaType": "video" if video else "image",
+        "displayUrl": f"https://instagram.com/p/{short}",
+        "thumbnailUrl": f"https://instagram.com/p/{short}/media",
+        "dimensions_width": 1080,
+        "dimensions_height": 1080 if video else 1350,
+        "tags": [
+            {"fullName": u["full_name"], "profilePicUrl": u["profile_pic_url"], "username": u["username"]}
+            for u in (_user(rng) for _ in range(rng.randint(0, 3)))
+        ],
+        "commentsDisabled": rng.random() < 0.05,
+        "pinned": i == 0,
+        "location": loc,
+        "isAffiliate": rng.random() < 0.1,
+        "isPaidPartnership": rng.random() < 0.1,
+    }
+
+def _graphql_post(rng: random.Random, username: str, i: int, ts: int) -> Dict[str, Any]:
+    short = f"SYN{i:08d}"
+    video = rng.random() < 0.2
+    return {
+        "node": {
+            "__typename": "GraphVideo" if video else "GraphImage",
+            "id": str(3_000_000_000_000_000_000 + i),
+            "shortcode": short,
+            "edge_media_to_caption": {"edges": [{"node": {"text": f"Synthetic post {i} by @{username}"}}]},
+            "taken_at_timestamp": ts,
+            "edge_liked_by": {"count": rng.randint(0, 200_000)},
+            "edge_media_to_comment": {"count": rng.randint(0, 5_000)},
+            "is_video": video,
+            "display_url": f"https://scontent.cdninstagram.com/{short}.jpg",
+            "thumbnail_src": f"https://scontent.cdninstagram.com/{short}_t.jpg",
+            "dimensions": {"width": 1080, "height": 1080 if video else 1350},
+            "edge_media_to_tagged_user": {
+                "edges": [{"node": {"user": _user(rng)}} for _ in range(rng.randint(0, 3))]
+            },
+            "location": _location(rng),
+            "comments_disabled": rng.random() < 0.05,
+            "pinned_for_users": [{"id": "1"}] if i == 0 else [],
+        }
+    }
+
+def _v1_post(rng: random.Random, username: str, i: int, ts: int) -> Dict[str, Any]:
+    code = f"SYN{i:08d}"
+    video = rng.random() < 0.2
+    loc = _location(rng)
+    if loc is not None:
+        loc = {"pk": int(loc["id"]), "name": loc["name"], "short_name": loc["name"]}
+    return {
+        "pk": 3_000_000_000_000_000_000 + i,
+        "id": f"{3_000_000_000_000_000_000 + i}_42",
+        "code": code,
+        "taken_at": ts,
+        "media_type": 2 if video else 1,
+        "caption": {"text": f"Synthetic post {i} by @{username}"},
+        "like_count": rng.randint(0, 200_000),
+        "comment_count": rng.randint(0, 5_000),
+        "image_versions2": {
+            "candidates": [
+                {"url": f"https://scontent.cdninstagram.com/{code}_1080.jpg", "width": 1080, "height": 1350},
+                {"url": f"https://scontent.cdninstagram.com/{code}_320.jpg", "width": 320, "height": 400},
+            ]
+        },
+        "original_width": 1080,
+        "original_height": 1080 if video else 1350,
+        "usertags": {"in": [{"user": _user(rng), "position": [0.5, 0.5]} for _ in range(rng.randint(0, 3))]},
+        "location": loc,
+        "comments_disabled": rng.random() < 0.05,
+        "timeline_pinned_user_ids": [42] if i == 0 else [],
+        "is_paid_partnership": rng.random() < 0.1,
+    }
+
+_GENERATORS: Dict[str, Callable[[random.Random, str, int, int], Dict[str, Any]]] = {
+    "mock": _mock_post,
+    "graphql": _graphql_post,
+    "v1": _v1_post,
+}
+
+def raw_posts(shape: str, count: int, username: str = "bench", seed: int = 1) -> List[Dict[str, Any]]:
+    """`count` newest-first raw posts in one of SHAPES."""
+    rng = random.Random(f"{seed}:{shape}:{username}")
+    gen = _GENERATORS[shape]
+    start = 1_700_000_000
+    return [gen(rng, username, i, start - i * 3600) for i in range(count)]
+
+def profile_id(username: str) -> str:
+    return str(zlib.crc32(username.encode("utf-8")))
+
+def _timeline(edges: List[Dict[str, Any]], count: int, end: int) -> Dict[str, Any]:
+    more = end < count
+    return {
+        "count": count,
+        "page_info": {"has_next_page": more, "end_cursor": str(end) if more else None},
+        "edges": edges,
+    }
+
+def profile_html(username: str, count: int, seed: int = 1, pad_bytes: int = 0, page_size: int | None = None) -> str:
+    """
+    Synthetic public profile page: a window._sharedData script holding the
+    first `count` posts (or the first `page_size` of them, with a cursor to
+    the rest) as GraphQL edges, one /p/<shortcode>/ link per post, and
+    optional filler markup to reach realistic page sizes.
+    """
+    end = min(count, page_size) if page_size else count
+    edges = raw_posts("graphql", count, username, seed)[:end]
+    shared = {
+        "entry_data": {
+            "ProfilePage": [
+                {
+                    "graphql": {
+                        "user": {
+                            "id": profile_id(username),
+                            "username": username,
+                            "edge_owner_to_timeline_media": _timeline(edges, count, end),
+                        }
+                    }
+                }
+            ]
+        }
+    }
+    links = "".join(f'<a href="/p/{e["node"]["shortcode"]}/" class="post">' for e in edges)
+    filler = ""
+    if pad_bytes > 0:
+        chunk = '<div class="x1n2onr6 x1lliihq"><span dir="auto">lorem ipsum dolor sit amet</span></div>\n'
+        filler = chunk * (pad_bytes // len(chunk) + 1)
+    return (
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">"
+        f"<title>@{username} • Instagram photos and videos</title>"
+        f"<script type=\"text/javascript\">window._sharedData = {json.dumps(shared, ensure_ascii=False)};</script>"
+        f"</head><body>{filler}<main>{links}</main></body></html>"
+    )
+
+def feed_page_json(username: str, count: int, after: str, first: int, seed: int = 1) -> str:
+    """GraphQL timeline response for the page that starts at cursor `after`."""
+    start = int(after)
+    end = min(count, start + first)
+    edges = raw_posts("graphql", end, username, seed)[start:end]
+    return json.dumps({"data": {"user": {"edge_owner_to_timeline_media": _timeline(edges, count, end)}}, "status": "ok"})
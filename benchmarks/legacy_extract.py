@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Frozen copy of the pre-regex shortcode scan from
+RequestHandler._extract_from_html (character loop + list membership).
+Kept only as a baseline for benchmarks; do not use it in the pipeline.
+"""
+from __future__ import annotations
+
+from typing import List, Optional
+
+def legacy_shortcodes(html: str, limit: Optional[int]) -> List[str]:
+    shortcodes = []
+    marker = "/p/"
+    idx = 0
+    while True:
+        i = html.find(marker, idx)
+        if i == -1:
+            break
+        # shortcode ends at next slash or quote
+        j = i + len(marker)
+        k = j
+        while k < len(html) and html[k] not in ['/', '"', "'", '\\', '?', '&', ' ']:
+            k += 1
+        sc = html[j:k]
+        if sc and sc not in shortcodes:
+            shortcodes.append(sc)
+        idx = k
+        if limit and len(shortcodes) >= limit:
+            break
+    return shortcodes
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Local static file server for the media downloader: serves in-memory files
+with ETag, Range and If-Range support, optional latency, and can cut off
+the first response for each path partway through to exercise resuming.
+"""
+from __future__ import annotations
+
+import hashlib
+import http.server
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)$")
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def do_GET(self) -> None:
+        stub = self.server.stub
+        with stub._lock:
+            stub.requests += 1
+            stub._active += 1
+            stub.max_active = max(stub.max_active, stub._active)
+        try:
+            self._serve(stub)
+        finally:
+            with stub._lock:
+                stub._active -= 1
+
+    def _serve(self, stub: "StaticFileServer") -> None:
+        if stub.latency:
+            time.sleep(stub.latency)
+        path = self.path.split("?", 1)[0]
+        body = stub.files.get(path)
+        if body is None:
+            self._reply(404, b"")
+            return
+        etag = stub.etags[path]
+        start, end = 0, len(body)
+        status = 200
+        m = _RANGE_RE.match(self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if m and (if_range is None or if_range == etag):
+            start = int(m.group(1))
+            end = min(len(body), int(m.group(2)) + 1) if m.group(2) else len(body)
+            if start >= len(body):
+                self._reply(416, b"", {"Content-Range": f"bytes */{len(body)}"})
+                return
+            status = 206
+            with stub._lock:
+                stub.ranged += 1
+        headers = {"Content-Type": stub.content_type(path), "ETag": etag, "Accept-Ranges": "bytes"}
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(body)}"
+        chunk = body[start:end]
+        with stub._lock:
+            cut = stub.cut_after if path not in stub._cut else 0
+            stub._cut.add(path)
+        if cut and cut < len(chunk):
+            # Promise the whole body, send part of it, then drop the connection
+            self._reply(status, chunk[:cut], headers, length=len(chunk))
+            self.close_connection = True
+            sent = cut
+        else:
+            self._reply(status, chunk, headers)
+            sent = len(chunk)
+        with stub._lock:
+            stub.bytes_sent += sent
+
+    def _reply(self, status: int, body: bytes, headers: Optional[dict] = None, length: Optional[int] = None) -> None:
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body) if length is None else length))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    stub: "StaticFileServer"
+
+class StaticFileServer:
+    """
+    Threaded HTTP server on 127.0.0.1 serving `files` ({"/path.jpg": bytes}).
+    With `cut_after`, the first response for each path stops after that
+    many bytes. `max_active` records the peak number of concurrent requests.
+    """
+
+    _TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".mp4": "video/mp4"}
+
+    def __init__(self, files: Dict[str, bytes], latency: float = 0.0, cut_after: int = 0):
+        self.files = files
+        self.etags = {p: '"%s"' % hashlib.md5(b).hexdigest() for p, b in files.items()}
+        self.latency = latency
+        self.cut_after = cut_after
+        self.requests = 0
+        self.ranged = 0
+        self.bytes_sent = 0
+        self.max_active = 0
+        self._active = 0
+        self._cut: set = set()
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+
+    def content_type(self, path: str) -> str:
+        return self._TYPES.get(path[path.rfind("."):], "application/octet-stream")
+
+    @property
+    def base_url(self) -> str:
+        assert self._server is not None, "server not started"
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "StaticFileServer":
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, name="static-files", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "StaticFileServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
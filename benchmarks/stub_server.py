@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for instagram.com that serves synthetic profile pages from
+benchmarks.corpus, with optional latency, injected 429/5xx responses and missing (404) profiles.
+"""
+from __future__ import annotations
+
+import http.server
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .corpus import feed_page_json, profile_html, profile_id
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def do_GET(self) -> None:
+        stub = self.server.stub
+        stub.requests += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+        fault = stub._fault()
+        if fault == 429:
+            self._reply(429, b"", {"Retry-After": "1"})
+            return
+        if fault == 503:
+            self._reply(503, b"")
+            return
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") == "/graphql/query":
+            if stub.feed_status is not None:
+                self._reply(stub.feed_status, b"")
+                return
+            variables = json.loads(parse_qs(url.query).get("variables", ["{}"])[0])
+            body = stub.feed_page(str(variables.get("id")), str(variables.get("after") or 0), int(variables.get("first") or 12))
+            if body is None:
+                self._reply(404, b"")
+                return
+            self._reply(200, body, {"Content-Type": "application/json"})
+            return
+        username = url.path.strip("/").split("/")[0] or "unknown"
+        if username in stub.missing:
+            self._reply(404, b"")
+            return
+        body = stub.page(username)
+        self._reply(200, body, {"Content-Type": "text/html; charset=utf-8", "ETag": f'"{username}-{len(body)}"'})
+
+    def _reply(self, status: int, body: bytes, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    stub: "StubInstagram"
+
+class StubInstagram:
+    """
+    Threaded HTTP server on 127.0.0.1. Use as a context manager; `base_url`
+    can be passed straight to the `base_url` setting of RequestHandler.
+    Faults are drawn from a seeded RNG so runs are reproducible; with
+    `max_rps`, requests beyond that many per second are also answered 429. With
+    `page_size`, profile pages carry only the first page of posts and the
+    rest is served through the GraphQL timeline query; setting `feed_status`
+    answers every timeline query with that status instead.
+    """
+
+    def __init__(
+        self,
+        posts_per_profile: int = 12,
+        pad_bytes: int = 0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        latency: float = 0.0,
+        seed: int = 1,
+        page_size: Optional[int] = None,
+        missing: Iterable[str] = (),
+        max_rps: float = 0.0,
+    ):
+        self.posts_per_profile = posts_per_profile
+        self.page_size = page_size
+        self.pad_bytes = pad_bytes
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.missing = frozenset(missing)
+        self.max_rps = max_rps
+        self.feed_status: Optional[int] = None
+        self.requests = 0
+        self.throttled = 0
+        self._window: deque = deque()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages: dict = {}
+        self._ids: dict = {}
+        self._server: Optional[_Server] = None
+
+    @property
+    def base_url(self) -> str:
+        assert self._server is not None, "server not started"
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def page(self, username: str) -> bytes:
+        body = self._pages.get(username)
+        if body is None:
+            body = profile_html(username, self.posts_per_profile, pad_bytes=self.pad_bytes,
+                                page_size=self.page_size).encode("utf-8")
+            self._pages[username] = body
+            self._ids[profile_id(username)] = username
+        return body
+
+    def feed_page(self, owner_id: str, after: str, first: int) -> Optional[bytes]:
+        username = self._ids.get(owner_id)
+        if username is None:
+            return None
+        return feed_page_json(username, self.posts_per_profile, after, first).encode("utf-8")
+
+    def _fault(self) -> Optional[int]:
+        with self._lock:
+            r = self._rng.random()
+            over = self._over_rate()
+        if over or r < self.throttle_rate:
+            self.throttled += 1
+            return 429
+        if r < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def _over_rate(self) -> bool:
+        """Sliding one-second window, like a server-side rate limit (429s count too)."""
+        if not self.max_rps:
+            return False
+        now = time.monotonic()
+        self._window.append(now)
+        while self._window[0] < now - 1.0:
+            self._window.popleft()
+        return len(self._window) > self.max_rps
+
+    def start(self) -> "StubInstagram":
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, name="stub-instagram", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "StubInstagram":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
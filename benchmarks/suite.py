@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark suite for the scrape pipeline. Each stage (fetch
+against a local stub server, HTML extraction, normalization per payload
+shape, export per output format, start-up cost of short-lived invocations
+via -X importtime, and the same jobs through a daemon) runs in a fresh
+process. The report gives throughput, p50/p99 latency and peak RSS for
+each stage.
+
+Run with:
+- python -m benchmarks.suite --output bench.json
+- python -m benchmarks.suite --baseline bench.json   # exit 1 on regression
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore
+
+from src.extractors.profile_posts_parser import normalize_posts
+from src.utils.json_exporter import open_writer
+
+from .corpus import SHAPES, profile_html, raw_posts
+from .stub_server import StubInstagram
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def _timed(fn: Callable[[], Any], latencies: List[float]) -> Any:
+    t0 = time.perf_counter()
+    out = fn()
+    latencies.append(time.perf_counter() - t0)
+    return out
+
+# -------------------- Stages --------------------
+# Every stage returns {"items": int, "unit": str, "seconds": float, "latencies": [...]}
+
+def _stage_fetch(opts: Dict[str, Any], backend: str) -> Dict[str, Any]:
+    from src.utils.async_request_handler import AsyncRequestHandler
+    from src.utils.request_handler import RequestHandler
+
+    usernames = [f"user{i:05d}" for i in range(opts["profiles"])]
+    latencies: List[float] = []
+    with StubInstagram(
+        posts_per_profile=opts["posts"],
+        pad_bytes=opts["pad_kb"] * 1024,
+        throttle_rate=opts["throttle_rate"],
+        error_rate=opts["error_rate"],
+        latency=opts["server_latency"],
+    ) as stub:
+        settings = {"mock": False, "base_url": stub.base_url, "concurrency": opts["concurrency"], "max_retries": 3}
+        t0 = time.perf_counter()
+        if backend == "async":
+            async def one(arh: AsyncRequestHandler, url: str) -> str:
+                s = time.perf_counter()
+                try:
+                    return await arh._get_with_retries(url)
+                finally:
+                    latencies.append(time.perf_counter() - s)
+
+            with AsyncRequestHandler(settings) as arh:
+                futs = [arh.submit(one(arh, arh._profile_url(u))) for u in usernames]
+                for f in futs:
+                    f.result()
+        else:
+            rh = RequestHandler(settings)
+            with ThreadPoolExecutor(max_workers=opts["concurrency"]) as pool:
+                futs = [pool.submit(_timed, lambda u=u: rh._get_with_retries(rh._profile_url(u)), latencies) for u in usernames]
+                for f in futs:
+                    f.result()
+        seconds = time.perf_counter() - t0
+    return {"items": len(usernames), "unit": "profiles", "seconds": seconds, "latencies": latencies,
+            "requests": stub.requests}
+
+def _stage_extract(opts: Dict[str, Any]) -> Dict[str, Any]:
+    from src.utils.request_handler import RequestHandler
+
+    rh = RequestHandler({"mock": False})
+    pages = [(f"user{i:05d}", profile_html(f"user{i:05d}", opts["posts"], pad_bytes=opts["pad_kb"] * 1024))
+             for i in range(opts["profiles"])]
+    latencies: List[float] = []
+    posts = 0
+    t0 = time.perf_counter()
+    for username, html in pages:
+        posts += len(_timed(lambda: rh._extract_from_html(html, username, None), latencies))
+    seconds = time.perf_counter() - t0
+    return {"items": len(pages), "unit": "pages", "seconds": seconds, "latencies": latencies, "posts": posts,
+            "page_bytes": len(pages[0][1].encode("utf-8")) if pages else 0}
+
+def _stage_normalize(opts: Dict[str, Any], shape: str) -> Dict[str, Any]:
+    batches = [raw_posts(shape, opts["posts"], f"user{i:05d}", seed=i) for i in range(opts["profiles"])]
+    latencies: List[float] = []
+    t0 = time.perf_counter()
+    for i, batch in enumerate(batches):
+        _timed(lambda: normalize_posts(f"user{i:05d}", batch), latencies)
+    seconds = time.perf_counter() - t0
+    return {"items": sum(len(b) for b in batches), "unit": "posts", "seconds": seconds, "latencies": latencies}
+
+def _stage_export(opts: Dict[str, Any], fmt: str) -> Dict[str, Any]:
+    batches = [normalize_posts(f"user{i:05d}", raw_posts("mock", opts["posts"], f"user{i:05d}", seed=i))
+               for i in range(opts["profiles"])]
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / f"out.{fmt}"
+        t0 = time.perf_counter()
+        with open_writer(fmt, out) as writer:
+            for batch in batches:
+                _timed(lambda: writer.write_rows(batch), latencies)
+        seconds = time.perf_counter() - t0
+        size = out.stat().st_size
+    return {"items": sum(len(b) for b in batches), "unit": "rows", "seconds": seconds, "latencies": latencies,
+            "output_bytes": size}
+
+# Short-lived invocations, each timed in a fresh interpreter (the "client"
+# is what a scheduler runs per batch once a daemon is up)
+_STARTUP_CODE = {
+    "client": "import src.daemon, src.utils.input_reader",
+    "runner": "from src.runner import Runner",
+    "mock_job": (
+        "import tempfile; from src.runner import Runner; "
+        "Runner({'mock': True, 'output_format': 'csv', 'output_path': 'out.csv'}, tempfile.mkdtemp()).run(['user'])"
+    ),
+}
+_IMPORT_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S.*)$")
+
+def _top_level_imports(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds per top-level import from -X importtime output (site excluded)."""
+    out: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        m = _IMPORT_RE.match(line)
+        if m and m.group(2) != "site":
+            out[m.group(2)] = int(m.group(1))
+    return out
+
+def _stage_startup(opts: Dict[str, Any], target: str) -> Dict[str, Any]:
+    latencies: List[float] = []
+    import_ms: List[float] = []
+    imports: Dict[str, int] = {}
+    t0 = time.perf_counter()
+    for _ in range(opts["startup_runs"]):
+        s = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _STARTUP_CODE[target]],
+                              cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        latencies.append(time.perf_counter() - s)
+        imports = _top_level_imports(proc.stderr)
+        import_ms.append(sum(imports.values()) / 1000)
+    seconds = time.perf_counter() - t0
+    heaviest = sorted(imports.items(), key=lambda kv: -kv[1])[:5]
+    return {"items": len(latencies), "unit": "runs", "seconds": seconds, "latencies": latencies,
+            "import_ms": round(sorted(import_ms)[len(import_ms) // 2], 2),
+            "top_imports_ms": {name: round(us / 1000, 2) for name, us in heaviest}}
+
+def _stage_daemon(opts: Dict[str, Any]) -> Dict[str, Any]:
+    """The mock_job batch sent repeatedly to one `serve` process over stdin: per-job round trip."""
+    code = ("import tempfile; from src.daemon import serve; from src.runner import Runner; "
+            "serve(Runner({'mock': True, 'output_format': 'csv', 'output_path': 'out.csv'}, tempfile.mkdtemp()))")
+    latencies: List[float] = []
+    with subprocess.Popen([sys.executable, "-c", code], cwd=REPO_ROOT, stdin=subprocess.PIPE,
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as proc:
+        assert proc.stdin is not None and proc.stdout is not None
+
+        def job(i: int) -> None:
+            proc.stdin.write(json.dumps({"id": i, "usernames": ["user"]}) + "\n")
+            proc.stdin.flush()
+            if not json.loads(proc.stdout.readline()).get("ok"):
+                raise RuntimeError("daemon job failed")
+
+        job(-1)  # untimed: interpreter start and imports, paid once per daemon
+        t0 = time.perf_counter()
+        for i in range(opts["startup_runs"]):
+            _timed(lambda: job(i), latencies)
+        seconds = time.perf_counter() - t0
+        proc.stdin.close()
+    return {"items": len(latencies), "unit": "jobs", "seconds": seconds, "latencies": latencies}
+
+STAGES: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "fetch.threads": lambda o: _stage_fetch(o, "threads"),
+    "fetch.async": lambda o: _stage_fetch(o, "async"),
+    "extract.html": _stage_extract,
+    **{f"normalize.{shape}": (lambda o, s=shape: _stage_normalize(o, s)) for shape in SHAPES},
+    **{f"export.{fmt}": (lambda o, f=fmt: _stage_export(o, f)) for fmt in ("json", "ndjson", "csv", "parquet", "arrow")},
+    **{f"startup.{t}": (lambda o, t=t: _stage_startup(o, t)) for t in _STARTUP_CODE},
+    "startup.daemon": _stage_daemon,
+}
+
+def _run_stage(name: str, opts: Dict[str, Any]) -> Dict[str, Any]:
+    """Executed in a child process so peak RSS is attributable to one stage."""
+    raw = STAGES[name](opts)
+    lat = sorted(raw.pop("latencies"))
+    seconds = raw.pop("seconds")
+    items = raw.pop("items")
+    result = {
+        "items": items,
+        "unit": raw.pop("unit"),
+        "seconds": round(seconds, 6),
+        "throughput": round(items / seconds, 2) if seconds > 0 else 0.0,
+        "p50_ms": round(_percentile(lat, 50) * 1000, 4),
+        "p99_ms": round(_percentile(lat, 99) * 1000, 4),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+    }
+    result.update(raw)
+    return result
+
+# -------------------- Reporting --------------------
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def _compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name, cur in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old or not old.get("throughput"):
+            continue
+        ratio = cur["throughput"] / old["throughput"]
+        if ratio < 1 - tolerance:
+            regressions.append(f"{name}: {old['throughput']:,.0f} -> {cur['throughput']:,.0f} {cur['unit']}/s ({ratio:.2f}x)")
+    return regressions
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--profiles", type=int, default=200)
+    ap.add_argument("--posts", type=int, default=12, help="posts per profile")
+    ap.add_argument("--pad-kb", type=int, default=300, help="filler added to each synthetic profile page")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--server-latency", type=float, default=0.0, help="seconds the stub waits per request")
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of stub replies that are 429")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub replies that are 503")
+    ap.add_argument("--startup-runs", type=int, default=10, help="fresh interpreters per startup stage")
+    ap.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of: " + ", ".join(STAGES))
+    ap.add_argument("--output", type=Path, help="write results JSON here")
+    ap.add_argument("--baseline", type=Path, help="previous results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed throughput drop before failing")
+    args = ap.parse_args()
+
+    opts = {
+        "profiles": args.profiles,
+        "posts": args.posts,
+        "pad_kb": args.pad_kb,
+        "concurrency": args.concurrency,
+        "server_latency": args.server_latency,
+        "throttle_rate": args.throttle_rate,
+        "error_rate": args.error_rate,
+        "startup_runs": args.startup_runs,
+    }
+    results: Dict[str, Any] = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": multiprocessing.cpu_count(),
+            "started_at": int(time.time()),
+            "options": opts,
+        },
+        "stages": {},
+    }
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'stage':<20}{'items':>9}{'throughput':>16}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}")
+    for name in [s.strip() for s in args.stages.split(",") if s.strip()]:
+        if name not in STAGES:
+            ap.error(f"unknown stage {name!r}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            r = pool.submit(_run_stage, name, opts).result()
+        results["stages"][name] = r
+        rss = f"{r['peak_rss_kb'] / 1024:.1f}" if r["peak_rss_kb"] else "-"
+        print(f"{name:<20}{r['items']:>9}{r['throughput']:>12,.0f} {r['unit'][:3]}/s{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{rss:>13}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = _compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Daemon mode: a long-lived process that keeps the interpreter, imports and
+HTTP session warm and runs one scrape job per request line, so a scheduler
+does not pay process start-up for every small batch.
+
+Requests and replies are one JSON document per line, on stdin/stdout or
+on a Unix socket:
+
+    ["natgeo", "nasa"]
+    {"id": 7, "usernames": ["natgeo"], "output_path": "data/jobs/7.json"}
+    {"id": 8, "input": "data/batch-8.ndjson", "output_format": "csv"}
+    {"command": "shutdown"}
+
+Apart from "usernames" or "input" (a username file, read by the daemon),
+an object may set "id" (echoed back) and any Runner.JOB_SETTINGS key; any
+other key is rejected. "input" and "output_path" are resolved against the
+repo root and must stay inside its data/ directory. Each reply is {"id", "ok": true, "rows", "output", "seconds"} or
+{"id", "ok": false, "error"}. Jobs run one at a time.
+
+This module imports neither the runner nor any HTTP library at load time,
+so `submit` stays a cheap client.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional
+
+if TYPE_CHECKING:
+    from .runner import Runner
+
+logger = logging.getLogger("daemon")
+
+SHUTDOWN = "shutdown"
+
+# Request keys besides Runner.JOB_SETTINGS
+_JOB_KEYS = ("usernames", "input")
+
+def _data_path(runner: "Runner", key: str, value: Any) -> Path:
+    """`value` resolved against the repo root; refused unless it lies inside data/."""
+    if not isinstance(value, str) or not value:
+        raise ValueError(f'"{key}" must be a non-empty path')
+    root = (Path(runner.repo_root) / "data").resolve()
+    path = (Path(runner.repo_root) / value).resolve()
+    if root not in path.parents:
+        raise ValueError(f'"{key}" must be inside {root}')
+    return path
+
+def _handle(runner: "Runner", line: str) -> Dict[str, Any]:
+    """Run the job in one request line and build its reply."""
+    job_id = None
+    started = time.perf_counter()
+    try:
+        request = json.loads(line)
+        if isinstance(request, list):
+            request = {"usernames": request}
+        if not isinstance(request, dict):
+            raise ValueError("a request is a JSON array of usernames or an object")
+        job_id = request.pop("id", None)
+        if request.get("command") == SHUTDOWN:
+            return {"id": job_id, "ok": True, "shutdown": True}
+        if "command" in request:
+            raise ValueError(f"unknown command {request['command']!r}")
+        unknown = sorted(set(request) - set(_JOB_KEYS) - set(runner.JOB_SETTINGS))
+        if unknown:
+            raise ValueError(f"unknown request keys: {', '.join(unknown)}")
+        if "input" in request and "usernames" in request:
+            raise ValueError('set either "usernames" or "input", not both')
+        if "output_path" in request:
+            request["output_path"] = str(_data_path(runner, "output_path", request["output_path"]))
+        if "input" in request:
+            from .utils.input_reader import iter_usernames
+
+            usernames: Iterable[str] = iter_usernames(_data_path(runner, "input", request.pop("input")), runner.codec)
+        else:
+            usernames = request.pop("usernames", None)
+            if not isinstance(usernames, list) or not all(isinstance(u, str) for u in usernames):
+                raise ValueError('"usernames" must be a list of strings')
+        result = runner.run_job(usernames, request)
+        return {"id": job_id, "ok": True, **result, "seconds": round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        logger.exception("Job %s failed", job_id)
+        return {"id": job_id, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+def serve_lines(runner: "Runner", lines: Iterable[str], reply: Callable[[str], None]) -> bool:
+    """Answer request lines until they run out; returns False after a shutdown request."""
+    for line in lines:
+        if not line.strip():
+            continue
+        response = _handle(runner, line)
+        reply(json.dumps(response) + "\n")
+        if response.get("shutdown"):
+            return False
+    return True
+
+def serve(runner: "Runner", socket_path: Optional[Path] = None) -> None:
+    """
+    Run jobs from stdin (replies on stdout; logs stay on stderr) until EOF,
+    or from clients of a Unix socket at `socket_path`, one connection at a
+    time, until a shutdown request.
+    """
+    with runner.warm():
+        if socket_path is None:
+            logger.info("Daemon ready; reading jobs from stdin")
+
+            def reply(text: str) -> None:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+
+            serve_lines(runner, sys.stdin, reply)
+            return
+
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("--socket needs Unix domain sockets; use stdin on this platform")
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if socket_path.exists():
+            socket_path.unlink()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(str(socket_path))
+            server.listen(16)
+            logger.info("Daemon ready; listening on %s", socket_path)
+            try:
+                running = True
+                while running:
+                    conn, _ = server.accept()
+                    with conn, conn.makefile("r", encoding="utf-8") as rfile, conn.makefile("w", encoding="utf-8") as wfile:
+
+                        def send(text: str) -> None:
+                            wfile.write(text)
+                            wfile.flush()
+
+                        try:
+                            running = serve_lines(runner, rfile, send)
+                        except OSError as e:
+                            logger.warning("Client connection lost: %s", e)
+            finally:
+                os.unlink(socket_path)
+        logger.info("Daemon stopped")
+
+def submit(socket_path: Path, request: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Send one request to a daemon listening on `socket_path` and wait for its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(str(socket_path))
+        with conn.makefile("rw", encoding="utf-8") as f:
+            f.write(json.dumps(request) + "\n")
+            f.flush()
+            line = f.readline()
+    if not line:
+        raise ConnectionError(f"daemon at {socket_path} closed the connection without replying")
+    return json.loads(line)
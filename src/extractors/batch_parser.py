@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+CPU-bound parse stage for a ProcessPoolExecutor.
+
+Pages are decoded by the fetchers, which need each page's cursor to request
+the next one (see RequestHandler.fetch_raw); the pool normalizes the raw
+posts. Without a pool, PageParser normalizes each page on the fetcher as
+soon as it arrives. Batches cross the process boundary as marshal blobs: the payloads
+are plain dicts, lists, str, bytes, int, bool and None, and marshal handles
+those faster and more compactly than pickle. Each item is
+(username, posts) and each result is (username, ok, rows_or_error); rows
+travel as Post.as_tuple() tuples. Workers time their own normalize stage
+and send a metrics snapshot back with each batch. Each side keeps an
+EntityRegistry for the run, since shared entities do not survive the trip.
+"""
+from __future__ import annotations
+
+import marshal
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.metrics import NULL_METRICS, Metrics, metrics_enabled
+from ..utils.post_record import Post
+from .entity_registry import EntityRegistry
+from .profile_posts_parser import normalize_posts
+
+BatchItem = Tuple[str, List[Dict[str, Any]]]
+BatchResult = Tuple[str, bool, Any]
+
+_metrics_on = False
+_entities = EntityRegistry()
+
+def init_worker(settings: Dict[str, Any]) -> None:
+    """ProcessPoolExecutor initializer; reads the worker's metrics setting and starts its registry."""
+    global _metrics_on, _entities
+    _metrics_on = metrics_enabled(settings)
+    _entities = EntityRegistry()
+
+def encode_batch(items: List[BatchItem]) -> bytes:
+    return marshal.dumps(items)
+
+def decode_results(
+    blob: bytes, metrics: Metrics = NULL_METRICS, entities: Optional[EntityRegistry] = None
+) -> List[BatchResult]:
+    results, snapshot = marshal.loads(blob)
+    if snapshot is not None:
+        metrics.merge(snapshot)
+    if entities is None:
+        build = Post.from_tuple
+    else:
+        build = lambda t: entities.share(Post.from_tuple(t))
+    return [(username, ok, [build(t) for t in result] if ok else result) for username, ok, result in results]
+
+def parse_items(
+    items: List[BatchItem], metrics: Metrics = NULL_METRICS, entities: Optional[EntityRegistry] = None
+) -> List[BatchResult]:
+    """Normalize each profile's raw posts, isolating failures per item."""
+    out: List[BatchResult] = []
+    for username, posts in items:
+        try:
+            with metrics.timer("normalize"):
+                out.append((username, True, normalize_posts(username, posts, entities)))
+        except Exception as e:
+            out.append((username, False, f"{type(e).__name__}: {e}"))
+    return out
+
+class PageParser:
+    """
+    In-process parse stage for one profile: the fetcher calls it on each
+    page as it arrives (RequestHandler.fetch_parsed). A failure is kept in
+    `error`, so the caller can report it as a parse failure, not a fetch one.
+    """
+
+    def __init__(self, username: str, metrics: Metrics = NULL_METRICS, entities: Optional[EntityRegistry] = None):
+        self.username = username
+        self.metrics = metrics
+        self.entities = entities
+        self.error: Optional[str] = None
+
+    def __call__(self, posts: List[Dict[str, Any]]) -> List[Post]:
+        try:
+            with self.metrics.timer("normalize"):
+                return normalize_posts(self.username, posts, self.entities)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            raise
+
+def parse_batch(blob: bytes) -> bytes:
+    """Worker entry point: marshal blob of BatchItems in, marshal blob of (BatchResults, metrics) out."""
+    metrics = Metrics() if _metrics_on else NULL_METRICS
+    results = [
+        (username, ok, [p.as_tuple() for p in result] if ok else result)
+        for username, ok, result in parse_items(marshal.loads(blob), metrics, _entities)
+    ]
+    return marshal.dumps((results, metrics.snapshot() if metrics.enabled else None))
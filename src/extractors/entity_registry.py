@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Run-wide registry of tagged users and locations.
+
+Heavy taggers repeat the same handful of accounts and places on thousands
+of posts. The registry keeps one compact record per entity (keyed by
+username / location id) and turns posts into reference rows that carry only
+the keys, so the normalized export writes each entity once. The normalizer
+uses it as well (`share`), so posts in memory point at one copy of each
+tagged user and location instead of building their own.
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..utils.json_exporter import RowWriter
+from ..utils.post_record import Post
+
+class TaggedUser:
+    __slots__ = ("username", "fullName", "profilePicUrl")
+
+    def __init__(self, username: str, fullName: str = "", profilePicUrl: str = ""):
+        self.username = username
+        self.fullName = fullName
+        self.profilePicUrl = profilePicUrl
+
+    def as_dict(self) -> Dict[str, str]:
+        return {"username": self.username, "fullName": self.fullName, "profilePicUrl": self.profilePicUrl}
+
+class Location:
+    __slots__ = ("id", "name", "slug", "hasPublicPage")
+
+    def __init__(self, id: str, name: Optional[str] = None, slug: Optional[str] = None, hasPublicPage: Optional[bool] = None):
+        self.id = id
+        self.name = name
+        self.slug = slug
+        self.hasPublicPage = hasPublicPage
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "locationId": self.id,
+            "locationName": self.name,
+            "locationSlug": self.slug,
+            "locationHasPublicPage": self.hasPublicPage,
+        }
+
+class EntityRegistry:
+    """
+    Interns TaggedUser and Location records. A later sighting only fills in
+    fields that are still empty, so the first complete value wins.
+    """
+
+    def __init__(self) -> None:
+        self.users: Dict[str, TaggedUser] = {}
+        self.locations: Dict[str, Location] = {}
+        self.references = 0
+        # Exact values seen by share(); unlike the records above they are
+        # never filled in, so sharing does not change what a post says
+        self._tagged: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+        self._places: Dict[Tuple[Any, ...], Tuple[Any, ...]] = {}
+
+    def share(self, post: Post) -> Post:
+        """
+        Point a post's taggedUsers entries and location fields at the shared
+        copies of identical values seen earlier in the run, and return it.
+        """
+        if post.taggedUsers:
+            post.taggedUsers = [self._shared_tag(t) for t in post.taggedUsers]
+        if post.locationId is not None:
+            place = (post.locationId, post.locationName, post.locationSlug, post.locationHasPublicPage)
+            place = self._places.setdefault(place, place)
+            post.locationId, post.locationName, post.locationSlug, post.locationHasPublicPage = place
+        return post
+
+    def _shared_tag(self, tag: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(tag, dict) or not tag.get("username"):
+            return tag
+        try:
+            return self._tagged.setdefault(tuple(tag.items()), tag)
+        except TypeError:
+            # Unhashable extra fields; keep the post's own copy
+            return tag
+
+    def user(self, data: Dict[str, Any]) -> Optional[str]:
+        """Intern one taggedUsers entry and return its key (the username); entries without one are skipped."""
+        key = data.get("username")
+        if not key:
+            return None
+        rec = self.users.get(key)
+        if rec is None:
+            key = sys.intern(str(key))
+            rec = self.users[key] = TaggedUser(key, data.get("fullName") or "", data.get("profilePicUrl") or "")
+        else:
+            rec.fullName = rec.fullName or data.get("fullName") or ""
+            rec.profilePicUrl = rec.profilePicUrl or data.get("profilePicUrl") or ""
+        self.references += 1
+        return rec.username
+
+    def location(self, row: Dict[str, Any]) -> Optional[str]:
+        """Intern the location columns of a post row and return its key (the location id)."""
+        key = row.get("locationId")
+        if key is None or key == "":
+            return None
+        key = str(key)
+        rec = self.locations.get(key)
+        if rec is None:
+            key = sys.intern(key)
+            rec = self.locations[key] = Location(key)
+        if rec.name is None:
+            rec.name = row.get("locationName")
+        if rec.slug is None:
+            rec.slug = row.get("locationSlug")
+        if rec.hasPublicPage is None:
+            rec.hasPublicPage = row.get("locationHasPublicPage")
+        self.references += 1
+        return rec.id
+
+    def reference(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Posts-table form of a normalized row: taggedUsers becomes
+        taggedUsernames and the location collapses to locationId. Rows that
+        are already references pass through unchanged.
+        """
+        if "taggedUsers" not in row:
+            return row
+        out: Dict[str, Any] = {}
+        for key, value in row.items():
+            if key == "taggedUsers":
+                out["taggedUsernames"] = [k for k in map(self.user, value or ()) if k is not None]
+            elif key == "locationId":
+                out[key] = self.location(row)
+            elif key not in ("locationName", "locationSlug", "locationHasPublicPage"):
+                out[key] = value
+        return out
+
+    def load(self, users: Iterable[Dict[str, Any]], locations: Iterable[Dict[str, Any]]) -> None:
+        """Seed from previously exported users/locations tables."""
+        for u in users:
+            self.user(u)
+        for loc in locations:
+            self.location(loc)
+        self.references = 0
+
+    def user_rows(self) -> Iterator[Dict[str, str]]:
+        return (u.as_dict() for u in self.users.values())
+
+    def location_rows(self) -> Iterator[Dict[str, Any]]:
+        return (loc.as_dict() for loc in self.locations.values())
+
+def entity_table_path(out_path: Path, table: str) -> Path:
+    """data/out.json -> data/out.users.json"""
+    return out_path.with_name(f"{out_path.stem}.{table}{out_path.suffix}")
+
+class NormalizedWriter:
+    """
+    RowWriter-compatible front for the normalized export: post rows are
+    written as references as they arrive, the users and locations tables
+    are written from the registry on close().
+    """
+
+    def __init__(self, posts: RowWriter, users: RowWriter, locations: RowWriter, registry: EntityRegistry):
+        self.posts = posts
+        self.users = users
+        self.locations = locations
+        self.registry = registry
+        self._writers: List[RowWriter] = [posts, users, locations]
+
+    @property
+    def out_path(self) -> Path:
+        return self.posts.out_path
+
+    @property
+    def rows_written(self) -> int:
+        return self.posts.rows_written
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        self.posts.write_rows(self.registry.reference(r) for r in rows)
+
+    def close(self) -> None:
+        self.users.write_rows(self.registry.user_rows())
+        self.locations.write_rows(self.registry.location_rows())
+        for w in self._writers:
+            w.close()
+
+    def abort(self) -> None:
+        for w in self._writers:
+            w.abort()
+
+    def __enter__(self) -> "NormalizedWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..utils.post_record import Post
+
+if TYPE_CHECKING:
+    from .entity_registry import EntityRegistry
 
 def _coerce_int(value: Any, default: int = 0) -> int:
     try:
@@ -20,69 +25,220 @@ def _coerce_bool(value: Any, default: bool = False) -> bool:
         return False
     return default
 
-def normalize_posts(username: str, raw_posts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Normalize diverse raw post structures to a unified schema."""
-    rows: List[Dict[str, Any]] = []
-    for p in raw_posts:
-        # Support keys from mock or potential IG JSON shapes
-        node = p.get("node", p)  # sometimes IG nests under 'node'
-        id_ = str(node.get("id", node.get("pk", node.get("post_id", ""))))
-        shortcode = node.get("shortcode") or node.get("code") or f"{id_[:5]}-{username}"
-        caption = node.get("caption") or node.get("edge_media_to_caption", {}).get("text") or node.get("text") or ""
-        ts = _coerce_int(node.get("taken_at_timestamp") or node.get("timestamp") or node.get("taken_at") or 0)
-        likes = _coerce_int(
-            node.get("edge_liked_by", {}).get("count")
-            or node.get("like_count")
-            or node.get("likes")
-            or 0
-        )
-        comments = _coerce_int(
-            node.get("edge_media_to_comment", {}).get("count")
-            or node.get("comment_count")
-            or node.get("comments")
-            or 0
-        )
-        media_type = node.get("media_type") or node.get("__typename", "").lower().replace("graph", "") or node.get("mediaType") or "image"
-        display_url = node.get("display_url") or node.get("displayUrl") or node.get("image_versions2", {}).get("candidates", [{}])[0].get("url") or ""
-        thumb_url = node.get("thumbnail_src") or node.get("thumbnailUrl") or node.get("thumbnail_srcset", "").split(" ")[0] if node.get("thumbnail_srcset") else node.get("thumbnailUrl", "")
-        dims = node.get("dimensions") or {}
-        width = _coerce_int(dims.get("width") or node.get("dimensions_width") or 0)
-        height = _coerce_int(dims.get("height") or node.get("dimensions_height") or 0)
-
-        tagged_users = node.get("taggedUsers") or p.get("taggedUsers") or []
-        comments_disabled = _coerce_bool(node.get("comments_disabled") or node.get("commentsDisabled") or False)
-        pinned = _coerce_bool(node.get("pinned") or False)
-
-        is_affiliate = _coerce_bool(node.get("isAffiliate") or node.get("is_affiliate") or False)
-        is_paid = _coerce_bool(node.get("isPaidPartnership") or node.get("is_paid_partnership") or False)
-
-        loc_id = node.get("locationId") or node.get("location_id")
-        loc_name = node.get("locationName") or node.get("location_name")
-        loc_slug = node.get("locationSlug") or node.get("location_slug")
-        loc_public = node.get("locationHasPublicPage") if "locationHasPublicPage" in node else node.get("location_has_public_page")
-
-        row = {
-            "id": id_,
-            "username": username,
-            "shortcode": shortcode,
-            "caption": caption,
-            "timestamp": ts,
-            "likes": likes,
-            "comments": comments,
-            "mediaType": "video" if "video" in media_type else "image",
-            "displayUrl": display_url,
-            "thumbnailUrl": thumb_url or display_url,
-            "dimensions_width": width,
-            "dimensions_height": height,
-            "taggedUsers": tagged_users,
-            "isAffiliate": is_affiliate,
-            "isPaidPartnership": is_paid,
-            "commentsDisabled": comments_disabled,
-            "pinned": pinned,
-            "locationId": loc_id,
-            "locationName": loc_name,
-            "locationSlug": loc_slug,
-            "locationHasPublicPage": bool(loc_public) if loc_public is not None else None,
+def _opt_bool(value: Any) -> Optional[bool]:
+    return bool(value) if value is not None else None
+
+def _count(edge: Any) -> int:
+    return _coerce_int(edge.get("count")) if isinstance(edge, dict) else 0
+
+# Each plan maps one known payload shape straight to the output schema in a
+# single pass, including tagged users and location. Plans are chosen once per
+# shape by _select_plan instead of probing every alternative key per post.
+Plan = Callable[[str, Dict[str, Any]], Post]
+
+def _tagged_flat(node: Dict[str, Any]) -> List[Dict[str, str]]:
+    tagged = node.get("taggedUsers")
+    if isinstance(tagged, list):
+        return tagged
+    tags = node.get("tags")
+    if not isinstance(tags, list):
+        return []
+    return [
+        {
+            "fullName": t.get("fullName", ""),
+            "profilePicUrl": t.get("profilePicUrl", ""),
+            "username": t.get("username", ""),
+        }
+        for t in tags
+    ]
+
+def _tagged_users(users: Iterable[Any]) -> List[Dict[str, str]]:
+    return [
+        {
+            "fullName": u.get("full_name") or u.get("fullName") or "",
+            "profilePicUrl": u.get("profile_pic_url") or u.get("profilePicUrl") or "",
+            "username": u.get("username") or "",
         }
-        rows.append(row)
-    return rows
\ No newline at end of file
+        for u in users
+        if isinstance(u, dict)
+    ]
+
+def _plan_flat(username: str, node: Dict[str, Any]) -> Post:
+    """Mock posts, best-effort HTML posts and already-normalized rows."""
+    id_ = str(node.get("id", node.get("post_id", "")))
+    display_url = node.get("displayUrl") or node.get("display_url") or ""
+    location = node.get("location")
+    if isinstance(location, dict):
+        loc_id = location.get("id") or location.get("pk") or node.get("locationId")
+        loc_name = location.get("name") or node.get("locationName")
+        loc_slug = location.get("slug") or node.get("locationSlug")
+        loc_public = location["has_public_page"] if "has_public_page" in location else node.get("locationHasPublicPage")
+    else:
+        loc_id = node.get("locationId")
+        loc_name = node.get("locationName")
+        loc_slug = node.get("locationSlug")
+        loc_public = node.get("locationHasPublicPage")
+    return Post(
+        id=id_,
+        username=username,
+        shortcode=node.get("shortcode") or f"{id_[:5]}-{username}",
+        caption=node.get("caption") or node.get("text") or "",
+        timestamp=_coerce_int(node.get("timestamp")),
+        likes=_coerce_int(node.get("likes")),
+        comments=_coerce_int(node.get("comments")),
+        mediaType="video" if "video" in (node.get("mediaType") or "image") else "image",
+        displayUrl=display_url,
+        thumbnailUrl=node.get("thumbnailUrl") or display_url,
+        dimensions_width=_coerce_int(node.get("dimensions_width")),
+        dimensions_height=_coerce_int(node.get("dimensions_height")),
+        taggedUsers=_tagged_flat(node),
+        isAffiliate=_coerce_bool(node.get("isAffiliate")),
+        isPaidPartnership=_coerce_bool(node.get("isPaidPartnership")),
+        commentsDisabled=_coerce_bool(node.get("commentsDisabled")),
+        pinned=_coerce_bool(node.get("pinned")),
+        locationId=loc_id,
+        locationName=loc_name,
+        locationSlug=loc_slug,
+        locationHasPublicPage=_opt_bool(loc_public),
+    )
+
+def _plan_graphql(username: str, node: Dict[str, Any]) -> Post:
+    """Web GraphQL timeline nodes (edge_* counters, taken_at_timestamp)."""
+    id_ = str(node.get("id", ""))
+    caption = node.get("edge_media_to_caption")
+    if isinstance(caption, dict):
+        edges = caption.get("edges")
+        if edges:
+            caption = (edges[0].get("node") or {}).get("text") or ""
+        else:
+            caption = caption.get("text") or ""
+    else:
+        caption = node.get("caption") or ""
+    tagged = node.get("edge_media_to_tagged_user")
+    tagged_users = (
+        _tagged_users((e.get("node") or {}).get("user") or e.get("node") for e in tagged.get("edges") or ())
+        if isinstance(tagged, dict)
+        else []
+    )
+    location = node.get("location")
+    if not isinstance(location, dict):
+        location = None
+    dims = node.get("dimensions")
+    display_url = node.get("display_url") or ""
+    typename = node.get("__typename") or ""
+    return Post(
+        id=id_,
+        username=username,
+        shortcode=node.get("shortcode") or f"{id_[:5]}-{username}",
+        caption=caption,
+        timestamp=_coerce_int(node.get("taken_at_timestamp")),
+        likes=_count(node.get("edge_liked_by") or node.get("edge_media_preview_like")),
+        comments=_count(node.get("edge_media_to_comment") or node.get("edge_media_preview_comment")),
+        mediaType="video" if node.get("is_video") or "Video" in typename else "image",
+        displayUrl=display_url,
+        thumbnailUrl=node.get("thumbnail_src") or display_url,
+        dimensions_width=_coerce_int(dims.get("width")) if dims else 0,
+        dimensions_height=_coerce_int(dims.get("height")) if dims else 0,
+        taggedUsers=tagged_users,
+        isAffiliate=_coerce_bool(node.get("is_affiliate")),
+        isPaidPartnership=_coerce_bool(node.get("is_paid_partnership")),
+        commentsDisabled=_coerce_bool(node.get("comments_disabled")),
+        pinned=bool(node.get("pinned_for_users")) or _coerce_bool(node.get("pinned")),
+        locationId=location.get("id") if location else None,
+        locationName=location.get("name") if location else None,
+        locationSlug=location.get("slug") if location else None,
+        locationHasPublicPage=_opt_bool(location.get("has_public_page")) if location else None,
+    )
+
+def _plan_edge(username: str, post: Dict[str, Any]) -> Post:
+    # {"node": ...} wrappers carry either web GraphQL or v1-style items;
+    # normalize_posts unwraps them itself and only uses this for one-offs
+    node = post["node"]
+    return _select_plan(node)[1](username, node)
+
+def _plan_v1(username: str, node: Dict[str, Any]) -> Post:
+    """Private/mobile API items (pk, code, image_versions2, usertags)."""
+    id_ = str(node.get("pk", node.get("id", "")))
+    caption = node.get("caption")
+    if isinstance(caption, dict):
+        caption = caption.get("text") or ""
+    candidates = (node.get("image_versions2") or {}).get("candidates") or ()
+    display_url = candidates[0].get("url", "") if candidates else ""
+    usertags = node.get("usertags")
+    tagged_users = _tagged_users(t.get("user") for t in usertags.get("in") or ()) if isinstance(usertags, dict) else []
+    location = node.get("location")
+    if not isinstance(location, dict):
+        location = None
+    return Post(
+        id=id_,
+        username=username,
+        shortcode=node.get("code") or f"{id_[:5]}-{username}",
+        caption=caption or "",
+        timestamp=_coerce_int(node.get("taken_at")),
+        likes=_coerce_int(node.get("like_count")),
+        comments=_coerce_int(node.get("comment_count")),
+        mediaType="video" if node.get("media_type") == 2 else "image",
+        displayUrl=display_url,
+        thumbnailUrl=(candidates[-1].get("url") if candidates else "") or display_url,
+        dimensions_width=_coerce_int(node.get("original_width")),
+        dimensions_height=_coerce_int(node.get("original_height")),
+        taggedUsers=tagged_users,
+        isAffiliate=_coerce_bool(node.get("is_affiliate")),
+        isPaidPartnership=_coerce_bool(node.get("is_paid_partnership")),
+        commentsDisabled=_coerce_bool(node.get("comments_disabled")),
+        pinned=bool(node.get("timeline_pinned_user_ids")),
+        locationId=(location.get("pk") or location.get("id")) if location else None,
+        locationName=location.get("name") if location else None,
+        locationSlug=location.get("slug") if location else None,
+        locationHasPublicPage=_opt_bool(location.get("has_public_page")) if location else None,
+    )
+
+# (sentinel key, plan) in detection order; the first key present wins.
+# Anything else is treated as the flat mock/normalized shape.
+_SHAPES: Tuple[Tuple[str, Plan], ...] = (
+    ("node", _plan_edge),
+    ("taken_at_timestamp", _plan_graphql),
+    ("__typename", _plan_graphql),
+    ("edge_media_to_caption", _plan_graphql),
+    ("image_versions2", _plan_v1),
+    ("pk", _plan_v1),
+    ("code", _plan_v1),
+)
+_FLAT_SENTINEL = "timestamp"
+
+def _select_plan(post: Dict[str, Any]) -> Tuple[str, Plan]:
+    for key, plan in _SHAPES:
+        if key in post:
+            return key, plan
+    return _FLAT_SENTINEL, _plan_flat
+
+def normalize_posts(
+    username: str, raw_posts: Iterable[Dict[str, Any]], entities: Optional["EntityRegistry"] = None
+) -> List[Post]:
+    """
+    Normalize diverse raw post structures to a unified schema of Post records.
+    The shape is detected on the first post and re-detected only when a
+    later post lacks the sentinel key of the current plan. {"node": ...}
+    edges are unwrapped here and the shape of their nodes is tracked the
+    same way, so it is also detected once per payload. Raw dicts are read,
+    never copied or mutated. With `entities`, tagged users and locations
+    are shared with the other posts of the run (EntityRegistry.share).
+    """
+    rows: List[Post] = []
+    sentinel: Optional[str] = None
+    node_sentinel: Optional[str] = None
+    plan: Plan = _plan_flat
+    node_plan: Plan = _plan_flat
+    for p in raw_posts:
+        if sentinel not in p:
+            sentinel, plan = _select_plan(p)
+        if plan is _plan_edge:
+            p = p["node"]
+            if node_sentinel not in p:
+                node_sentinel, node_plan = _select_plan(p)
+            rows.append(node_plan(username, p))
+        else:
+            rows.append(plan(username, p))
+    if entities is not None:
+        rows = [entities.share(row) for row in rows]
+    return rows
@@ -2,4 +2,138 @@
 """
 Entry point for Instagram User Profile Posts Scraper (mock-friendly).
 Run with:
-- python -m src.main
\ No newline at end of file
+- python -m src.main [run] [--input usernames.ndjson]   # scrape data/input_profiles.json in one process
+- python -m src.main enqueue [--input data/input_profiles.json] [--shard 0/4]
+- python -m src.main work [--worker-id host-a] [--shard 0/4]
+- python -m src.main status | collect | retry-failed
+- python -m src.main media       # download media of the rows in the configured output
+- python -m src.main serve [--socket data/scraper.sock]   # long-lived; one job per line on stdin or the socket
+- python -m src.main submit --socket data/scraper.sock [--input usernames.txt] [--output-path data/job.json]
+
+Only what a command needs is imported: `submit` never loads the scraper,
+and HTTP, cache, queue and columnar libraries load on first use.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Enable relative imports when executed as a script (python src/main.py)
+if __name__ == "__main__" and (__package__ is None or __package__ == ""):
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    __package__ = "src"
+
+from .utils.input_reader import input_format, iter_usernames  # type: ignore
+
+def load_json(path: Path):
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _parse_args(argv):
+    ap = argparse.ArgumentParser(prog="python -m src.main", description="Instagram profile posts scraper")
+    sub = ap.add_subparsers(dest="command")
+    run = sub.add_parser("run", help="scrape the input list in this process (default)")
+    run.add_argument("--input", type=Path, help="JSON array, NDJSON (.ndjson/.jsonl) or one-username-per-line text; .gz ok")
+    enqueue = sub.add_parser("enqueue", help="add usernames to the durable work queue")
+    enqueue.add_argument("--input", type=Path, help="JSON array, NDJSON (.ndjson/.jsonl) or one-username-per-line text; .gz ok")
+    enqueue.add_argument("--shard", help="only enqueue shard INDEX/COUNT of the list, e.g. 0/4")
+    work = sub.add_parser("work", help="claim and scrape usernames from the work queue")
+    work.add_argument("--worker-id", help="defaults to HOSTNAME-PID")
+    work.add_argument("--shard", help="only claim shard INDEX/COUNT, e.g. 0/4")
+    work.add_argument("--no-wait", action="store_true", help="exit when nothing is ready instead of waiting out backoffs")
+    sub.add_parser("status", help="print work queue counts")
+    sub.add_parser("collect", help="merge worker outputs into the configured output file")
+    sub.add_parser("retry-failed", help="give permanently failed usernames a new attempt budget")
+    sub.add_parser("media", help="download the images and videos of the rows in the configured output")
+    serve = sub.add_parser("serve", help="stay running and scrape one batch per JSON line (stdin or --socket)")
+    serve.add_argument("--socket", type=Path, help="listen on this Unix socket instead of stdin")
+    submit = sub.add_parser("submit", help="send one batch to a `serve --socket` daemon and print its reply")
+    submit.add_argument("--socket", type=Path, required=True)
+    submit.add_argument("--input", type=Path, help="username file; read by the daemon, so use a path it can see")
+    submit.add_argument("--output-path", help="output file for this batch (relative to the repo root)")
+    submit.add_argument("usernames", nargs="*")
+    return ap.parse_args(argv)
+
+def _submit(args) -> int:
+    from .daemon import submit
+
+    request = {"input": str(args.input.resolve())} if args.input else {"usernames": args.usernames}
+    if args.output_path:
+        request["output_path"] = args.output_path
+    reply = submit(args.socket, request)
+    print(json.dumps(reply))
+    return 0 if reply.get("ok") else 1
+
+def main(argv=None):
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    logger = logging.getLogger("main")
+    command = args.command or "run"
+    if command == "submit":
+        sys.exit(_submit(args))
+
+    repo_root = Path(__file__).resolve().parents[1]
+    data_dir = repo_root / "data"
+    config_dir = Path(__file__).resolve().parent / "config"
+
+    # Prefer local settings.json if present; otherwise fallback to example
+    settings_path = config_dir / "settings.json"
+    if not settings_path.exists():
+        settings_path = config_dir / "settings.example.json"
+        logger.info("No settings.json found. Using settings.example.json")
+
+    settings = load_json(settings_path)
+    from .runner import Runner  # type: ignore
+
+    runner = Runner(settings=settings, repo_root=str(repo_root))
+
+    if command in ("run", "enqueue"):
+        input_path = getattr(args, "input", None) or data_dir / "input_profiles.json"
+        if not input_path.exists():
+            if getattr(args, "input", None):
+                raise FileNotFoundError(input_path)
+            logger.warning("data/input_profiles.json not found. Creating with default usernames.")
+            input_path.parent.mkdir(parents=True, exist_ok=True)
+            input_path.write_text(json.dumps(["zuck", "instagram"], indent=2), encoding="utf-8")
+        # Read lazily: fetching starts before a large list is fully parsed.
+        # Only NDJSON lines go through the configured codec.
+        usernames = iter_usernames(input_path, runner.codec if input_format(input_path) == "ndjson" else None)
+        if command == "run":
+            runner.run(usernames)
+            return
+        from .utils.work_queue import parse_shard  # type: ignore
+
+        with runner.open_queue() as queue:
+            added = queue.enqueue(usernames, parse_shard(args.shard))
+            logger.info("Enqueued %d new usernames; queue %s", added, queue.stats())
+        return
+
+    if command == "serve":
+        from .daemon import serve  # type: ignore
+
+        serve(runner, args.socket)
+    elif command == "work":
+        import socket
+
+        from .utils.work_queue import parse_shard  # type: ignore
+
+        worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        runner.run_worker(worker_id, parse_shard(args.shard), wait=not args.no_wait)
+    elif command == "collect":
+        runner.collect()
+    elif command == "media":
+        runner.download_media()
+    else:
+        with runner.open_queue() as queue:
+            if command == "retry-failed":
+                logger.info("Requeued %d failed usernames", queue.retry_failed())
+            print(json.dumps(queue.stats()))
+
+if __name__ == "__main__":
+    main()
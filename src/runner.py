@@ -1,25 +1,96 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import json
 import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, Iterator, List, Tuple
 
-from .utils.request_handler import RequestHandler
-from .utils.json_exporter import export_json, export_csv
-from .extractors.profile_posts_parser import normalize_posts
-from .extractors.tagged_users_extractor import extract_tagged_from_raw
-from .extractors.location_info_parser import parse_location_from_raw
+from .utils.request_handler import RawProfile, RequestHandler
+from .utils.retry_policy import PermanentFetchError
+from .utils.metrics import NULL_METRICS, Metrics, MetricsServer, metrics_enabled, profiling, write_json_report, write_prometheus
+from .utils.post_record import Post
+from .utils.serialization import JsonCodec, get_codec
+from .utils.checkpoint_store import CheckpointStore
+from .utils.json_exporter import (
+    COLUMNAR_FORMATS,
+    OUTPUT_SUFFIXES,
+    JsonArrayWriter,
+    NdjsonWriter,
+    RowWriter,
+    TeeWriter,
+    iter_rows,
+    open_writer,
+)
+from .extractors.entity_registry import EntityRegistry, NormalizedWriter, entity_table_path
+from .extractors.batch_parser import (
+    BatchItem,
+    BatchResult,
+    PageParser,
+    decode_results,
+    encode_batch,
+    init_worker,
+    parse_batch,
+)
+
+# Backends are imported where used (asyncio, sqlite3, requests,
+# multiprocessing); most invocations need none of them
+if TYPE_CHECKING:
+    from .utils.http_cache import HttpCache
+    from .utils.media_downloader import MediaDownloader
+    from .utils.work_queue import WorkQueue
 
 logger = logging.getLogger("runner")
 
+# on_error(username, message, retryable)
+ErrorCallback = Callable[[str, str, bool], None]
+
+def _ordered_window(
+    items: Iterable[Any],
+    submit: Callable[[Any], Future],
+    window: int,
+) -> Iterator[Tuple[Any, Future]]:
+    """
+    Submit items lazily and yield (item, future) pairs in input order.
+    At most `window` futures are pending at once, so a slow consumer
+    throttles submission instead of letting results pile up in memory.
+    """
+    pending: Deque[Tuple[Any, Future]] = deque()
+    for item in items:
+        pending.append((item, submit(item)))
+        if len(pending) >= window:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
 @dataclass
 class Runner:
     settings: Dict[str, Any]
     repo_root: str
 
+    def __post_init__(self):
+        self.metrics: Metrics = Metrics() if metrics_enabled(self.settings) else NULL_METRICS
+        self._warm: RequestHandler | None = None
+        self._instrumenting = False
+
+    @property
+    def codec(self) -> JsonCodec:
+        # Resolved on first use, so queue commands never import orjson/msgspec
+        return get_codec(self.settings.get("json_backend"))
+
     def _resolve_output_path(self) -> Path:
         out_path = self.settings.get("output_path", "data/sample_output.json")
         p = Path(self.repo_root) / out_path
@@ -36,38 +107,564 @@ class Runner:
             logger.warning("Invalid max_posts_per_profile in settings; ignoring.")
             return None
 
-    def run(self, usernames: Iterable[str]) -> None:
-        logger.info("Starting runner for %d usernames", len(list(usernames)))
-        rh = RequestHandler(self.settings)
+    def _concurrency(self) -> int:
+        try:
+            return max(1, int(self.settings.get("concurrency", 1)))
+        except Exception:
+            logger.warning("Invalid concurrency in settings; using 1.")
+            return 1
+
+    def _open_cache(self) -> HttpCache | None:
+        if not (self.settings.get("cache_enabled") or self.settings.get("cache_only")):
+            return None
+        from .utils.http_cache import HttpCache
+
+        path = Path(self.repo_root) / self.settings.get("cache_path", "data/cache/http.sqlite")
+        max_mb = float(self.settings.get("cache_max_mb", 512))
+        return HttpCache(path, ttl=float(self.settings.get("cache_ttl", 3600)), max_bytes=int(max_mb * 1024 * 1024))
+
+    def _backend(self) -> str:
+        return (self.settings.get("http_backend") or "threads").lower()
+
+    def _parse_workers(self) -> int:
+        try:
+            return max(0, int(self.settings.get("parse_workers") or 0))
+        except Exception:
+            logger.warning("Invalid parse_workers in settings; parsing in-process.")
+            return 0
+
+    def _parse_batch_size(self) -> int:
+        try:
+            return max(1, int(self.settings.get("parse_batch_size") or 16))
+        except Exception:
+            logger.warning("Invalid parse_batch_size in settings; using 16.")
+            return 16
+
+    def _fetch(
+        self, rh: RequestHandler, username: str, limit: int | None, since: Dict[str, Any] | None
+    ) -> RawProfile:
+        logger.info("Fetching posts for @%s ...", username)
+        return rh.fetch_raw(username, limit, since)
 
-        final_rows: List[Dict[str, Any]] = []
-        for username in usernames:
+    def _fetch_parsed(
+        self, rh: RequestHandler, username: str, limit: int | None, since: Dict[str, Any] | None, entities: EntityRegistry
+    ) -> BatchResult:
+        logger.info("Fetching posts for @%s ...", username)
+        parse = PageParser(username, self.metrics, entities)
+        try:
+            return username, True, rh.fetch_parsed(username, limit, since, parse)
+        except Exception:
+            if parse.error is None:
+                raise
+            return username, False, parse.error
+
+    async def _fetch_parsed_async(
+        self, arh: Any, username: str, limit: int | None, since: Dict[str, Any] | None, entities: EntityRegistry
+    ) -> BatchResult:
+        parse = PageParser(username, self.metrics, entities)
+        try:
+            return username, True, await arh.fetch_parsed(username, limit, since, parse)
+        except Exception:
+            if parse.error is None:
+                raise
+            return username, False, parse.error
+
+    @contextmanager
+    def _handler(self) -> Iterator[RequestHandler]:
+        """
+        The request handler for the configured `http_backend`, with its HTTP
+        cache. Inside warm() the same handler (and its connection pool) is
+        reused; otherwise it is closed when the block ends.
+        """
+        if self._warm is not None:
+            yield self._warm
+            return
+        cache = self._open_cache()
+        try:
+            if self._backend() == "async":
+                from .utils.async_request_handler import AsyncRequestHandler
+
+                with AsyncRequestHandler(self.settings, cache, self.metrics) as arh:
+                    try:
+                        yield arh
+                    finally:
+                        self._log_retries(arh)
+                return
+            rh = RequestHandler(self.settings, cache, self.metrics)
+            try:
+                yield rh
+            finally:
+                self._log_retries(rh)
+        finally:
+            if cache is not None:
+                logger.info("HTTP cache stats: %s", cache.stats())
+                cache.close()
+
+    @contextmanager
+    def warm(self) -> Iterator[None]:
+        """
+        Process scope for daemon mode: every run inside the block reuses one
+        request handler (HTTP session, connection pool, cache) and shares the
+        profiler and metrics server, instead of setting them up per run.
+        """
+        with self._instrumented(), self._handler() as handler:
+            self._warm = handler
             try:
-                logger.info("Fetching posts for @%s ...", username)
-                raw_posts = rh.fetch_user_posts(username, self._max_posts())
-                # Enrich raw posts with tagged users and location fields if present
-                for post in raw_posts:
-                    post["taggedUsers"] = extract_tagged_from_raw(post)
-                    post.update(parse_location_from_raw(post))
-                normalized = normalize_posts(username, raw_posts)
-                final_rows.extend(normalized)
-                logger.info("Fetched %d posts for @%s", len(normalized), username)
+                yield
+            finally:
+                self._warm = None
+
+    @contextmanager
+    def _fetch_submitter(
+        self, checkpoints: CheckpointStore | None = None, entities: EntityRegistry | None = None
+    ) -> Iterator[Callable[[str], Future]]:
+        """
+        Yield a callable that schedules the fetch of one username and returns
+        a Future of its RawProfile, using the configured `http_backend`.
+        Pagination stops at each profile's checkpoint, if any. With
+        `entities`, every page is normalized as soon as it arrives, while
+        the next ones download, and the Future holds a BatchResult instead.
+        """
+        limit = self._max_posts()
+        since = (lambda u: checkpoints.get(u)) if checkpoints is not None else (lambda u: None)
+        with self._handler() as rh:
+            if self._backend() == "async":
+                arh: Any = rh
+                if entities is None:
+                    yield lambda u: arh.submit(arh.fetch_raw(u, limit, since(u)))
+                else:
+                    yield lambda u: arh.submit(self._fetch_parsed_async(arh, u, limit, since(u), entities))
+                return
+            with ThreadPoolExecutor(max_workers=self._concurrency(), thread_name_prefix="profile") as pool:
+                if entities is None:
+                    yield lambda u: pool.submit(self._fetch, rh, u, limit, since(u))
+                else:
+                    yield lambda u: pool.submit(self._fetch_parsed, rh, u, limit, since(u), entities)
+
+    @staticmethod
+    def _log_retries(rh: RequestHandler) -> None:
+        if not rh.mock:
+            logger.info("HTTP retry stats: %s", rh.retry.stats())
+
+    def _iter_fetched(
+        self, usernames: Iterable[str], submit: Callable[[str], Future], on_error: ErrorCallback | None = None
+    ) -> Iterator[Tuple[str, Any]]:
+        # Allow one extra batch in flight so fetchers stay busy while the
+        # consumer parses the head of the queue.
+        window = self._concurrency() * 2
+        for username, fut in _ordered_window(usernames, submit, window):
+            try:
+                yield username, fut.result()
+            except PermanentFetchError as e:
+                logger.error("Skipping @%s: %s", username, e)
+                self.metrics.inc("permanent_failures")
+                if on_error is not None:
+                    on_error(username, f"{type(e).__name__}: {e}", False)
             except Exception as e:
-                logger.exception("Failed to fetch/parse posts for @%s: %s", username, e)
+                logger.exception("Failed to fetch posts for @%s: %s", username, e)
+                self.metrics.inc("fetch_failures")
+                if on_error is not None:
+                    on_error(username, f"{type(e).__name__}: {e}", True)
+
+    def _parse_in_pool(
+        self, items: Iterator[BatchItem], workers: int, entities: EntityRegistry
+    ) -> Iterator[BatchResult]:
+        """
+        Ship batches of fetched raw posts to a process pool for
+        normalization while the fetch threads keep downloading. Results come
+        back in input order.
+        """
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        ctx = multiprocessing.get_context(self.settings.get("parse_start_method") or "spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx, initializer=init_worker, initargs=(self.settings,)
+        ) as pool:
+            batches = _chunked(items, self._parse_batch_size())
+            submit = lambda batch: pool.submit(parse_batch, encode_batch(batch))
+            for batch, fut in _ordered_window(batches, submit, workers * 2):
+                try:
+                    yield from decode_results(fut.result(), self.metrics, entities)
+                except Exception as e:
+                    logger.exception("Parse worker failed on a batch of %d profiles: %s", len(batch), e)
+                    for item in batch:
+                        yield item[0], False, f"{type(e).__name__}: {e}"
+
+    def iter_profiles(
+        self,
+        usernames: Iterable[str],
+        checkpoints: CheckpointStore | None = None,
+        on_error: ErrorCallback | None = None,
+    ) -> Iterator[Tuple[str, List[Post]]]:
+        """
+        Yield (username, rows) in input order while up to `concurrency`
+        profiles are fetched in parallel. A failing profile is logged,
+        reported to `on_error(username, message, retryable)` and skipped without
+        affecting the others. With `checkpoints`, only posts newer than each
+        profile's high-water mark are kept. With `parse_workers`,
+        normalization runs in a process pool; otherwise the fetchers
+        normalize each page as it arrives.
+        """
+        workers = self._parse_workers()
+        # Posts of the run share one copy of each tagged user and location
+        entities = EntityRegistry()
+        with self._fetch_submitter(checkpoints, None if workers else entities) as submit:
+            fetched = self._iter_fetched(usernames, submit, on_error)
+            if workers:
+                parsed = self._parse_in_pool(((u, raw.posts) for u, raw in fetched), workers, entities)
+            else:
+                # The fetchers normalized each page as it arrived
+                parsed = (result for _, result in fetched)
+            for username, ok, result in parsed:
+                if not ok:
+                    logger.error("Failed to parse posts for @%s: %s", username, result)
+                    self.metrics.inc("parse_failures")
+                    if on_error is not None:
+                        on_error(username, result, True)
+                    continue
+                logger.info("Fetched %d posts for @%s", len(result), username)
+                self.metrics.inc("profiles")
+                self.metrics.inc("posts", len(result))
+                yield username, result
+
+    def _output_format(self) -> str:
+        return (self.settings.get("output_format") or "json").lower()
+
+    def _writer_options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {
+            "codec": self.codec,
+            # Only the primary JSON array is meant for people; 0/null writes it compact
+            "indent": self.settings.get("json_indent", 2) or None,
+        }
+        if self._output_format() in COLUMNAR_FORMATS:
+            options["batch_rows"] = int(self.settings.get("row_group_size") or 65536)
+            options["compression"] = self.settings.get("columnar_compression", "zstd")
+        return options
 
-        output_path = self._resolve_output_path()
-        fmt = (self.settings.get("output_format") or "json").lower()
+    def _export_mode(self) -> str:
+        return (self.settings.get("export_mode") or "denormalized").lower()
 
-        if fmt == "csv":
-            export_csv(final_rows, output_path.with_suffix(".csv"))
-            logger.info("Exported %d rows to %s", len(final_rows), output_path.with_suffix(".csv"))
-        else:
-            export_json(final_rows, output_path)
-            logger.info("Exported %d rows to %s", len(final_rows), output_path)
+    def _open_output(self, out_path: Path, merge: bool = False) -> RowWriter:
+        """
+        Writer for the main output. In the "normalized" export mode this is a
+        NormalizedWriter producing posts, users and locations tables; with
+        `merge`, the registry is seeded from the existing entity tables.
+        """
+        fmt, options = self._output_format(), self._writer_options()
+        if self._export_mode() != "normalized":
+            return open_writer(fmt, out_path, **options)
 
-        # Optionally also write a machine-friendly 'latest.json' snapshot in data/
+        registry = EntityRegistry()
+        users_path = entity_table_path(out_path, "users")
+        locations_path = entity_table_path(out_path, "locations")
+        if merge:
+            registry.load(iter_rows(users_path, fmt, self.codec), iter_rows(locations_path, fmt, self.codec))
+        return NormalizedWriter(  # type: ignore[return-value]
+            open_writer(fmt, out_path, table="post_refs", **options),
+            open_writer(fmt, users_path, table="users", **options),
+            open_writer(fmt, locations_path, table="locations", **options),
+            registry,
+        )
+
+    def _log_entities(self, writer: Any) -> None:
+        if isinstance(writer, NormalizedWriter):
+            reg = writer.registry
+            logger.info(
+                "Interned %d tagged users and %d locations from %d references",
+                len(reg.users), len(reg.locations), reg.references,
+            )
+
+    def _output_file(self) -> Path:
+        return self._resolve_output_path().with_suffix(OUTPUT_SUFFIXES.get(self._output_format(), ".json"))
+
+    def _open_writers(self, primary: RowWriter) -> TeeWriter:
+        """
+        Pair the primary exporter with the data/latest.json snapshot so both
+        are fed from the same row stream.
+        """
+        writers: List[RowWriter] = [primary]
+
+        # Optionally also write a machine-friendly (compact) 'latest.json' snapshot in data/
         snapshot_path = Path(self.repo_root) / "data" / "latest.json"
+        if snapshot_path != primary.out_path:
+            try:
+                writers.append(JsonArrayWriter(snapshot_path, indent=None, codec=self.codec))
+            except Exception:
+                logger.debug("Could not write snapshot to %s", snapshot_path)
+        return TeeWriter(writers)
+
+    # -------------------- Media --------------------
+
+    @contextmanager
+    def _media_stage(self) -> Iterator[MediaDownloader | None]:
+        """
+        With `download_media`, a MediaDownloader that the run feeds every
+        exported row; its downloads overlap with scraping and are awaited
+        when the block ends. Mock rows point at no real media, so mock
+        runs skip the stage.
+        """
+        if not self.settings.get("download_media"):
+            yield None
+            return
+        if self.settings.get("mock", True) and not self.settings.get("cache_only"):
+            logger.warning("download_media is ignored in mock mode (mock rows have no real media URLs)")
+            yield None
+            return
+        from .utils.media_downloader import MediaDownloader
+
+        with MediaDownloader(self.settings, Path(self.repo_root), self.metrics, self.codec) as media:
+            yield media
+
+    def download_media(self) -> int:
+        """
+        Download the media of every row already in the configured output,
+        for outputs scraped without `download_media`. Returns the number of
+        rows read.
+        """
+        from .utils.media_downloader import MediaDownloader
+
+        rows = 0
+        with self._instrumented(), MediaDownloader(self.settings, Path(self.repo_root), self.metrics, self.codec) as media:
+            for chunk in _chunked(iter_rows(self._output_file(), self._output_format(), self.codec), 1000):
+                media.submit(chunk)
+                rows += len(chunk)
+        logger.info("Fetched media for %d rows of %s", rows, self._output_file())
+        return rows
+
+    # -------------------- Instrumentation --------------------
+
+    @contextmanager
+    def _instrumented(self) -> Iterator[None]:
+        """
+        Run the enclosed block under the configured profiler (`profile`:
+        "cprofile" or "sample") and write the metrics sinks when it ends,
+        also when it fails. A `metrics_port` serves live metrics meanwhile.
+        """
+        if self._instrumenting:
+            # Nested in warm(): profiler and server already run; refresh the sinks per run
+            try:
+                yield
+            finally:
+                self._write_metrics()
+            return
+        self._instrumenting = True
+        port = int(self.settings.get("metrics_port") or 0)
+        server = MetricsServer(self.metrics, port) if port else None
+        mode = (self.settings.get("profile") or "").lower()
+        default_path = "data/metrics/profile." + ("pstats" if mode == "cprofile" else "folded")
+        profile_path = Path(self.repo_root) / (self.settings.get("profile_output") or default_path)
         try:
-            snapshot_path.write_text(json.dumps(final_rows, ensure_ascii=False, indent=2), encoding="utf-8")
-        except Exception:
-            logger.debug("Could not write snapshot to %s", snapshot_path)
\ No newline at end of file
+            with profiling(mode, profile_path, float(self.settings.get("profile_interval") or 0.005)):
+                yield
+        finally:
+            self._instrumenting = False
+            if server is not None:
+                server.close()
+            self._write_metrics()
+
+    def _write_metrics(self) -> None:
+        if not self.metrics.enabled:
+            return
+        report = self.metrics.report()
+        for name, stage in report["stages"].items():
+            logger.info(
+                "stage %-12s n=%-6d total=%.2fs p50=%.4fs p99=%.4fs",
+                name, stage["count"], stage["total_s"], stage["p50_s"], stage["p99_s"],
+            )
+        logger.info("counters: %s", report["counters"])
+        root = Path(self.repo_root)
+        if self.settings.get("metrics_report"):
+            write_json_report(self.metrics, root / self.settings["metrics_report"])
+        if self.settings.get("metrics_prometheus"):
+            write_prometheus(self.metrics, root / self.settings["metrics_prometheus"])
+
+    def run(self, usernames: Iterable[str]) -> int:
+        """Scrape `usernames` into the configured output; returns the rows written (new rows if incremental)."""
+        logger.info("Starting runner with concurrency=%d (%s backend)", self._concurrency(), self._backend())
+        if self.settings.get("incremental"):
+            return self._run_incremental(usernames)
+
+        profiles = 0
+        with self._instrumented(), self._media_stage() as media, \
+                self._open_writers(self._open_output(self._output_file())) as writer:
+            for _, rows in self.iter_profiles(usernames):
+                with self.metrics.timer("export"):
+                    writer.write_rows(rows)
+                if media is not None:
+                    media.submit(rows)
+                profiles += 1
+        logger.info("Processed %d profiles", profiles)
+        self._log_entities(writer.writers[0])
+        logger.info("Exported %d rows to %s", writer.rows_written, writer.writers[0].out_path)
+        return writer.rows_written
+
+    def _run_incremental(self, usernames: Iterable[str]) -> int:
+        """
+        Fetch only posts newer than each profile's checkpoint and merge them
+        into the existing output, deduplicated on `id`.
+
+        New rows are first appended to a `.pending.ndjson` journal and the
+        checkpoint is saved only after the rows are on disk. If the run is
+        interrupted, the next run keeps appending to the same journal and
+        merges everything at the end, so no fetched post is lost.
+        """
+        checkpoints = CheckpointStore(Path(self.repo_root) / self.settings.get("checkpoint_path", "data/checkpoints.json"))
+        output_file = self._output_file()
+        journal_path = output_file.with_name(output_file.name + ".pending.ndjson")
+        if journal_path.exists():
+            logger.info("Resuming interrupted incremental run from %s", journal_path)
+
+        profiles = 0
+        with self._instrumented(), self._media_stage() as media, \
+                self._open_writers(NdjsonWriter(journal_path, append=True, codec=self.codec)) as writer:
+            for username, rows in self.iter_profiles(usernames, checkpoints):
+                with self.metrics.timer("export"):
+                    writer.write_rows(rows)
+                if media is not None:
+                    media.submit(rows)
+                if checkpoints.advance(username, rows):
+                    checkpoints.save()
+                profiles += 1
+        logger.info("Processed %d profiles; %d new rows", profiles, writer.rows_written)
+
+        merged = self._merge_journal(journal_path, output_file)
+        journal_path.unlink()
+        logger.info("Merged output has %d rows in %s", merged, output_file)
+        return writer.rows_written
+
+    def _merge_journal(self, journal_path: Path, output_file: Path) -> int:
+        # Later journal rows win (a post may have been re-fetched after a resume).
+        # Held as Post records: this map spans every new row of the run.
+        fresh: Dict[str, Post] = {}
+        for row in iter_rows(journal_path, "ndjson", self.codec):
+            fresh[str(row.get("id"))] = Post.from_dict(row)
+
+        fmt = self._output_format()
+        with self._open_output(output_file, merge=True) as out:
+            out.write_rows(fresh.values())
+            out.write_rows(r for r in iter_rows(output_file, fmt, self.codec) if str(r.get("id")) not in fresh)
+        self._log_entities(out)
+        return out.rows_written
+
+    # -------------------- Daemon jobs --------------------
+
+    # Settings a daemon job may override; the rest are fixed when the handler warms up
+    JOB_SETTINGS = ("output_path", "output_format", "export_mode", "max_posts_per_profile", "incremental")
+
+    def run_job(self, usernames: Iterable[str], overrides: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        """
+        run() with per-job `overrides` (JOB_SETTINGS keys only) layered over
+        the settings; returns {"rows", "output"} for the daemon's reply.
+        """
+        overrides = overrides or {}
+        unknown = sorted(set(overrides) - set(self.JOB_SETTINGS))
+        if unknown:
+            raise ValueError(f"settings not allowed per job: {', '.join(unknown)}")
+        saved = self.settings
+        self.settings = dict(saved, **overrides)
+        try:
+            rows = self.run(usernames)
+            return {"rows": rows, "output": str(self._output_file())}
+        finally:
+            self.settings = saved
+
+    # -------------------- Work queue --------------------
+
+    def open_queue(self) -> WorkQueue:
+        from .utils.work_queue import WorkQueue
+
+        return WorkQueue(
+            Path(self.repo_root) / self.settings.get("queue_path", "data/queue/work.sqlite"),
+            lease_seconds=float(self.settings.get("queue_lease_seconds", 600)),
+            max_attempts=int(self.settings.get("queue_max_attempts", 5)),
+            backoff_base=float(self.settings.get("queue_backoff_base", 30)),
+            backoff_max=float(self.settings.get("queue_backoff_max", 3600)),
+        )
+
+    def _worker_output_dir(self) -> Path:
+        return self._output_file().parent / "workers"
+
+    def _claimed(
+        self, queue: WorkQueue, worker_id: str, shard: Tuple[int, int] | None, leased: Dict[str, None]
+    ) -> Iterator[str]:
+        """Claim small batches on demand until nothing is ready right now."""
+        batch = self._concurrency() * 2
+        while True:
+            names = queue.claim(worker_id, batch, shard)
+            if not names:
+                return
+            for u in names:
+                leased[u] = None
+                yield u
+
+    def run_worker(self, worker_id: str, shard: Tuple[int, int] | None = None, wait: bool = True) -> int:
+        """
+        Drain the work queue: claim usernames under a lease, append their rows
+        to this worker's own NDJSON file, and complete each username only
+        after its rows are flushed. A crash therefore never loses work: the
+        lease expires and another worker redoes the profile, and `collect`
+        drops the duplicate rows. With `wait`, the worker sleeps through
+        retry backoffs and other workers' leases until the queue (or its
+        shard) is empty. Returns the number of profiles completed.
+        """
+        if self.settings.get("incremental"):
+            logger.warning("incremental checkpoints are not used by queue workers")
+        out_path = self._worker_output_dir() / f"{worker_id}.ndjson"
+        poll = float(self.settings.get("queue_poll_seconds", 5))
+        leased: Dict[str, None] = {}
+        completed = 0
+
+        def failed(username: str, error: str, retryable: bool = True) -> None:
+            leased.pop(username, None)
+            queue.fail(worker_id, username, error, permanent=not retryable)
+
+        with self._instrumented(), self._media_stage() as media, self.open_queue() as queue, \
+                NdjsonWriter(out_path, append=True, codec=self.codec) as writer:
+            logger.info("Worker %s starting (shard %s); writing to %s", worker_id, shard or "all", out_path)
+            try:
+                while True:
+                    for username, rows in self.iter_profiles(self._claimed(queue, worker_id, shard, leased), on_error=failed):
+                        with self.metrics.timer("export"):
+                            writer.write_rows(rows)
+                        if media is not None:
+                            media.submit(rows)
+                        leased.pop(username, None)
+                        if queue.complete(worker_id, username):
+                            completed += 1
+                        else:
+                            logger.warning("Lease on @%s expired before completion; another worker owns it", username)
+                        queue.renew(worker_id, leased)
+                    # Anything still leased produced neither rows nor an error
+                    for username in list(leased):
+                        failed(username, "no result")
+                    delay = queue.next_ready_in(shard)
+                    if not wait or delay is None:
+                        break
+                    time.sleep(min(max(delay, 0.05), poll))
+            except BaseException:
+                queue.release(worker_id, leased)
+                raise
+            logger.info("Worker %s done: %d profiles; queue %s", worker_id, completed, queue.stats())
+        return completed
+
+    def collect(self) -> int:
+        """
+        Merge every worker's NDJSON file into the configured output (and
+        data/latest.json), keeping the first row seen for each post id.
+        """
+        files = sorted(self._worker_output_dir().glob("*.ndjson"))
+        seen: set = set()
+        with self._open_writers(self._open_output(self._output_file())) as writer:
+            for path in files:
+                for chunk in _chunked(iter_rows(path, "ndjson", self.codec), 1000):
+                    fresh = []
+                    for row in chunk:
+                        key = str(row.get("id"))
+                        if key not in seen:
+                            seen.add(key)
+                            fresh.append(Post.from_dict(row))
+                    writer.write_rows(fresh)
+        logger.info("Collected %d rows from %d worker files into %s", writer.rows_written, len(files), writer.writers[0].out_path)
+        self._log_entities(writer.writers[0])
+        return writer.rows_written
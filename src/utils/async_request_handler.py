@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .http_cache import CacheMiss
+from .request_handler import _DONE, RawProfile, RequestHandler, T
+from .retry_policy import SUCCESS, FetchError, classify, parse_retry_after, status_error
+
+logger = logging.getLogger("async_request_handler")
+
+class TokenBucket:
+    """
+    Per-host token bucket. `rate` tokens are added per second up to `burst`;
+    each request consumes one token and waits (without blocking the loop)
+    when the bucket is empty. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+async def _prefetch_async(source: AsyncIterator[Any], lookahead: int) -> AsyncIterator[Any]:
+    """
+    Async counterpart of request_handler._prefetch: a task drives `source`,
+    keeping at most `lookahead` items ready ahead of the consumer.
+    """
+    if lookahead <= 0:
+        async for item in source:
+            yield item
+        return
+    ready: "asyncio.Queue[Tuple[bool, Any]]" = asyncio.Queue(maxsize=lookahead)
+
+    async def produce() -> None:
+        try:
+            async for item in source:
+                await ready.put((True, item))
+            await ready.put((True, _DONE))
+        except Exception as e:
+            await ready.put((False, e))
+        finally:
+            await source.aclose()  # type: ignore[attr-defined]
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            ok, item = await ready.get()
+            if not ok:
+                raise item
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        producer.cancel()
+
+class _LoopThread:
+    """Event loop running in a daemon thread so sync callers can submit coroutines."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="async-http", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable[Any]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+@dataclass
+class AsyncRequestHandler(RequestHandler):
+    """
+    aiohttp-based transport with the same `fetch_user_posts` contract as
+    RequestHandler, except that it is a coroutine. Keeps a pooled keep-alive
+    connector, rate limits each host with a token bucket and backs off with
+    asyncio.sleep so other fetches continue while one is waiting.
+
+    Sync callers (the Runner) use `submit()` which schedules the coroutine on
+    a private event loop thread and returns a concurrent.futures.Future.
+    """
+
+    def __post_init__(self):
+        # The base sets up the shared settings and the lazy requests session,
+        # so inherited sync helpers keep working on this handler too
+        super().__post_init__()
+        concurrency = int(self.settings.get("concurrency", 1) or 1)
+        self.pool_size = int(self.settings.get("http_pool_size") or max(concurrency, 10))
+        self.pool_per_host = int(self.settings.get("http_pool_per_host") or 0)
+        self.keepalive_timeout = float(self.settings.get("http_keepalive_timeout", 30))
+        self.rate_per_host = float(self.settings.get("rate_limit_per_host") or 0)
+        self.rate_burst = int(self.settings.get("rate_limit_burst") or 1)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._session = None
+        self._loop_thread: _LoopThread | None = None
+
+    # -------------------- Public API --------------------
+
+    async def fetch_user_posts(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        since: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async counterpart of RequestHandler.fetch_user_posts."""
+        return (await self.fetch_raw(username, limit, since)).posts
+
+    async def fetch_parsed(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        since: Optional[Dict[str, Any]] = None,
+        parse: Callable[[List[Dict[str, Any]]], List[T]] = list,
+    ) -> List[T]:
+        """
+        Async counterpart of RequestHandler.fetch_parsed. `parse` runs on the
+        event loop thread, like page decoding, while the requests for the
+        next pages are in flight.
+        """
+        rows: List[T] = []
+        pages = self._iter_user_posts_async(username, limit, since)
+        try:
+            while True:
+                with self.metrics.timer("fetch"):
+                    try:
+                        page = await pages.__anext__()
+                    except StopAsyncIteration:
+                        return rows
+                rows.extend(parse(page))
+        finally:
+            await pages.aclose()
+
+    async def fetch_raw(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        since: Optional[Dict[str, Any]] = None,
+    ) -> RawProfile:
+        """Async counterpart of RequestHandler.fetch_raw."""
+        return RawProfile(await self.fetch_parsed(username, limit, since))
+
+    def submit(self, coro: Awaitable[Any]) -> Future:
+        if self._loop_thread is None:
+            self._loop_thread = _LoopThread()
+        return self._loop_thread.submit(coro)
+
+    def close(self) -> None:
+        if self._loop_thread is None:
+            return
+        self._loop_thread.submit(self._aclose()).result()
+        self._loop_thread.stop()
+        self._loop_thread = None
+
+    def __enter__(self) -> "AsyncRequestHandler":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    # -------------------- Internal helpers --------------------
+
+    async def _iter_user_posts_async(
+        self, username: str, limit: Optional[int], since: Optional[Dict[str, Any]]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Async counterpart of RequestHandler.iter_user_posts."""
+        if self.mock:
+            yield self._newer_than(self._mock_posts(username, limit), since)
+            return
+
+        produced = False
+        try:
+            async for page in _prefetch_async(self._iter_pages_async(username, limit, since), self.prefetch_pages):
+                produced = True
+                yield page
+        except CacheMiss:
+            raise
+        except Exception as e:
+            if produced:
+                raise FetchError(f"pagination for @{username} stopped early: {e}") from e
+            if isinstance(e, FetchError):
+                # Including PermanentFetchError: deleted or private, nothing to retry
+                raise
+            raise FetchError(f"live fetch for @{username} failed: {e}") from e
+
+    def _get_session(self):
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError as e:  # pragma: no cover - optional dependency
+                raise RuntimeError("http_backend 'async' requires aiohttp (pip install aiohttp)") from e
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self._default_headers(),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _aclose(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate_per_host, self.rate_burst)
+        return bucket
+
+    async def _iter_pages_async(
+        self, username: str, limit: Optional[int], since: Optional[Dict[str, Any]]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Async counterpart of RequestHandler._iter_pages; _prefetch_async runs it ahead of the caller."""
+        body = await self._get_with_retries(self._profile_url(username))
+        page = self._extract_page(body)
+        if page is None:
+            self._check_private(body, username)
+            with self.metrics.timer("extract"):
+                posts = self._posts_from_links(body, username, limit)
+            yield self._newer_than(posts, since)
+            return
+
+        remaining = limit or None
+        owner_id = page.owner_id
+        while True:
+            posts, remaining, more = self._take_page(page._replace(owner_id=owner_id), remaining, since)
+            if posts:
+                yield posts
+            if not more:
+                return
+            assert owner_id is not None and page.cursor is not None
+            cursor = page.cursor
+            nxt = self._extract_page(await self._get_with_retries(self._feed_page_url(owner_id, cursor)))
+            if nxt is None or nxt.cursor == cursor:
+                return
+            page = nxt
+
+    async def _get_with_retries(self, url: str) -> bytes:
+        cached = self._cache_lookup(url)
+        if cached is not None and (cached.fresh or self.cache_only):
+            return cached.body
+        headers = cached.validators() if cached is not None else {}
+
+        session = self._get_session()
+        bucket = self._bucket(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._wait_turn_async()
+            await bucket.acquire()
+            sent_at = time.monotonic()
+            status: Optional[int] = None
+            retry_after: Optional[float] = None
+            try:
+                async with session.get(url, headers=headers) as resp:
+                    self.metrics.observe("http_request", time.monotonic() - sent_at)
+                    status = resp.status
+                    if status == 304 and cached is not None:
+                        self.retry.record(SUCCESS, sent_at=sent_at)
+                        self.cache.refresh(url)
+                        return cached.body
+                    if status == 200:
+                        body = await resp.read()
+                        self.retry.record(SUCCESS, sent_at=sent_at)
+                        self.metrics.inc("bytes_downloaded", len(body))
+                        self._cache_store(url, body, resp.headers)
+                        return body
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    err: Exception = status_error(status)
+            except Exception as e:
+                # Network error, timeout or a body that broke off mid-read
+                status, err = None, e
+            outcome = classify(status)
+            self.retry.record(outcome, retry_after, sent_at)
+            self.metrics.inc(f"http_{outcome}")
+            delay = self.retry.retry_delay(attempt, outcome, retry_after)
+            if delay is None:
+                raise err
+            logger.debug("GET %s attempt %d failed (%s, %s); retrying in %.1fs", url, attempt, outcome, err, delay)
+            self.metrics.inc("retries")
+            self.metrics.inc("retry_sleep_seconds", delay)
+            await asyncio.sleep(delay)
+
+    async def _wait_turn_async(self) -> None:
+        delay = self.retry.reserve()
+        while delay > 0:
+            self.metrics.inc("pacing_wait_seconds", delay)
+            await asyncio.sleep(delay)
+            delay = self.retry.paused_for()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("checkpoint_store")
+
+class CheckpointStore:
+    """
+    Per-username high-water marks for incremental scraping, persisted as a
+    small JSON document. Each entry records the newest post seen and the
+    shortcodes of pinned posts already exported:
+    {"id", "shortcode", "timestamp", "pinned", "updatedAt"}.
+    Every save() is an atomic replace, so an interrupted run never leaves a
+    truncated file behind.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._data: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            try:
+                self._data = json.loads(path.read_text(encoding="utf-8"))
+            except Exception:
+                logger.warning("Unreadable checkpoint file %s; starting from scratch.", path)
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        return self._data.get(username)
+
+    # Profiles pin at most a few posts; older entries are long unpinned
+    MAX_PINNED = 10
+
+    def advance(self, username: str, rows: Iterable[Dict[str, Any]]) -> bool:
+        """
+        Move the mark for `username` to the newest of `rows`. Pinned posts
+        sit at the top of the feed regardless of age, so they never move the
+        timestamp mark; their shortcodes are remembered instead, so the next
+        run recognizes them. Returns True when the entry changed.
+        """
+        newest: Optional[Dict[str, Any]] = None
+        pinned: List[str] = []
+        for r in rows:
+            if r.get("pinned"):
+                if r.get("shortcode"):
+                    pinned.append(r["shortcode"])
+            elif newest is None or r.get("timestamp", 0) > newest.get("timestamp", 0):
+                newest = r
+        current = self._data.get(username) or {}
+        known = list(current.get("pinned") or [])
+        fresh_pins = [sc for sc in pinned if sc not in known]
+        moved = newest is not None and newest.get("timestamp", 0) > current.get("timestamp", 0)
+        if not moved and not fresh_pins:
+            return False
+        entry = dict(current)
+        if moved:
+            assert newest is not None
+            entry.update(id=newest.get("id"), shortcode=newest.get("shortcode"), timestamp=newest.get("timestamp", 0))
+        entry["pinned"] = (known + fresh_pins)[-self.MAX_PINNED:]
+        entry["updatedAt"] = int(time.time())
+        self._data[username] = entry
+        return True
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar exporters (Parquet and Arrow IPC) built on the optional pyarrow
+dependency. Rows are buffered only up to one row group / record batch and
+flushed as the run progresses, so memory stays bounded.
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Low-cardinality string columns stored dictionary-encoded
+DICTIONARY_COLUMNS = ("username", "mediaType", "locationName", "locationSlug")
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:  # pragma: no cover - optional dependency
+        raise RuntimeError("parquet/arrow output requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+def arrow_schema(table: str = "posts"):
+    """Arrow schema for one of json_exporter.TABLE_COLUMNS' tables."""
+    pa = _pyarrow()
+    dict_str = pa.dictionary(pa.int32(), pa.string())
+    if table == "users":
+        return pa.schema([("username", pa.string()), ("fullName", pa.string()), ("profilePicUrl", pa.string())])
+    location = [
+        ("locationId", pa.string()),
+        ("locationName", dict_str),
+        ("locationSlug", dict_str),
+        ("locationHasPublicPage", pa.bool_()),
+    ]
+    if table == "locations":
+        return pa.schema(location)
+    tagged_user = pa.struct([("fullName", pa.string()), ("profilePicUrl", pa.string()), ("username", pa.string())])
+    if table == "post_refs":
+        entities = [("taggedUsernames", pa.list_(pa.string())), ("locationId", pa.string())]
+    else:
+        entities = [("taggedUsers", pa.list_(tagged_user))]
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("username", dict_str),
+            ("shortcode", pa.string()),
+            ("caption", pa.string()),
+            ("timestamp", pa.timestamp("s", tz="UTC")),
+            ("likes", pa.int64()),
+            ("comments", pa.int64()),
+            ("mediaType", dict_str),
+            ("displayUrl", pa.string()),
+            ("thumbnailUrl", pa.string()),
+            ("dimensions_width", pa.int32()),
+            ("dimensions_height", pa.int32()),
+            *entities,
+            ("isAffiliate", pa.bool_()),
+            ("isPaidPartnership", pa.bool_()),
+            ("commentsDisabled", pa.bool_()),
+            ("pinned", pa.bool_()),
+            *(location if table == "posts" else []),
+        ]
+    )
+
+class _RunDictionary:
+    """
+    Run-wide dictionary for one column. It only ever grows, so each batch's
+    dictionary extends the previous one and Arrow IPC can emit deltas
+    instead of forbidden replacements.
+    """
+
+    def __init__(self) -> None:
+        self.index: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, pa, column: List[Optional[str]]):
+        codes: List[Optional[int]] = []
+        for v in column:
+            if v is None:
+                codes.append(None)
+                continue
+            code = self.index.get(v)
+            if code is None:
+                code = self.index[v] = len(self.values)
+                self.values.append(v)
+            codes.append(code)
+        return pa.DictionaryArray.from_arrays(pa.array(codes, pa.int32()), pa.array(self.values, pa.string()))
+
+class _ColumnarWriter:
+    """Same interface as json_exporter.RowWriter; writes to a .tmp sibling and renames on close."""
+
+    def __init__(
+        self, out_path: Path, batch_rows: int = 65536, compression: Optional[str] = "zstd", table: str = "posts"
+    ):
+        self.pa = _pyarrow()
+        self.out_path = out_path
+        self.batch_rows = max(1, int(batch_rows))
+        self.compression = compression or None
+        self.schema = arrow_schema(table)
+        self.dictionary_columns = [n for n in DICTIONARY_COLUMNS if n in self.schema.names]
+        self.rows_written = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._closed = False
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        self._target = out_path.with_name(out_path.name + ".tmp")
+        self._open()
+
+    def _open(self) -> None:
+        raise NotImplementedError
+
+    def _write_batch(self, batch) -> None:
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        raise NotImplementedError
+
+    def _dictionary_array(self, name: str, column: List[Optional[str]]):
+        return self.pa.array(column, self.schema.field(name).type)
+
+    def _to_batch(self, rows: List[Dict[str, Any]]):
+        pa = self.pa
+        arrays = []
+        for field in self.schema:
+            column = [r.get(field.name) for r in rows]
+            if field.name == "locationId":
+                column = [None if v is None else str(v) for v in column]
+            if field.name in self.dictionary_columns:
+                arrays.append(self._dictionary_array(field.name, column))
+            else:
+                arrays.append(pa.array(column, field.type))
+        return pa.record_batch(arrays, schema=self.schema)
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._write_batch(self._to_batch(self._buffer))
+            self._buffer = []
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for r in rows:
+            self._buffer.append(r)
+            self.rows_written += 1
+            if len(self._buffer) >= self.batch_rows:
+                self._flush()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._flush()
+        self._finish()
+        os.replace(self._target, self.out_path)
+
+    def abort(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._buffer = []
+        try:
+            self._finish()
+        finally:
+            self._target.unlink(missing_ok=True)
+
+    def __enter__(self) -> "_ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class ParquetWriter(_ColumnarWriter):
+    """One row group per `batch_rows` rows; dictionaries are per row group."""
+
+    def _open(self) -> None:
+        import pyarrow.parquet as pq
+
+        self._writer = pq.ParquetWriter(str(self._target), self.schema, compression=self.compression or "none")
+
+    def _write_batch(self, batch) -> None:
+        self._writer.write_batch(batch, row_group_size=self.batch_rows)
+
+    def _finish(self) -> None:
+        self._writer.close()
+
+class ArrowIpcWriter(_ColumnarWriter):
+    """Arrow IPC file (Feather v2) with dictionary deltas across record batches."""
+
+    def _open(self) -> None:
+        import pyarrow.ipc as ipc
+
+        self._dictionaries = {name: _RunDictionary() for name in self.dictionary_columns}
+        options = ipc.IpcWriteOptions(compression=self.compression, emit_dictionary_deltas=True)
+        self._sink = self.pa.OSFile(str(self._target), "wb")
+        self._writer = ipc.new_file(self._sink, self.schema, options=options)
+
+    def _dictionary_array(self, name: str, column: List[Optional[str]]):
+        return self._dictionaries[name].encode(self.pa, column)
+
+    def _write_batch(self, batch) -> None:
+        self._writer.write_batch(batch)
+
+    def _finish(self) -> None:
+        self._writer.close()
+        self._sink.close()
+
+def iter_columnar_rows(path: Path, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Stream rows back batch by batch; timestamps come back as epoch seconds."""
+    pa = _pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        batches: Iterable[Any] = pq.ParquetFile(str(path)).iter_batches()
+    else:
+        import pyarrow.ipc as ipc
+
+        reader = ipc.open_file(pa.memory_map(str(path), "r"))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        idx = batch.schema.get_field_index("timestamp")
+        if idx < 0:
+            yield from batch.to_pylist()
+            continue
+        # Parquet stores second timestamps as milliseconds; normalize first
+        ts = batch.column(idx).cast(pa.timestamp("s", tz="UTC")).cast(pa.int64()).to_pylist()
+        for row, t in zip(batch.to_pylist(), ts):
+            row["timestamp"] = t
+            yield row
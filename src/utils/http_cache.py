@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("http_cache")
+
+class CacheMiss(RuntimeError):
+    """Raised in cache-only (offline) mode when a URL was never stored."""
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating a stale entry."""
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class HttpCache:
+    """
+    SQLite-backed response cache keyed by the SHA-256 of the URL.
+    Entries carry their own TTL and validators (ETag / Last-Modified); once
+    the total body size exceeds `max_bytes` the least recently used entries
+    are evicted. Safe to share between threads; WAL mode lets several
+    processes use the same file.
+
+    The total size is tracked incrementally instead of summed per put. Other
+    processes sharing the file are not seen in it, so it is recounted every
+    `RECOUNT_EVERY` puts and before anything is evicted.
+    """
+
+    RECOUNT_EVERY = 256
+
+    def __init__(self, path: Path, ttl: float = 3600, max_bytes: int = 512 * 1024 * 1024):
+        import sqlite3
+
+        self.path = path
+        self.ttl = float(ttl)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, url TEXT NOT NULL, body BLOB NOT NULL,"
+            " etag TEXT, last_modified TEXT, stored_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(accessed_at)")
+        self._total = self._recount()
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """Return the stored entry (fresh or stale) and mark it as recently used."""
+        k = self.key(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, expires_at FROM responses WHERE key = ?", (k,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), k))
+            entry = CacheEntry(body=row[0], etag=row[1], last_modified=row[2], expires_at=row[3])
+            if entry.fresh:
+                self.hits += 1
+            else:
+                self.stale += 1
+        return entry
+
+    def put(
+        self,
+        url: str,
+        body: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else float(ttl))
+        k = self.key(url)
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (k,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, url, body, etag, last_modified, stored_at, expires_at, accessed_at, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (k, url, body, etag, last_modified, now, expires, now, len(body)),
+            )
+            self.stores += 1
+            self._total += len(body) - (old[0] if old else 0)
+            self._puts_since_recount += 1
+            if self._puts_since_recount >= self.RECOUNT_EVERY:
+                self._total = self._recount()
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def refresh(self, url: str, ttl: Optional[float] = None) -> None:
+        """Extend the lifetime of an entry after a 304 Not Modified."""
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else float(ttl))
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (expires, now, self.key(url)),
+            )
+            self.revalidated += 1
+
+    def _recount(self) -> int:
+        self._puts_since_recount = 0
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self) -> None:
+        # Another process may have evicted already; only an exact total counts here
+        self._total = self._recount()
+        if self._total <= self.max_bytes:
+            return
+        excess = self._total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._total -= freed
+        self.evictions += len(victims)
+        logger.debug("Evicted %d cache entries (%d bytes)", len(victims), freed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "revalidated": self.revalidated,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy readers for username lists, so a run can start on a million-entry
+input without loading it first.
+
+Formats, chosen by file suffix (a trailing .gz is decompressed on the fly):
+- .ndjson / .jsonl: one JSON value per line, either "name" or an object
+  with a "username" key (other keys are ignored).
+- .json: a JSON array of the same values, decoded element by element.
+- anything else: plain text, one username per line; blank lines and
+  lines starting with "#" are skipped.
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import IO, Any, Iterator, Optional
+
+from .serialization import JsonCodec, get_codec
+
+_CHUNK = 1 << 16
+_WHITESPACE = " \t\r\n"
+
+def _open_text(path: Path) -> IO[str]:
+    if path.suffix.lower() == ".gz":
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+def input_format(path: Path) -> str:
+    """"ndjson", "json" or "text" for `path`, ignoring a trailing .gz."""
+    name = path.name.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".json"):
+        return "json"
+    return "text"
+
+def _username(value: Any, where: str) -> str:
+    if isinstance(value, dict):
+        value = value.get("username")
+    if not isinstance(value, str):
+        raise ValueError(f"{where}: expected a username string or an object with \"username\", got {value!r}")
+    return value
+
+def _iter_text(f: IO[str]) -> Iterator[str]:
+    for line in f:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+def _iter_ndjson(f: IO[str], path: Path, codec: JsonCodec) -> Iterator[str]:
+    for n, line in enumerate(f, 1):
+        if line.strip():
+            yield _username(codec.loads(line), f"{path}:{n}")
+
+def _iter_json_array(f: IO[str], path: Path) -> Iterator[str]:
+    """
+    Stream the elements of a top-level JSON array. Each element is decoded
+    with raw_decode as soon as it is complete in the buffer; an element cut
+    off at the buffer end is retried after the next read.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        chunk = f.read(_CHUNK)
+        buf, pos = buf[pos:] + chunk, 0
+        eof = not chunk
+        return bool(chunk)
+
+    def skip(chars: str) -> Optional[str]:
+        """Advance past `chars`; returns the next character, or None at EOF."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return None
+
+    while True:
+        ch = skip(_WHITESPACE)
+        if not started:
+            if ch != "[":
+                raise ValueError(f"{path} must be a JSON array of usernames (strings).")
+            started = True
+            pos += 1
+            continue
+        if ch == "]":
+            return
+        if ch is None:
+            raise ValueError(f"{path}: unterminated JSON array")
+        if ch == ",":
+            pos += 1
+            continue
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof or not fill():
+                    raise ValueError(f"{path}: invalid JSON near offset {pos}") from None
+                continue
+            # A number or literal that ends exactly at the buffer edge may continue in the next chunk
+            if end == len(buf) and not eof and fill():
+                continue
+            break
+        pos = end
+        yield _username(value, str(path))
+
+def iter_usernames(path: Path, codec: Optional[JsonCodec] = None) -> Iterator[str]:
+    """Yield the usernames listed in `path` one at a time; see the module docstring for formats."""
+    fmt = input_format(path)
+    with _open_text(path) as f:
+        if fmt == "ndjson":
+            yield from _iter_ndjson(f, path, codec or get_codec())
+        elif fmt == "json":
+            yield from _iter_json_array(f, path)
+        else:
+            yield from _iter_text(f)
@@ -1,35 +1,354 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import csv
 import json
+import logging
+import os
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 
-def export_json(rows: Iterable[Dict[str, Any]], out_path: Path) -> None:
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(list(rows), f, ensure_ascii=False, indent=2)
+from .post_record import Post
+from .serialization import JsonCodec, get_codec
 
-def export_csv(rows: List[Dict[str, Any]], out_path: Path) -> None:
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    if not rows:
-        out_path.write_text("", encoding="utf-8")
-        return
-    # stable column order
-    cols = [
-        "id", "username", "shortcode", "caption", "timestamp",
-        "likes", "comments", "mediaType", "displayUrl", "thumbnailUrl",
-        "dimensions_width", "dimensions_height", "isAffiliate", "isPaidPartnership",
-        "commentsDisabled", "pinned", "locationId", "locationName",
-        "locationSlug", "locationHasPublicPage", "taggedUsers"
-    ]
-    # flatten taggedUsers as JSON string
-    with out_path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=cols, extrasaction="ignore")
-        writer.writeheader()
+logger = logging.getLogger("json_exporter")
+
+# Writers accept Post records and plain dicts (entity tables, rows read back)
+Row = Union[Post, Dict[str, Any]]
+
+# stable column order
+CSV_COLUMNS = [
+    "id", "username", "shortcode", "caption", "timestamp",
+    "likes", "comments", "mediaType", "displayUrl", "thumbnailUrl",
+    "dimensions_width", "dimensions_height", "isAffiliate", "isPaidPartnership",
+    "commentsDisabled", "pinned", "locationId", "locationName",
+    "locationSlug", "locationHasPublicPage", "taggedUsers"
+]
+
+# Column order per table. "posts" is the regular denormalized output; the
+# normalized export mode writes "post_refs" (entities replaced by keys) plus
+# the "users" and "locations" tables.
+_ENTITY_FIELDS = ("locationName", "locationSlug", "locationHasPublicPage", "taggedUsers")
+TABLE_COLUMNS = {
+    "posts": CSV_COLUMNS,
+    "post_refs": [c for c in CSV_COLUMNS if c not in _ENTITY_FIELDS] + ["taggedUsernames"],
+    "users": ["username", "fullName", "profilePicUrl"],
+    "locations": ["locationId", "locationName", "locationSlug", "locationHasPublicPage"],
+}
+
+def _as_dict(row: Row) -> Dict[str, Any]:
+    return row.as_dict() if isinstance(row, Post) else row
+
+def _csv_value(value: Any) -> Any:
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+
+def _truncate_partial_line(path: Path, line_end: bytes) -> int:
+    """
+    Cut `path` back to just after its last `line_end`, dropping the partial
+    row a crash mid-write leaves behind. Returns the number of bytes removed.
+    """
+    try:
+        f = path.open("r+b")
+    except FileNotFoundError:
+        return 0
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        keep, pos = 0, size
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            # Read slightly past `pos` so a terminator split across blocks is found
+            block = f.read(min(size, pos + len(line_end) - 1) - start)
+            i = block.rfind(line_end)
+            if i != -1:
+                keep = start + i + len(line_end)
+                break
+            pos = start
+        if keep < size:
+            f.truncate(keep)
+        return size - keep
+
+class RowWriter:
+    """
+    Base class for incremental exporters. Rows are written as they arrive so
+    memory stays flat regardless of the total row count.
+
+    Unless `append` is set, output goes to a temporary sibling file that
+    replaces `out_path` on a successful close(), so readers never observe a
+    half-written file and a crashed run leaves the previous output intact.
+    """
+
+    # True for writers whose rows are the compact JSON text of the row dict;
+    # TeeWriter encodes such rows once for all of them (see write_encoded)
+    compact_json = False
+    codec: Optional[JsonCodec] = None
+    # What every complete row ends with; an appended file is cut back to it
+    line_end = b"\n"
+
+    def __init__(self, out_path: Path, append: bool = False):
+        self.out_path = out_path
+        self.append = append
+        self.rows_written = 0
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        if append:
+            self._target = out_path
+            dropped = _truncate_partial_line(out_path, self.line_end)
+            if dropped:
+                logger.warning("Dropped a %d-byte partial row at the end of %s", dropped, out_path)
+            self._fh = out_path.open("a", encoding="utf-8", newline="")
+        else:
+            self._target = out_path.with_name(out_path.name + ".tmp")
+            self._fh = self._target.open("w", encoding="utf-8", newline="")
+        self._closed = False
+        self._open()
+
+    def _open(self) -> None:
+        pass
+
+    def _write(self, row: Row) -> None:
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        pass
+
+    def write_rows(self, rows: Iterable[Row]) -> None:
         for r in rows:
-            r2 = dict(r)
-            if isinstance(r2.get("taggedUsers"), (list, dict)):
-                r2["taggedUsers"] = json.dumps(r2["taggedUsers"], ensure_ascii=False)
-            writer.writerow(r2)
\ No newline at end of file
+            self._write(r)
+            self.rows_written += 1
+        self._fh.flush()
+
+    def _write_text(self, text: str) -> None:
+        raise NotImplementedError
+
+    def write_encoded(self, texts: Iterable[str]) -> None:
+        """Write rows already encoded by `self.codec` (compact_json writers only)."""
+        for t in texts:
+            self._write_text(t)
+            self.rows_written += 1
+        self._fh.flush()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._finish()
+        self._fh.close()
+        if not self.append:
+            os.replace(self._target, self.out_path)
+
+    def abort(self) -> None:
+        """Discard the output of a failed run, keeping any previous file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._fh.close()
+        if not self.append:
+            self._target.unlink(missing_ok=True)
+
+    def __enter__(self) -> "RowWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class JsonArrayWriter(RowWriter):
+    """
+    Streams a JSON array. With indent=2 the bytes match json.dump(rows,
+    indent=2); with indent=None (or 0) the array is compact, one line.
+    """
+
+    def __init__(self, out_path: Path, indent: Optional[int] = 2, codec: Optional[JsonCodec] = None):
+        self.indent = indent or None
+        self.codec = codec or get_codec()
+        self.compact_json = self.indent is None
+        super().__init__(out_path)
+
+    def _open(self) -> None:
+        self._fh.write("[")
+
+    def _write(self, row: Row) -> None:
+        if self.indent is None:
+            self._write_text(self.codec.dumps(_as_dict(row)))
+            return
+        pad = " " * self.indent
+        self._fh.write(",\n" if self.rows_written else "\n")
+        text = self.codec.dumps(_as_dict(row), self.indent)
+        self._fh.write(pad + text.replace("\n", "\n" + pad))
+
+    def _write_text(self, text: str) -> None:
+        self._fh.write("," if self.rows_written else "")
+        self._fh.write(text)
+
+    def _finish(self) -> None:
+        self._fh.write("\n]" if self.rows_written and self.indent is not None else "]")
+
+class NdjsonWriter(RowWriter):
+    """One compact JSON object per line; supports appending to an existing file."""
+
+    compact_json = True
+
+    def __init__(self, out_path: Path, append: bool = False, codec: Optional[JsonCodec] = None):
+        self.codec = codec or get_codec()
+        super().__init__(out_path, append=append)
+
+    def _write(self, row: Row) -> None:
+        self._write_text(self.codec.dumps(_as_dict(row)))
+
+    def _write_text(self, text: str) -> None:
+        self._fh.write(text)
+        self._fh.write("\n")
+
+class CsvWriter(RowWriter):
+    """CSV with a fixed column order; list/dict fields (taggedUsers) are flattened to JSON strings."""
+
+    # csv.writer ends records with \r\n; a bare \n may sit inside a quoted caption
+    line_end = b"\r\n"
+
+    def __init__(self, out_path: Path, append: bool = False, columns: Optional[List[str]] = None):
+        self.columns = tuple(columns or CSV_COLUMNS)
+        super().__init__(out_path, append=append)
+
+    def _open(self) -> None:
+        import csv
+
+        self._writer = csv.writer(self._fh)
+        # An appended file already has its header
+        self._needs_header = not (self.append and self._fh.tell() > 0)
+
+    def _write(self, row: Row) -> None:
+        if self._needs_header:
+            self._writer.writerow(self.columns)
+            self._needs_header = False
+        if isinstance(row, Post):
+            self._writer.writerow(row.as_csv_row(self.columns))
+        else:
+            self._writer.writerow([_csv_value(row.get(c)) for c in self.columns])
+
+class TeeWriter:
+    """
+    Fans every batch of rows out to several writers. Rows bound for more
+    than one compact JSON writer with the same codec are encoded only once.
+    """
+
+    def __init__(self, writers: List[RowWriter]):
+        self.writers = writers
+
+    @property
+    def rows_written(self) -> int:
+        return self.writers[0].rows_written if self.writers else 0
+
+    def write_rows(self, rows: Iterable[Row]) -> None:
+        rows = rows if isinstance(rows, list) else list(rows)
+        shared = [w for w in self.writers if getattr(w, "compact_json", False)]
+        texts: Optional[List[str]] = None
+        if len(shared) > 1 and all(w.codec is shared[0].codec for w in shared):
+            codec = shared[0].codec
+            assert codec is not None
+            texts = [codec.dumps(_as_dict(r)) for r in rows]
+        for w in self.writers:
+            if texts is not None and w in shared:
+                w.write_encoded(texts)
+            else:
+                w.write_rows(rows)
+
+    def close(self) -> None:
+        for w in self.writers:
+            w.close()
+
+    def abort(self) -> None:
+        for w in self.writers:
+            w.abort()
+
+    def __enter__(self) -> "TeeWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+OUTPUT_SUFFIXES = {"json": ".json", "ndjson": ".ndjson", "csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+def open_writer(
+    fmt: str,
+    out_path: Path,
+    append: bool = False,
+    table: str = "posts",
+    codec: Optional[JsonCodec] = None,
+    indent: Optional[int] = 2,
+    **options: Any,
+) -> RowWriter:
+    """
+    Create the streaming writer for `output_format` (json, ndjson, csv,
+    parquet or arrow). `table` (a TABLE_COLUMNS key) fixes the columns of
+    the CSV and columnar formats. `codec` encodes the JSON formats and
+    `indent` applies to the JSON array (None for compact). `options`
+    (batch_rows, compression) only apply to the columnar formats.
+    """
+    fmt = fmt.lower()
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"unknown table {table!r}")
+    if fmt in COLUMNAR_FORMATS:
+        if append:
+            raise ValueError(f"{fmt} output cannot be appended to; use ndjson or csv")
+        from .columnar_exporter import ArrowIpcWriter, ParquetWriter
+
+        cls = ParquetWriter if fmt == "parquet" else ArrowIpcWriter
+        return cls(out_path, table=table, **options)  # type: ignore[return-value]
+    if fmt == "csv":
+        return CsvWriter(out_path, append=append, columns=TABLE_COLUMNS[table])
+    if fmt == "ndjson":
+        return NdjsonWriter(out_path, append=append, codec=codec)
+    if append:
+        raise ValueError("JSON array output cannot be appended to; use ndjson or csv")
+    return JsonArrayWriter(out_path, indent=indent, codec=codec)
+
+def export_json(rows: Iterable[Row], out_path: Path) -> None:
+    with JsonArrayWriter(out_path) as w:
+        w.write_rows(rows)
+
+def export_csv(rows: Iterable[Row], out_path: Path) -> None:
+    with CsvWriter(out_path) as w:
+        w.write_rows(rows)
+
+def iter_rows(path: Path, fmt: str, codec: Optional[JsonCodec] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Read back rows previously written by open_writer(fmt, path). NDJSON and
+    CSV are streamed line by line; a JSON array has to be loaded whole.
+    A missing file yields nothing. An NDJSON file whose last line is cut
+    off (the writer crashed mid-row) yields every complete row and logs the
+    rest; damage anywhere else still raises.
+    """
+    if not path.exists():
+        return
+    fmt = fmt.lower()
+    if fmt in COLUMNAR_FORMATS:
+        from .columnar_exporter import iter_columnar_rows
+
+        yield from iter_columnar_rows(path, fmt)
+        return
+    codec = codec or get_codec()
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            import csv
+
+            yield from csv.DictReader(f)
+        elif fmt == "ndjson":
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = codec.loads(line)
+                except ValueError:
+                    # Only the final line can lack its newline
+                    if line.endswith("\n"):
+                        raise
+                    logger.warning("Skipping a partial last line in %s", path)
+                    return
+                yield row
+        else:
+            yield from codec.loads(f.read())
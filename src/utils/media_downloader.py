@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+Optional media stage: downloads the images and videos a row points at
+(`displayUrl`, `thumbnailUrl`) while the scrape is still running.
+
+- Transfers run on a thread pool sharing one pooled requests.Session, at
+  most `media_per_host` at a time per host, and bodies are streamed to
+  disk in `media_chunk_size` chunks.
+- An interrupted transfer leaves a file under `partial/`. The next attempt
+  (a retry, or a later run) continues it with a Range request, guarded by
+  If-Range so a changed file is fetched again from the start. Bytes are
+  written as they arrive, so even a file smaller than one chunk resumes;
+  with urllib3 1.x only whole chunks are kept.
+- Finished files are stored by the SHA-256 of their content
+  (`objects/ab/abcdef....jpg`), so media shared by several posts or
+  reposted is kept once. Within a run each URL is fetched once.
+- `manifest.ndjson` gets one line per post linking its `id` to the local
+  files. URLs already stored by an earlier run are not fetched again; when
+  a post appears more than once, its last line wins.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .json_exporter import NdjsonWriter, Row, iter_rows
+from .metrics import NULL_METRICS, Metrics
+from .retry_policy import SUCCESS, RetryPolicy, classify, parse_retry_after, status_error
+from .serialization import JsonCodec
+
+logger = logging.getLogger("media_downloader")
+
+MEDIA_FIELDS = ("displayUrl", "thumbnailUrl")
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-")
+
+def _extension(url: str, content_type: Optional[str]) -> str:
+    """File suffix from the URL path, else from the Content-Type; may be empty."""
+    suffix = PurePosixPath(urlsplit(url).path).suffix.lower()
+    if 1 < len(suffix) <= 6 and suffix[1:].isalnum():
+        return suffix
+    if content_type:
+        return mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+    return ""
+
+def _body_chunks(resp: requests.Response, size: int) -> Iterator[bytes]:
+    """
+    A streamed body as it arrives, at most `size` bytes at a time. Unlike
+    iter_content, urllib3 2's read1() returns short reads, so the bytes
+    received before a connection breaks off are not lost with the
+    incomplete chunk.
+    """
+    read1 = getattr(resp.raw, "read1", None)
+    if read1 is None:
+        yield from resp.iter_content(size)
+        return
+    while True:
+        chunk = read1(size)
+        if not chunk:
+            return
+        yield chunk
+
+def _validator(headers: Any) -> Optional[str]:
+    """If-Range value for a response: a strong ETag, else Last-Modified."""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+class MediaDownloader:
+    """
+    Fetches the media of submitted rows in the background. Use as a context
+    manager: leaving it waits for the queued downloads and closes the
+    manifest. A URL that still fails after `max_retries` attempts is
+    recorded in the manifest with its error and tried again on the next run.
+    """
+
+    def __init__(
+        self,
+        settings: Dict[str, Any],
+        repo_root: Path,
+        metrics: Metrics = NULL_METRICS,
+        codec: Optional[JsonCodec] = None,
+    ):
+        self.settings = settings
+        self.media_dir = Path(repo_root) / settings.get("media_dir", "data/media")
+        self.objects_dir = self.media_dir / "objects"
+        self.partial_dir = self.media_dir / "partial"
+        self.manifest_path = self.media_dir / "manifest.ndjson"
+        self.fields = tuple(settings.get("media_fields") or MEDIA_FIELDS)
+        self.concurrency = max(1, int(settings.get("media_concurrency", 8)))
+        self.per_host = max(1, int(settings.get("media_per_host", 4)))
+        self.chunk_size = max(1024, int(settings.get("media_chunk_size", 65536)))
+        self.timeout = float(settings.get("request_timeout", 15))
+        self.metrics = metrics
+        self.counts: Counter = Counter()
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": settings.get("user_agent", "Mozilla/5.0"),
+            "Accept": "image/*,video/*,*/*;q=0.8",
+            # Range offsets count stored bytes, so bodies must not be re-encoded in transit
+            "Accept-Encoding": "identity",
+        })
+
+        self._rng = random.Random(str(settings.get("random_seed", "bitbash")))
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Tuple[threading.BoundedSemaphore, RetryPolicy]] = {}
+        # url -> manifest file entry; stored files from earlier runs plus every result of this one
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._done_posts: set = set()
+        self._load_manifest(codec)
+
+        self._manifest = NdjsonWriter(self.manifest_path, append=True, codec=codec)
+        self._manifest_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="media")
+        # Posts queued but not finished; submit() blocks beyond this so the backlog stays bounded
+        self._backlog = threading.BoundedSemaphore(self.concurrency * 4)
+
+    def _load_manifest(self, codec: Optional[JsonCodec]) -> None:
+        for entry in iter_rows(self.manifest_path, "ndjson", codec):
+            files = entry.get("files") or {}
+            complete = True
+            for f in files.values():
+                if f.get("sha256") and (self.media_dir / f["path"]).exists():
+                    self._results[f["url"]] = f
+                else:
+                    complete = False
+            if complete:
+                self._done_posts.add(str(entry.get("id")))
+            else:
+                self._done_posts.discard(str(entry.get("id")))
+        if self._results:
+            logger.info("Media manifest lists %d stored files for %d posts", len(self._results), len(self._done_posts))
+
+    # -------------------- Public API --------------------
+
+    def submit(self, rows: Iterable[Row]) -> None:
+        """Queue the media of `rows`; blocks while the download backlog is full."""
+        for row in rows:
+            post_id = str(row.get("id"))
+            urls = [(f, row.get(f)) for f in self.fields if row.get(f)]
+            if not urls or post_id in self._done_posts:
+                continue
+            self._backlog.acquire()
+            try:
+                fut = self._pool.submit(self._download_post, post_id, row.get("username"), urls)
+            except BaseException:
+                self._backlog.release()
+                raise
+            fut.add_done_callback(self._post_done)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        self._manifest.close()
+        self.session.close()
+        logger.info("Media stats: %s", self.stats())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+    def __enter__(self) -> "MediaDownloader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            # Downloads that already started finish; queued ones are dropped
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self.close()
+
+    # -------------------- Per post --------------------
+
+    def _post_done(self, fut: Future) -> None:
+        self._backlog.release()
+        if not fut.cancelled() and fut.exception() is not None:
+            logger.error("Media download failed: %s", fut.exception())
+
+    def _download_post(self, post_id: str, username: Optional[str], urls: List[Tuple[str, str]]) -> None:
+        files = {field: self._fetch_once(url) for field, url in urls}
+        with self._manifest_lock:
+            self._manifest.write_rows([{"id": post_id, "username": username, "files": files}])
+        self._count("posts")
+
+    def _fetch_once(self, url: str) -> Dict[str, Any]:
+        """Manifest entry for `url`; concurrent requests for the same URL wait for the first one."""
+        with self._lock:
+            known = self._results.get(url)
+            fut = self._inflight.get(url) if known is None else None
+            owner = known is None and fut is None
+            if owner:
+                fut = self._inflight[url] = Future()
+        if known is not None:
+            self._count("reused")
+            return known
+        assert fut is not None
+        if not owner:
+            self._count("reused")
+            return fut.result()
+        try:
+            entry = self._download(url)
+        except Exception as e:
+            logger.warning("Could not download %s: %s", url, e)
+            self._count("failed")
+            entry = {"url": url, "error": f"{type(e).__name__}: {e}"}
+        with self._lock:
+            self._results[url] = entry
+            del self._inflight[url]
+        fut.set_result(entry)
+        return entry
+
+    # -------------------- Transfer --------------------
+
+    def _host(self, url: str) -> Tuple[threading.BoundedSemaphore, RetryPolicy]:
+        """Connection slots and retry/pacing state of the URL's host."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = (
+                    threading.BoundedSemaphore(self.per_host),
+                    RetryPolicy.from_settings(self.settings, self._rng),
+                )
+            return state
+
+    def _partial_path(self, url: str) -> Path:
+        return self.partial_dir / (hashlib.sha256(url.encode("utf-8")).hexdigest() + ".part")
+
+    def _download(self, url: str) -> Dict[str, Any]:
+        slots, retry = self._host(url)
+        part = self._partial_path(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            status: Optional[int] = None
+            retry_after: Optional[float] = None
+            with slots:
+                sent_at = self._wait_turn(retry)
+                try:
+                    with self.metrics.timer("media_download"):
+                        headers = self._resume_headers(part)
+                        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+                            status = resp.status_code
+                            if status in (200, 206):
+                                entry = self._receive(url, resp, part)
+                                retry.record(SUCCESS, sent_at=sent_at)
+                                return entry
+                            if status == 416:
+                                # The partial file is not a prefix of what the server has now
+                                self._discard(part)
+                            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                            err: Exception = status_error(status)
+                except Exception as e:
+                    # Network error, timeout or a body that broke off mid-read
+                    status, err = None, e
+            outcome = classify(status)
+            retry.record(outcome, retry_after, sent_at)
+            delay = retry.retry_delay(attempt, outcome, retry_after)
+            if delay is None:
+                raise err
+            logger.debug("GET %s attempt %d failed (%s, %s); retrying in %.1fs", url, attempt, outcome, err, delay)
+            self._count("retries")
+            time.sleep(delay)
+
+    def _wait_turn(self, retry: RetryPolicy) -> float:
+        delay = retry.reserve()
+        while delay > 0:
+            time.sleep(delay)
+            delay = retry.paused_for()
+        return time.monotonic()
+
+    @staticmethod
+    def _resume_headers(part: Path) -> Dict[str, str]:
+        try:
+            offset = part.stat().st_size
+        except FileNotFoundError:
+            return {}
+        if not offset:
+            return {}
+        headers = {"Range": f"bytes={offset}-"}
+        validator = part.with_suffix(".validator")
+        if validator.exists():
+            headers["If-Range"] = validator.read_text(encoding="utf-8")
+        return headers
+
+    @staticmethod
+    def _discard(part: Path) -> None:
+        part.unlink(missing_ok=True)
+        part.with_suffix(".validator").unlink(missing_ok=True)
+
+    def _receive(self, url: str, resp: requests.Response, part: Path) -> Dict[str, Any]:
+        """Stream the body into `part`, appending on 206, and move the finished file into the store."""
+        hasher = hashlib.sha256()
+        offset = 0
+        if resp.status_code == 206:
+            m = _CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+            offset = part.stat().st_size if part.exists() else 0
+            if m is None or int(m.group(1)) != offset:
+                self._discard(part)
+                raise IOError(f"unexpected Content-Range {resp.headers.get('Content-Range')!r} for offset {offset}")
+            with part.open("rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    hasher.update(chunk)
+            self._count("resumed")
+        else:
+            # A full body: either a fresh start or the server refused the range (If-Range mismatch)
+            validator = _validator(resp.headers)
+            if validator:
+                part.with_suffix(".validator").write_text(validator, encoding="utf-8")
+            else:
+                part.with_suffix(".validator").unlink(missing_ok=True)
+
+        expected = resp.headers.get("Content-Length")
+        received = 0
+        with part.open("ab" if offset else "wb") as f:
+            for chunk in _body_chunks(resp, self.chunk_size):
+                f.write(chunk)
+                hasher.update(chunk)
+                received += len(chunk)
+        self._count("bytes", received)
+        if expected is not None and received < int(expected):
+            raise IOError(f"connection closed after {received} of {expected} bytes")
+        return self._store(url, part, hasher.hexdigest(), offset + received, resp.headers.get("Content-Type"))
+
+    def _store(self, url: str, part: Path, digest: str, size: int, content_type: Optional[str]) -> Dict[str, Any]:
+        """Move a finished download to its content address, or drop it if that content is already stored."""
+        bucket = self.objects_dir / digest[:2]
+        existing = next(bucket.glob(digest + "*"), None) if bucket.exists() else None
+        if existing is not None:
+            target = existing
+            self._discard(part)
+            self._count("deduplicated")
+        else:
+            target = bucket / (digest + _extension(url, content_type))
+            bucket.mkdir(parents=True, exist_ok=True)
+            os.replace(part, target)
+            part.with_suffix(".validator").unlink(missing_ok=True)
+            self._count("stored")
+        return {
+            "url": url,
+            "sha256": digest,
+            "path": target.relative_to(self.media_dir).as_posix(),
+            "bytes": size,
+            "contentType": content_type,
+        }
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counts[name] += value
+        self.metrics.inc(f"media_{name}", value)
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Run instrumentation: per-stage latency histograms and counters, reported
+as a JSON file and/or Prometheus text format, plus an optional profiler.
+
+Everything goes through a Metrics object. When no sink is configured the
+runner uses NULL_METRICS, whose methods do nothing, so the hot path costs
+one no-op call per event.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("metrics")
+
+# Upper bounds (seconds) of the latency buckets; the last bucket is +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def metrics_enabled(settings: Dict[str, Any]) -> bool:
+    """True when any metrics sink is configured."""
+    return bool(
+        settings.get("metrics_report") or settings.get("metrics_prometheus") or settings.get("metrics_port")
+    )
+
+class Histogram:
+    """Fixed-bucket histogram; cheap to update and to merge across processes."""
+
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding rank q."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = BUCKETS[i - 1] if i > 0 else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(self.max, lo + (hi - lo) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"counts": list(self.counts), "count": self.count, "sum": self.sum, "max": self.max}
+
+    def merge(self, data: Dict[str, Any]) -> None:
+        for i, n in enumerate(data["counts"]):
+            self.counts[i] += n
+        self.count += data["count"]
+        self.sum += data["sum"]
+        self.max = max(self.max, data["max"])
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+class Metrics:
+    """
+    Thread-safe registry of counters and stage histograms. Stage names
+    used by the scraper: http_request, fetch, extract, normalize, export,
+    media_download.
+    """
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+
+    def timer(self, name: str) -> _Timer:
+        """`with metrics.timer("export"): ...` records the block's wall time."""
+        return _Timer(self, name)
+
+    # -------------------- Cross-process --------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Plain-data copy (marshal/JSON safe) for shipping out of a worker process."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {k: h.to_dict() for k, h in self.histograms.items()},
+            }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        with self._lock:
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, data in snapshot["histograms"].items():
+                hist = self.histograms.get(name)
+                if hist is None:
+                    hist = self.histograms[name] = Histogram()
+                hist.merge(data)
+
+    # -------------------- Sinks --------------------
+
+    def report(self) -> Dict[str, Any]:
+        """Summary for the JSON report: counters plus count/total/p50/p90/p99/max per stage."""
+        with self._lock:
+            stages = {
+                name: {
+                    "count": h.count,
+                    "total_s": round(h.sum, 6),
+                    "mean_s": round(h.sum / h.count, 6) if h.count else 0.0,
+                    "p50_s": round(h.quantile(0.50), 6),
+                    "p90_s": round(h.quantile(0.90), 6),
+                    "p99_s": round(h.quantile(0.99), 6),
+                    "max_s": round(h.max, 6),
+                }
+                for name, h in sorted(self.histograms.items())
+            }
+            counters = dict(sorted(self.counters.items()))
+        return {
+            "started_at": int(self.started),
+            "elapsed_s": round(time.time() - self.started, 3),
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def prometheus(self, prefix: str = "igscraper") -> str:
+        """Prometheus text exposition format (counters and stage histograms)."""
+        lines: List[str] = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{prefix}_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {_number(value)}"]
+            if self.histograms:
+                metric = f"{prefix}_stage_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for name, h in sorted(self.histograms.items()):
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS + (float("inf"),), h.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{stage="{name}"}} {h.sum:.6f}')
+                    lines.append(f'{metric}_count{{stage="{name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class NullMetrics(Metrics):
+    """Instrumentation switched off: every call is a no-op."""
+
+    enabled = False
+
+    def inc(self, name: str, value: float = 1) -> None:
+        pass
+
+    def observe(self, name: str, seconds: float) -> None:
+        pass
+
+    def timer(self, name: str) -> "_NullTimer":
+        return _NULL_TIMER
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        pass
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+_NULL_TIMER = _NullTimer()
+NULL_METRICS = NullMetrics()
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+def write_json_report(metrics: Metrics, path: Path) -> None:
+    _write_atomic(path, json.dumps(metrics.report(), indent=2))
+
+def write_prometheus(metrics: Metrics, path: Path) -> None:
+    """Textfile for node_exporter's textfile collector (atomically replaced)."""
+    _write_atomic(path, metrics.prometheus())
+
+class MetricsServer:
+    """Serves GET /metrics in Prometheus format from a daemon thread, for long-running workers."""
+
+    def __init__(self, metrics: Metrics, port: int, host: str = "127.0.0.1"):
+        import http.server
+
+        owner = metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = owner.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Serving metrics on http://%s:%d/metrics", host, self._server.server_port)
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+# -------------------- Profiling --------------------
+
+class SamplingProfiler:
+    """
+    Low-overhead wall-clock sampler: every `interval` seconds it records the
+    stack of every thread. Output is in folded-stack format
+    ("frame;frame;frame count"), ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        _write_atomic(path, "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common()))
+
+@contextmanager
+def profiling(mode: Optional[str], path: Path, interval: float = 0.005) -> Iterator[None]:
+    """
+    Profile the enclosed block. mode "cprofile" writes a pstats file
+    (deterministic, main thread only); "sample" writes folded stacks of all
+    threads. Any other value profiles nothing.
+    """
+    mode = (mode or "").lower()
+    if mode == "cprofile":
+        import cProfile
+
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            prof.dump_stats(str(path))
+            logger.info("cProfile stats written to %s (python -m pstats %s)", path, path)
+    elif mode == "sample":
+        sampler = SamplingProfiler(interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write(path)
+            logger.info("%d stack samples written to %s", sum(sampler.samples.values()), path)
+    else:
+        yield
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Post: the internal row type between normalization and export.
+
+A __slots__ object with 21 attributes is a fraction of the size of the
+equivalent 21-key dict, and the exporters read its attributes directly.
+Dicts, CSV rows and marshal tuples are built from it only at the output or
+process boundary.
+"""
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Field order of the normalized schema (and of the JSON output)
+POST_FIELDS: Tuple[str, ...] = (
+    "id", "username", "shortcode", "caption", "timestamp",
+    "likes", "comments", "mediaType", "displayUrl", "thumbnailUrl",
+    "dimensions_width", "dimensions_height", "taggedUsers", "isAffiliate",
+    "isPaidPartnership", "commentsDisabled", "pinned", "locationId",
+    "locationName", "locationSlug", "locationHasPublicPage",
+)
+_FIELD_SET = frozenset(POST_FIELDS)
+_values = attrgetter(*POST_FIELDS)
+
+@lru_cache(maxsize=None)
+def _csv_plan(columns: Tuple[str, ...]) -> Tuple[Callable[[Any], Tuple[Any, ...]], Tuple[int, ...]]:
+    """Tuple getter for `columns` (None for non-fields) plus the positions that hold lists."""
+    getters = [attrgetter(c) if c in _FIELD_SET else (lambda _: None) for c in columns]
+    if len(columns) > 1 and all(c in _FIELD_SET for c in columns):
+        fetch = attrgetter(*columns)
+    else:
+        # attrgetter of a single name returns the bare value, not a 1-tuple
+        fetch = lambda p: tuple(g(p) for g in getters)
+    return fetch, tuple(i for i, c in enumerate(columns) if c == "taggedUsers")
+
+class Post:
+    """
+    One normalized post. Supports the read-only part of the mapping API
+    (`get`, `[]`, `in`, `items`) so code written against row dicts keeps
+    working.
+    """
+
+    __slots__ = POST_FIELDS
+
+    def __init__(
+        self,
+        id: str,
+        username: str,
+        shortcode: str,
+        caption: str,
+        timestamp: int,
+        likes: int,
+        comments: int,
+        mediaType: str,
+        displayUrl: str,
+        thumbnailUrl: str,
+        dimensions_width: int,
+        dimensions_height: int,
+        taggedUsers: List[Dict[str, str]],
+        isAffiliate: bool,
+        isPaidPartnership: bool,
+        commentsDisabled: bool,
+        pinned: bool,
+        locationId: Any,
+        locationName: Optional[str],
+        locationSlug: Optional[str],
+        locationHasPublicPage: Optional[bool],
+    ):
+        self.id = id
+        self.username = username
+        self.shortcode = shortcode
+        self.caption = caption
+        self.timestamp = timestamp
+        self.likes = likes
+        self.comments = comments
+        self.mediaType = mediaType
+        self.displayUrl = displayUrl
+        self.thumbnailUrl = thumbnailUrl
+        self.dimensions_width = dimensions_width
+        self.dimensions_height = dimensions_height
+        self.taggedUsers = taggedUsers
+        self.isAffiliate = isAffiliate
+        self.isPaidPartnership = isPaidPartnership
+        self.commentsDisabled = commentsDisabled
+        self.pinned = pinned
+        self.locationId = locationId
+        self.locationName = locationName
+        self.locationSlug = locationSlug
+        self.locationHasPublicPage = locationHasPublicPage
+
+    # -------------------- Conversions --------------------
+
+    def as_tuple(self) -> Tuple[Any, ...]:
+        """Positional form in POST_FIELDS order; what crosses process boundaries."""
+        return _values(self)
+
+    @classmethod
+    def from_tuple(cls, values: Tuple[Any, ...]) -> "Post":
+        return cls(*values)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(POST_FIELDS, _values(self)))
+
+    @classmethod
+    def from_dict(cls, row: Dict[str, Any]) -> "Post":
+        return cls(*(row.get(f) for f in POST_FIELDS))
+
+    def as_csv_row(self, columns: Sequence[str]) -> List[Any]:
+        """Values for csv.writer in `columns` order; taggedUsers becomes a JSON string."""
+        fetch, list_positions = _csv_plan(tuple(columns))
+        out = list(fetch(self))
+        for i in list_positions:
+            out[i] = json.dumps(out[i], ensure_ascii=False)
+        return out
+
+    # -------------------- Mapping compatibility --------------------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _FIELD_SET else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in _FIELD_SET
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(POST_FIELDS, _values(self))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Post):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    # Mutable, and taggedUsers is a list: equal by value but not hashable
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"Post(id={self.id!r}, username={self.username!r}, shortcode={self.shortcode!r})"
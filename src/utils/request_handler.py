@@ -2,99 +2,509 @@
 from __future__ import annotations
 
 import hashlib
+import json
 import logging
+import queue
 import random
+import re
+import threading
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, TypeVar
+from urllib.parse import quote
 
-import requests
+from .http_cache import CacheEntry, CacheMiss, HttpCache
+from .metrics import NULL_METRICS, Metrics
+from .serialization import JsonCodec, get_codec
+from .retry_policy import SUCCESS, FetchError, PermanentFetchError, RetryPolicy, classify, parse_retry_after, status_error
+
+if TYPE_CHECKING:
+    import requests
 
 logger = logging.getLogger("request_handler")
 
+T = TypeVar("T")
+
+# shortcode ends at next slash, quote, backslash, query/fragment char or space
+_SHORTCODE_RE = re.compile(rb"/p/([^/\"'\\?& ]+)")
+# Script payloads that carry the profile timeline as JSON
+_BLOB_START_RE = re.compile(
+    rb"window\._sharedData\s*=\s*(?=\{)"
+    rb"|window\.__additionalDataLoaded\(\s*(?:'[^']*'|\"[^\"]*\")\s*,\s*(?=\{)"
+    rb"|<script type=\"application/json\"[^>]*>(?=\{)"
+)
+_TIMELINE_KEYS = (
+    "edge_owner_to_timeline_media",
+    "xdt_api__v1__feed__user_timeline_graphql_connection",
+)
+_TIMELINE_MARKERS = tuple(k.encode("ascii") for k in _TIMELINE_KEYS)
+_PRIVATE_RE = re.compile(rb'"is_private"\s*:\s*true')
+_decoder = json.JSONDecoder()
+
+# Public GraphQL query that pages through a profile's timeline
+DEFAULT_FEED_QUERY_HASH = "e769aa130647d2354c40ea6a439bfc08"
+
+class RawProfile(NamedTuple):
+    """Unnormalized fetch result: the raw posts of every page that was kept."""
+    posts: List[Dict[str, Any]]
+
+class TimelinePage(NamedTuple):
+    """One page of a profile timeline plus what is needed to request the next one."""
+    posts: List[Dict[str, Any]]
+    cursor: Optional[str]
+    owner_id: Optional[str]
+
+def _unique_shortcodes(html: bytes) -> Iterator[str]:
+    """Distinct /p/ shortcodes in page order; a dict keeps membership O(1)."""
+    seen: Dict[bytes, None] = {}
+    for m in _SHORTCODE_RE.finditer(html):
+        sc = m.group(1)
+        if sc not in seen:
+            seen[sc] = None
+            yield sc.decode("utf-8", errors="replace")
+
+def _find_timeline(obj: Any) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Depth-first search for the timeline connection ({"edges", "page_info"}).
+    Returns (owner, connection), where owner is the dict holding the connection.
+    """
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            for key in _TIMELINE_KEYS:
+                conn = cur.get(key)
+                if isinstance(conn, dict) and isinstance(conn.get("edges"), list):
+                    return cur, conn
+            stack.extend(v for v in cur.values() if isinstance(v, (dict, list)))
+        elif isinstance(cur, list):
+            stack.extend(v for v in cur if isinstance(v, (dict, list)))
+    return None
+
+def _as_page(found: Optional[Tuple[Dict[str, Any], Dict[str, Any]]]) -> Optional[TimelinePage]:
+    if found is None or not found[1]["edges"]:
+        return None
+    owner, conn = found
+    info = conn.get("page_info") or {}
+    cursor = info.get("end_cursor") if info.get("has_next_page") else None
+    owner_id = owner.get("id")
+    return TimelinePage(conn["edges"], cursor or None, str(owner_id) if owner_id else None)
+
+def _timeline_page(body: bytes, loads: Callable[[bytes], Any] = json.loads) -> Optional[TimelinePage]:
+    """
+    Timeline page from either a profile HTML page (first script payload that
+    has one) or a JSON feed response, decoded with `loads`; None when
+    neither carries any edges.
+    """
+    if body.lstrip()[:1] == b"{":
+        try:
+            return _as_page(_find_timeline(loads(body)))
+        except ValueError:
+            return None
+    for m in _BLOB_START_RE.finditer(body):
+        start = m.end()
+        end = body.find(b"</script>", start)
+        blob = body[start:end if end != -1 else len(body)]
+        if not any(marker in blob for marker in _TIMELINE_MARKERS):
+            continue
+        try:
+            data, _ = _decoder.raw_decode(blob.decode("utf-8", errors="replace"))
+        except ValueError:
+            continue
+        page = _as_page(_find_timeline(data))
+        if page is not None:
+            return page
+    return None
+
+def _is_pinned(node: Dict[str, Any]) -> bool:
+    """Pinned flag of a raw post in any payload shape (mock, GraphQL or v1 API)."""
+    return bool(node.get("pinned") or node.get("pinned_for_users") or node.get("timeline_pinned_user_ids"))
+
+_DONE = object()
+
+def _prefetch(source: Iterator[Any], lookahead: int) -> Iterator[Any]:
+    """
+    Drive `source` from a background thread, keeping at most `lookahead`
+    items ready ahead of the consumer. Errors are re-raised in the consumer;
+    closing the generator stops the producer before its next item.
+    """
+    if lookahead <= 0:
+        yield from source
+        return
+    ready: "queue.Queue[Tuple[bool, Any]]" = queue.Queue(maxsize=lookahead)
+    stop = threading.Event()
+
+    def put(item: Tuple[bool, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in source:
+                if not put((True, item)):
+                    return
+            put((True, _DONE))
+        except BaseException as e:
+            put((False, e))
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=produce, name="prefetch", daemon=True).start()
+    try:
+        while True:
+            ok, item = ready.get()
+            if not ok:
+                raise item
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+
 @dataclass
 class RequestHandler:
     settings: Dict[str, Any]
+    cache: Optional[HttpCache] = None
+    metrics: Metrics = NULL_METRICS
 
     def __post_init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(
-            {
-                "User-Agent": self.settings.get(
-                    "user_agent",
-                    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
-                ),
-                "Accept": "application/json,text/html;q=0.9,*/*;q=0.8",
-            }
-        )
+        self._configure()
+        self._http: Optional["requests.Session"] = None
+        self._http_lock = threading.Lock()
+
+    @property
+    def session(self) -> "requests.Session":
+        """
+        Pooled HTTP session, created on first use: mock and cache-only runs
+        never import requests, which is most of this module's import time.
+        """
+        if self._http is None:
+            with self._http_lock:
+                if self._http is None:
+                    import requests
+
+                    session = requests.Session()
+                    session.headers.update(self._default_headers())
+                    self._http = session
+        return self._http
+
+    def _configure(self) -> None:
+        """Read transport-independent settings shared by every backend."""
         self.timeout = int(self.settings.get("request_timeout", 15))
         self.mock = bool(self.settings.get("mock", True))
         self.max_retries = int(self.settings.get("max_retries", 3))
-        seed = str(self.settings.get("random_seed", "bitbash"))
-        random.seed(seed)
+        self.base_url = str(self.settings.get("base_url") or "https://www.instagram.com").rstrip("/")
+        self.cache_only = bool(self.settings.get("cache_only", False))
+        self.page_size = max(1, int(self.settings.get("feed_page_size") or 12))
+        self.prefetch_pages = max(0, int(self.settings.get("prefetch_pages", 2)))
+        self.feed_query_hash = str(self.settings.get("feed_query_hash") or DEFAULT_FEED_QUERY_HASH)
+        if self.cache_only:
+            if self.cache is None:
+                raise ValueError("cache_only requires an HTTP cache (set cache_enabled)")
+            # Offline mode re-parses stored pages, so mock data makes no sense
+            self.mock = False
+        # A private generator: reseeding the global one would reset every other user's sequence
+        self._rng = random.Random(str(self.settings.get("random_seed", "bitbash")))
+        self.retry = RetryPolicy.from_settings(self.settings, self._rng)
+
+    @property
+    def codec(self) -> JsonCodec:
+        # get_codec is cached; resolving it here keeps orjson/msgspec out of mock runs
+        return get_codec(self.settings.get("json_backend"))
+
+    def _default_headers(self) -> Dict[str, str]:
+        return {
+            "User-Agent": self.settings.get(
+                "user_agent",
+                "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+            ),
+            "Accept": "application/json,text/html;q=0.9,*/*;q=0.8",
+        }
+
+    def _profile_url(self, username: str) -> str:
+        return f"{self.base_url}/{username}/"
+
+    def _feed_page_url(self, owner_id: str, cursor: str) -> str:
+        variables = json.dumps({"id": owner_id, "first": self.page_size, "after": cursor}, separators=(",", ":"))
+        return f"{self.base_url}/graphql/query/?query_hash={self.feed_query_hash}&variables={quote(variables)}"
 
     # -------------------- Public API --------------------
 
-    def fetch_user_posts(self, username: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def fetch_user_posts(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        since: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
         """
         Returns a list of raw post dicts.
         In mock mode, generates deterministic fake posts.
-        In live mode, attempts to fetch from the public IG page HTML (best-effort).
+        In live mode, attempts to fetch from the public IG page HTML (best-effort)
+        and follows the timeline cursor for further pages.
+        With a `since` checkpoint ({"shortcode", "timestamp"}), only posts newer
+        than the checkpoint are returned.
+        """
+        return [p for page in self.iter_user_posts(username, limit, since) for p in page]
+
+    def iter_user_posts(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        since: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield raw posts page by page. Up to `prefetch_pages` pages are
+        downloaded ahead while the caller processes the current one. Requests
+        stop as soon as `limit` posts were produced or the `since` checkpoint
+        is reached. A live failure raises FetchError: mock posts would be
+        exported (and a queue item completed) as if they were real, and
+        after the first page the pages already yielded are not the whole feed.
         """
         if self.mock:
-            return self._mock_posts(username, limit)
+            yield self._newer_than(self._mock_posts(username, limit), since)
+            return
 
-        # Best-effort live fetch (may fail due to IG protection; we handle gracefully)
+        produced = False
         try:
-            # Fetch the profile page (HTML). Parsing IG HTML is unstable; we keep it resilient.
-            url = f"https://www.instagram.com/{username}/"
-            html = self._get_with_retries(url)
-            # Very naive extraction of "shortcode" occurrences as an example
-            posts = self._extract_from_html(html, username, limit)
-            return posts
+            for page in _prefetch(self._iter_pages(username, limit, since), self.prefetch_pages):
+                produced = True
+                yield page
+        except CacheMiss:
+            raise
         except Exception as e:
-            logger.warning("Live fetch failed for @%s (%s). Falling back to mock.", username, e)
-            return self._mock_posts(username, limit)
+            if produced:
+                # The caller has an incomplete feed: saving it would move the
+                # checkpoint past the posts that were never fetched
+                raise FetchError(f"pagination for @{username} stopped early: {e}") from e
+            if isinstance(e, FetchError):
+                # Including PermanentFetchError: deleted or private, nothing to retry
+                raise
+            raise FetchError(f"live fetch for @{username} failed: {e}") from e
+
+    def fetch_parsed(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        since: Optional[Dict[str, Any]] = None,
+        parse: Callable[[List[Dict[str, Any]]], List[T]] = list,
+    ) -> List[T]:
+        """
+        Apply `parse` to each page as soon as it arrives, while the next
+        pages download in the background. The rows are only returned after
+        the last page, so a failed pagination leaves the caller nothing to
+        save. Only the waits for pages count as the "fetch" stage.
+        """
+        rows: List[T] = []
+        pages = self.iter_user_posts(username, limit, since)
+        try:
+            while True:
+                with self.metrics.timer("fetch"):
+                    page = next(pages, None)
+                if page is None:
+                    return rows
+                rows.extend(parse(page))
+        finally:
+            pages.close()
+
+    def fetch_raw(
+        self,
+        username: str,
+        limit: Optional[int] = None,
+        since: Optional[Dict[str, Any]] = None,
+    ) -> RawProfile:
+        """
+        fetch_parsed for callers that normalize elsewhere. Following the
+        cursor needs each page's timeline, so pages are decoded on the
+        fetching thread as they arrive. That is about a millisecond per page;
+        a process-pool round trip per page costs the caller more than it
+        saves, so only normalization is left to the parse pool.
+        """
+        return RawProfile(self.fetch_parsed(username, limit, since))
 
     # -------------------- Internal helpers --------------------
 
-    def _get_with_retries(self, url: str) -> str:
-        last_err: Exception | None = None
-        for attempt in range(1, self.max_retries + 1):
+    @staticmethod
+    def _newer_than(posts: List[Dict[str, Any]], since: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return RequestHandler._fresh_prefix(posts, since)[0]
+
+    @staticmethod
+    def _fresh_prefix(
+        posts: List[Dict[str, Any]], since: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Keep the feed prefix that is newer than the checkpoint, and report
+        whether the checkpoint was reached. The feed is newest-first, so the
+        scan stops at the first known post. Pinned posts are out of order:
+        they never end the scan, and are dropped when already exported
+        (listed in the checkpoint) or older than the mark.
+        """
+        if not since:
+            return posts, False
+        known = since.get("shortcode")
+        known_pinned = since.get("pinned") or ()
+        hwm = int(since.get("timestamp") or 0)
+        fresh: List[Dict[str, Any]] = []
+        for p in posts:
+            node = p.get("node", p)
+            sc = node.get("shortcode") or node.get("code")
             try:
-                resp = self.session.get(url, timeout=self.timeout)
-                if resp.status_code == 200:
-                    return resp.text
-                last_err = RuntimeError(f"HTTP {resp.status_code}")
+                ts = int(node.get("taken_at_timestamp") or node.get("timestamp") or node.get("taken_at") or 0)
+            except (TypeError, ValueError):
+                ts = 0
+            if _is_pinned(node):
+                if sc not in known_pinned and not (ts and ts <= hwm):
+                    fresh.append(p)
+                continue
+            if (known and sc == known) or (ts and ts <= hwm):
+                return fresh, True
+            fresh.append(p)
+        return fresh, False
+
+    def _take_page(
+        self, page: TimelinePage, remaining: Optional[int], since: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[int], bool]:
+        """Apply the limit and checkpoint to one page: (posts, remaining, fetch_more)."""
+        posts = page.posts[:remaining] if remaining is not None else page.posts
+        fresh, reached = self._fresh_prefix(posts, since)
+        if remaining is not None:
+            remaining -= len(posts)
+        more = not reached and page.cursor is not None and page.owner_id is not None and remaining != 0
+        return fresh, remaining, more
+
+    def _iter_pages(
+        self, username: str, limit: Optional[int], since: Optional[Dict[str, Any]]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Sequential page loop behind iter_user_posts; each cursor comes from the previous page."""
+        # Fetch the profile page (HTML). Parsing IG HTML is unstable; we keep it resilient.
+        body = self._get_with_retries(self._profile_url(username))
+        page = self._extract_page(body)
+        if page is None:
+            self._check_private(body, username)
+            # The timeline search above already failed; go straight to the links
+            with self.metrics.timer("extract"):
+                posts = self._posts_from_links(body, username, limit)
+            yield self._newer_than(posts, since)
+            return
+
+        remaining = limit or None
+        owner_id = page.owner_id
+        while True:
+            posts, remaining, more = self._take_page(page._replace(owner_id=owner_id), remaining, since)
+            if posts:
+                yield posts
+            if not more:
+                return
+            assert owner_id is not None and page.cursor is not None
+            cursor = page.cursor
+            nxt = self._extract_page(self._get_with_retries(self._feed_page_url(owner_id, cursor)))
+            if nxt is None or nxt.cursor == cursor:
+                return
+            page = nxt
+
+    def _extract_page(self, body: bytes) -> Optional[TimelinePage]:
+        """_timeline_page, timed as the "extract" stage."""
+        with self.metrics.timer("extract"):
+            return _timeline_page(body, self.codec.loads)
+
+    def _cache_lookup(self, url: str) -> Optional[CacheEntry]:
+        """
+        Return the cached entry for `url`, if any. In cache-only mode a stored
+        page is always usable and a missing one raises CacheMiss.
+        """
+        if self.cache is None:
+            return None
+        entry = self.cache.get(url)
+        if entry is None and self.cache_only:
+            raise CacheMiss(f"{url} is not cached (cache_only mode)")
+        return entry
+
+    def _cache_store(self, url: str, body: bytes, headers: Any) -> None:
+        if self.cache is not None:
+            self.cache.put(url, body, headers.get("ETag"), headers.get("Last-Modified"))
+
+    def _get_with_retries(self, url: str) -> bytes:
+        cached = self._cache_lookup(url)
+        if cached is not None and (cached.fresh or self.cache_only):
+            return cached.body
+        headers = cached.validators() if cached is not None else {}
+
+        attempt = 0
+        while True:
+            attempt += 1
+            sent_at = self._wait_turn()
+            status: Optional[int] = None
+            retry_after: Optional[float] = None
+            try:
+                with self.metrics.timer("http_request"):
+                    resp = self.session.get(url, timeout=self.timeout, headers=headers)
+                status = resp.status_code
+                if status == 304 and cached is not None:
+                    self.retry.record(SUCCESS, sent_at=sent_at)
+                    self.cache.refresh(url)
+                    return cached.body
+                if status == 200:
+                    self.retry.record(SUCCESS, sent_at=sent_at)
+                    self.metrics.inc("bytes_downloaded", len(resp.content))
+                    self._cache_store(url, resp.content, resp.headers)
+                    return resp.content
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                err: Exception = status_error(status)
             except Exception as e:
-                last_err = e
-            sleep = min(2 ** attempt, 8) + random.random()
-            logger.debug("GET %s attempt %d failed; retrying in %.1fs", url, attempt, sleep)
-            time.sleep(sleep)
-        assert last_err is not None
-        raise last_err
-
-    def _extract_from_html(self, html: str, username: str, limit: Optional[int]) -> List[Dict[str, Any]]:
+                # Network error, timeout or a body that broke off mid-read
+                status, err = None, e
+            outcome = classify(status)
+            self.retry.record(outcome, retry_after, sent_at)
+            self.metrics.inc(f"http_{outcome}")
+            delay = self.retry.retry_delay(attempt, outcome, retry_after)
+            if delay is None:
+                raise err
+            logger.debug("GET %s attempt %d failed (%s, %s); retrying in %.1fs", url, attempt, outcome, err, delay)
+            self.metrics.inc("retries")
+            self.metrics.inc("retry_sleep_seconds", delay)
+            time.sleep(delay)
+
+    def _wait_turn(self) -> float:
+        """Sleep until the retry policy's pacing and breaker allow the next request; returns the send time."""
+        delay = self.retry.reserve()
+        while delay > 0:
+            self.metrics.inc("pacing_wait_seconds", delay)
+            time.sleep(delay)
+            delay = self.retry.paused_for()
+        return time.monotonic()
+
+    @staticmethod
+    def _check_private(body: bytes, username: str) -> None:
+        """A profile page without a timeline that says is_private: nothing to retry or mock."""
+        if _PRIVATE_RE.search(body):
+            raise PermanentFetchError(f"@{username} is private")
+
+    def _extract_from_html(self, html: bytes | str, username: str, limit: Optional[int]) -> List[Dict[str, Any]]:
+        """
+        Prefer the timeline embedded in the page's JSON script payloads; it
+        carries real captions, counts and timestamps. Otherwise fall back to
+        scanning /p/<shortcode> links. Works on the raw bytes; only the JSON
+        blob itself is decoded.
+        """
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        page = _timeline_page(html, self.codec.loads)
+        if page is not None:
+            return page.posts[:limit] if limit else page.posts
+        return self._posts_from_links(html, username, limit)
+
+    def _posts_from_links(self, html: bytes, username: str, limit: Optional[int]) -> List[Dict[str, Any]]:
+        """Best-effort posts for a page without an embedded timeline: one per /p/ link."""
         # This is intentionally simple; for robust scraping you'd use a proper parser & API.
-        shortcodes = []
-        marker = "/p/"
-        idx = 0
-        while True:
-            i = html.find(marker, idx)
-            if i == -1:
-                break
-            # shortcode ends at next slash or quote
-            j = i + len(marker)
-            k = j
-            while k < len(html) and html[k] not in ['/', '"', "'", '\\', '?', '&', ' ']:
-                k += 1
-            sc = html[j:k]
-            if sc and sc not in shortcodes:
-                shortcodes.append(sc)
-            idx = k
-            if limit and len(shortcodes) >= limit:
-                break
+        shortcodes = list(islice(_unique_shortcodes(html), limit or None))
 
         posts: List[Dict[str, Any]] = []
         for n, sc in enumerate(shortcodes or []):
@@ -105,8 +515,8 @@ class RequestHandler:
                     "shortcode": sc,
                     "caption": "",
                     "timestamp": int(time.time()) - (n * 86400),
-                    "likes": random.randint(100, 10000),
-                    "comments": random.randint(0, 500),
+                    "likes": self._rng.randint(100, 10000),
+                    "comments": self._rng.randint(0, 500),
                     "mediaType": "image",
                     "displayUrl": f"https://www.instagram.com/p/{sc}",
                     "thumbnailUrl": f"https://www.instagram.com/p/{sc}/media",
@@ -117,8 +527,10 @@ class RequestHandler:
                     "pinned": False,
                 }
             )
-        # If nothing found, fallback to mock
-        return posts or self._mock_posts(username, limit)
+        if not posts:
+            # A login wall or a changed page layout; retry rather than invent posts
+            raise FetchError(f"no posts found on the profile page of @{username}")
+        return posts
 
     def _mock_posts(self, username: str, limit: Optional[int]) -> List[Dict[str, Any]]:
         count = limit or 12
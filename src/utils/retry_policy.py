@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger("retry_policy")
+
+SUCCESS = "success"
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# Statuses that will not change on retry: bad request, gone, removed for legal reasons
+_PERMANENT_STATUSES = frozenset({400, 404, 410, 451})
+
+class FetchError(RuntimeError):
+    """A request that failed after the retry policy gave up on it."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class PermanentFetchError(FetchError):
+    """
+    The profile cannot be fetched at all (deleted, renamed, private). Never
+    retried and never replaced by mock data.
+    """
+
+def classify(status: Optional[int]) -> str:
+    """Outcome class of an HTTP status; None stands for a network error or timeout."""
+    if status is None:
+        return TRANSIENT
+    if status in (200, 304):
+        return SUCCESS
+    if status == 429:
+        return THROTTLED
+    if status in _PERMANENT_STATUSES:
+        return PERMANENT
+    return TRANSIENT
+
+def status_error(status: int) -> FetchError:
+    cls = PermanentFetchError if classify(status) == PERMANENT else FetchError
+    return cls(f"HTTP {status}", status)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # email.utils costs ~10 ms to import; only HTTP-date values need it
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+class RetryPolicy:
+    """
+    Retry and pacing decisions shared by every in-flight request of a
+    handler, so one throttled response slows all of them down.
+
+    - Per request: permanent failures are not retried; throttled and
+      transient ones back off exponentially with jitter, never less than the
+      server's Retry-After.
+    - Pacing (AIMD): the first 429 pins the send rate to half of the rate
+      observed just before it, every further 429 halves it again, and each
+      success adds `PACE_STEP` requests/second back. As in TCP, only
+      requests sent after the last slowdown can cause the next one; the
+      rest were already in flight at the old rate.
+    - Circuit breaker: `threshold` slowdowns in a row without a success stop
+      all sending for `cooldown` seconds (doubling per consecutive trip up to
+      `cooldown_max`).
+      A Retry-After on any 429 pauses all sending for at least that long.
+
+    Thread-safe; callers sleep for the returned delays themselves, so it
+    serves the threaded and the asyncio backend alike.
+    """
+
+    PACE_STEP = 0.05
+    MIN_RATE = 0.05
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        threshold: int = 3,
+        cooldown: float = 60.0,
+        cooldown_max: float = 900.0,
+        rng: Optional[random.Random] = None,
+    ):
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.threshold = max(1, int(threshold))
+        self.cooldown = float(cooldown)
+        self.cooldown_max = float(cooldown_max)
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._rate: Optional[float] = None
+        self._next_send = 0.0
+        self._paused_until = 0.0
+        self._sent: Deque[float] = deque(maxlen=32)
+        self._throttle_streak = 0
+        self._trips = 0
+        self._slowed_at = float("-inf")
+        self.counts: Dict[str, int] = {SUCCESS: 0, THROTTLED: 0, TRANSIENT: 0, PERMANENT: 0, "breaker_trips": 0}
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any], rng: Optional[random.Random] = None) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(settings.get("max_retries", 3)),
+            backoff_base=float(settings.get("retry_backoff_base", 1.0)),
+            backoff_max=float(settings.get("retry_backoff_max", 30.0)),
+            threshold=int(settings.get("throttle_threshold", 3)),
+            cooldown=float(settings.get("throttle_cooldown", 60.0)),
+            cooldown_max=float(settings.get("throttle_cooldown_max", 900.0)),
+            rng=rng,
+        )
+
+    # -------------------- Before sending --------------------
+
+    def reserve(self) -> float:
+        """
+        Claim the next send slot; returns how long the caller must wait for
+        it. Pass the time.monotonic() of the actual send to record().
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_send, self._paused_until)
+            if self._rate is not None:
+                self._next_send = start + 1.0 / self._rate
+            self._sent.append(start)
+            return start - now
+
+    def paused_for(self) -> float:
+        """Remaining pause; a caller that slept through its slot re-checks this before sending."""
+        return max(0.0, self._paused_until - time.monotonic())
+
+    # -------------------- After a response --------------------
+
+    def record(self, outcome: str, retry_after: Optional[float] = None, sent_at: Optional[float] = None) -> None:
+        """Feed the outcome of a request sent at `sent_at` into pacing and the breaker."""
+        with self._lock:
+            self.counts[outcome] += 1
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if outcome == SUCCESS:
+                self._throttle_streak = 0
+                self._trips = 0
+                if self._rate is not None:
+                    self._rate += self.PACE_STEP
+            elif outcome == THROTTLED and (sent_at is None or sent_at >= self._slowed_at):
+                self._slow_down(now)
+                self._slowed_at = now
+                self._throttle_streak += 1
+                if self._throttle_streak >= self.threshold:
+                    self._trip(now, retry_after or 0.0)
+
+    def _observed_rate(self, now: float) -> float:
+        """Sends per second over the recent window (ending now)."""
+        if not self._sent:
+            return 1.0
+        return len(self._sent) / max(now - self._sent[0], 1e-3)
+
+    def _slow_down(self, now: float) -> None:
+        current = self._rate if self._rate is not None else self._observed_rate(now)
+        self._rate = max(self.MIN_RATE, current / 2)
+
+    def _trip(self, now: float, retry_after: float) -> None:
+        self._trips += 1
+        self._throttle_streak = 0
+        self.counts["breaker_trips"] += 1
+        pause = max(retry_after, min(self.cooldown_max, self.cooldown * 2 ** (self._trips - 1)))
+        self._paused_until = max(self._paused_until, now + pause)
+        logger.warning(
+            "Throttled %d times in a row; pausing all requests for %.0fs (then %.2f req/s)",
+            self.threshold, pause, self._rate or 0.0,
+        )
+
+    def retry_delay(self, attempt: int, outcome: str, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds to wait before retrying a request that failed on `attempt`
+        (1-based), or None when it must not be retried.
+        """
+        if outcome == PERMANENT or attempt >= self.max_attempts:
+            return None
+        cap = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        delay = cap / 2 + self._rng.uniform(0, cap / 2)
+        return max(delay, retry_after or 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counts, rate=round(self._rate, 3) if self._rate is not None else None)
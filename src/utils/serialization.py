@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+JSON encoding for the exporters and readers, through the fastest codec
+installed: orjson, then msgspec, then the stdlib json module.
+
+Compact output uses "," and ":" without spaces, and indent=2 output
+matches json.dumps(obj, ensure_ascii=False, indent=2). Non-ASCII
+characters are written as UTF-8, not escaped. For the scraper's rows
+(strings, integers, booleans, null) every codec produces the same text.
+Only floats in exponent form may be spelled differently, e.g. 1e16 vs
+1e+16.
+"""
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from typing import Any, Optional, Union
+
+JSON_BACKENDS = ("auto", "orjson", "msgspec", "stdlib")
+
+class JsonCodec:
+    """stdlib json; always available and the fallback of the faster codecs."""
+
+    name = "stdlib"
+
+    def __init__(self) -> None:
+        self._compact = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(self, obj: Any, indent: Optional[int] = None) -> str:
+        if indent:
+            return json.dumps(obj, ensure_ascii=False, indent=indent)
+        return self._compact.encode(obj)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    def __init__(self) -> None:
+        super().__init__()
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj: Any, indent: Optional[int] = None) -> str:
+        if indent and indent != 2:
+            return super().dumps(obj, indent)
+        try:
+            return self._orjson.dumps(obj, option=self._orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+        except TypeError:
+            # Integers beyond 64 bits or non-str keys; stdlib handles both
+            return super().dumps(obj, indent)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._orjson.loads(data)
+
+class MsgspecCodec(JsonCodec):
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        super().__init__()
+        import msgspec
+
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any, indent: Optional[int] = None) -> str:
+        if indent:
+            # msgspec.json.format does not match json.dumps byte for byte
+            return super().dumps(obj, indent)
+        try:
+            return self._encoder.encode(obj).decode("utf-8")
+        except (TypeError, OverflowError):
+            return super().dumps(obj, indent)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._decoder.decode(data)
+
+_CODECS = {"orjson": OrjsonCodec, "msgspec": MsgspecCodec, "stdlib": JsonCodec}
+
+@lru_cache(maxsize=None)
+def get_codec(backend: Optional[str] = "auto") -> JsonCodec:
+    """
+    Codec for the `json_backend` setting. "auto" (the default) picks the
+    first installed of orjson and msgspec, else stdlib. Naming a library
+    that is not installed is an error.
+    """
+    backend = (backend or "auto").lower()
+    if backend == "auto":
+        for name in ("orjson", "msgspec"):
+            try:
+                return _CODECS[name]()
+            except ImportError:
+                continue
+        return JsonCodec()
+    if backend not in _CODECS:
+        raise ValueError(f"json_backend must be one of {', '.join(JSON_BACKENDS)}; got {backend!r}")
+    try:
+        return _CODECS[backend]()
+    except ImportError as e:
+        raise RuntimeError(f"json_backend {backend!r} requires the {backend} package (pip install {backend})") from e
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import logging
+import random
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("work_queue")
+
+# Usernames hash into this many fixed buckets; a "shard i of n" is every
+# bucket with bucket % n == i, so n can change without re-enqueueing.
+SHARD_BUCKETS = 4096
+
+def shard_of(username: str) -> int:
+    """Stable bucket for a username, identical on every host and run."""
+    return zlib.crc32(username.lower().encode("utf-8")) % SHARD_BUCKETS
+
+def parse_shard(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    """"2/8" -> (2, 8); None or "" -> None (all shards)."""
+    if not spec:
+        return None
+    try:
+        index, count = (int(x) for x in spec.split("/", 1))
+    except ValueError:
+        raise ValueError(f"shard must look like INDEX/COUNT, got {spec!r}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be in [0, {count}), got {spec!r}")
+    return index, count
+
+def in_shard(username: str, shard: Optional[Tuple[int, int]]) -> bool:
+    return shard is None or shard_of(username) % shard[1] == shard[0]
+
+class WorkQueue:
+    """
+    Durable queue of usernames in a SQLite file shared by any number of
+    worker processes (WAL mode, claims in IMMEDIATE transactions).
+
+    Each username is enqueued once. A worker claims items under a lease and
+    either completes them or fails them. Failed items come back after an
+    exponential backoff until `max_attempts` is reached. An item whose lease
+    expires, for example because its worker crashed, can be claimed again.
+    Delivery is therefore at-least-once, and consumers dedupe their output.
+
+    States: pending -> leased -> done | pending (retry) | failed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        lease_seconds: float = 600,
+        max_attempts: int = 5,
+        backoff_base: float = 30,
+        backoff_max: float = 3600,
+    ):
+        self.path = path
+        self.lease_seconds = float(lease_seconds)
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " username TEXT PRIMARY KEY, bucket INTEGER NOT NULL,"
+            " state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,"
+            " available_at REAL NOT NULL DEFAULT 0, lease_owner TEXT, lease_expires REAL,"
+            " last_error TEXT, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS items_ready ON items(state, available_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS items_leases ON items(state, lease_expires)")
+
+    # -------------------- Producer side --------------------
+
+    def enqueue(self, usernames: Iterable[str], shard: Optional[Tuple[int, int]] = None, chunk: int = 10_000) -> int:
+        """
+        Add usernames that are not queued yet (any state) and return how many
+        were new. With `shard`, only that shard's usernames are kept, so every
+        host can be handed the same full list. Usernames are lowercased
+        (Instagram handles are case-insensitive), so "Foo" and "foo" are one
+        item. Input is consumed in chunks, so very large lists are never held
+        in memory.
+        """
+        added = 0
+        batch: List[Tuple[str, int, float]] = []
+        now = time.time()
+        for u in usernames:
+            u = u.strip().lstrip("@").lower()
+            if not u or not in_shard(u, shard):
+                continue
+            batch.append((u, shard_of(u), now))
+            if len(batch) >= chunk:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return added
+
+    def _insert(self, rows: List[Tuple[str, int, float]]) -> int:
+        with self._transaction():
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO items (username, bucket, updated_at) VALUES (?, ?, ?)", rows)
+            return self._db.total_changes - before
+
+    # -------------------- Worker side --------------------
+
+    def claim(self, worker_id: str, limit: int = 1, shard: Optional[Tuple[int, int]] = None) -> List[str]:
+        """
+        Lease up to `limit` ready items to `worker_id`: pending items whose
+        backoff has elapsed and leased items whose lease expired. Each claim
+        counts as an attempt, so an item that keeps crashing its worker
+        eventually fails instead of looping forever: an expired lease that
+        already used up `max_attempts` is marked failed, not leased again.
+        """
+        now = time.time()
+        shard_sql, shard_params = "", []
+        if shard is not None:
+            shard_sql, shard_params = " AND bucket % ? = ?", [shard[1], shard[0]]
+        # Two index-ordered scans instead of one OR query that sorts the whole backlog
+        expired = (
+            "SELECT username FROM items WHERE state = 'leased' AND lease_expires < ?"
+            + shard_sql + " ORDER BY lease_expires LIMIT ?"
+        )
+        ready = (
+            "SELECT username FROM items WHERE state = 'pending' AND available_at <= ?"
+            + shard_sql + " ORDER BY available_at LIMIT ?"
+        )
+        with self._transaction():
+            exhausted = self._db.execute(
+                "UPDATE items SET state = 'failed', lease_owner = NULL, lease_expires = NULL,"
+                " last_error = 'lease expired on the last attempt', updated_at = ?"
+                " WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?" + shard_sql,
+                [now, now, self.max_attempts, *shard_params],
+            ).rowcount
+            names = [r[0] for r in self._db.execute(expired, [now, *shard_params, int(limit)])]
+            if len(names) < limit:
+                names += [r[0] for r in self._db.execute(ready, [now, *shard_params, int(limit) - len(names)])]
+            self._db.executemany(
+                "UPDATE items SET state = 'leased', attempts = attempts + 1, lease_owner = ?,"
+                " lease_expires = ?, updated_at = ? WHERE username = ?",
+                [(worker_id, now + self.lease_seconds, now, u) for u in names],
+            )
+        if exhausted:
+            logger.warning("%d items failed: lease expired after %d attempts", exhausted, self.max_attempts)
+        return names
+
+    def renew(self, worker_id: str, usernames: Iterable[str]) -> None:
+        """Extend the leases this worker still holds (heartbeat for slow batches)."""
+        now = time.time()
+        with self._transaction():
+            self._db.executemany(
+                "UPDATE items SET lease_expires = ?, updated_at = ?"
+                " WHERE username = ? AND state = 'leased' AND lease_owner = ?",
+                [(now + self.lease_seconds, now, u, worker_id) for u in usernames],
+            )
+
+    def complete(self, worker_id: str, username: str) -> bool:
+        """
+        Mark an item done. Returns False when the lease had already passed to
+        another worker; that worker's result wins and ours is a duplicate.
+        """
+        with self._transaction():
+            cur = self._db.execute(
+                "UPDATE items SET state = 'done', lease_owner = NULL, lease_expires = NULL,"
+                " last_error = NULL, updated_at = ? WHERE username = ? AND state = 'leased' AND lease_owner = ?",
+                (time.time(), username, worker_id),
+            )
+            return cur.rowcount == 1
+
+    def fail(self, worker_id: str, username: str, error: str, permanent: bool = False) -> None:
+        """
+        Schedule a retry with exponential backoff and jitter, or give up after
+        max_attempts. A `permanent` failure (deleted or private profile) gives
+        up right away.
+        """
+        now = time.time()
+        with self._transaction():
+            row = self._db.execute(
+                "SELECT attempts FROM items WHERE username = ? AND state = 'leased' AND lease_owner = ?",
+                (username, worker_id),
+            ).fetchone()
+            if row is None:
+                return
+            attempts = row[0]
+            if permanent or attempts >= self.max_attempts:
+                state, available_at = "failed", now
+            else:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+                state, available_at = "pending", now + delay * random.uniform(0.5, 1.0)
+            self._db.execute(
+                "UPDATE items SET state = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL,"
+                " last_error = ?, updated_at = ? WHERE username = ?",
+                (state, available_at, error[:1000], now, username),
+            )
+        logger.warning("@%s failed (attempt %d/%d, now %s): %s", username, attempts, self.max_attempts, state, error)
+
+    def release(self, worker_id: str, usernames: Iterable[str]) -> None:
+        """Hand back unfinished leases on a clean shutdown without charging an attempt."""
+        now = time.time()
+        with self._transaction():
+            self._db.executemany(
+                "UPDATE items SET state = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL,"
+                " lease_expires = NULL, updated_at = ? WHERE username = ? AND state = 'leased' AND lease_owner = ?",
+                [(now, u, worker_id) for u in usernames],
+            )
+
+    # -------------------- Maintenance --------------------
+
+    def retry_failed(self) -> int:
+        """Move permanently failed items back to pending with a fresh attempt budget."""
+        with self._transaction():
+            cur = self._db.execute(
+                "UPDATE items SET state = 'pending', attempts = 0, available_at = 0, updated_at = ?"
+                " WHERE state = 'failed'",
+                (time.time(),),
+            )
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        now = time.time()
+        for state, expired, n in self._db.execute(
+            "SELECT state, state = 'leased' AND lease_expires < ?, COUNT(*) FROM items GROUP BY 1, 2", (now,)
+        ):
+            counts[state] = counts.get(state, 0) + n
+            if expired:
+                counts["expired_leases"] = n
+        return counts
+
+    def remaining(self, shard: Optional[Tuple[int, int]] = None) -> int:
+        """Items that are not done or failed yet (in `shard`, if given)."""
+        sql = "SELECT COUNT(*) FROM items WHERE state IN ('pending', 'leased')"
+        params: List[Any] = []
+        if shard is not None:
+            sql += " AND bucket % ? = ?"
+            params += [shard[1], shard[0]]
+        return self._db.execute(sql, params).fetchone()[0]
+
+    def next_ready_in(self, shard: Optional[Tuple[int, int]] = None) -> Optional[float]:
+        """Seconds until the next backoff or lease expiry makes an item claimable."""
+        shard_sql, params = "", []
+        if shard is not None:
+            shard_sql, params = " AND bucket % ? = ?", [shard[1], shard[0]]
+        times = [
+            self._db.execute(f"SELECT MIN({column}) FROM items WHERE state = ?{shard_sql}", [state, *params]).fetchone()[0]
+            for state, column in (("pending", "available_at"), ("leased", "lease_expires"))
+        ]
+        times = [t for t in times if t is not None]
+        at = min(times) if times else None
+        return None if at is None else max(0.0, at - time.time())
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _transaction(self) -> "_Immediate":
+        return _Immediate(self._db)
+
+class _Immediate:
+    """BEGIN IMMEDIATE ... COMMIT, so concurrent claimers serialize on the write lock."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> None:
+        self.db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.db.execute("COMMIT" if exc_type is None else "ROLLBACK")
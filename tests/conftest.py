@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator
+
+import pytest
+
+from benchmarks.stub_server import StubInstagram
+
+@pytest.fixture
+def stub() -> Iterator[StubInstagram]:
+    """40 posts per profile, served 12 per page through the timeline cursor."""
+    with StubInstagram(posts_per_profile=40, page_size=12) as server:
+        yield server
+
+@pytest.fixture
+def live_settings(stub: StubInstagram) -> Dict[str, Any]:
+    """Live-mode settings against the stub, with retries fast enough for tests."""
+    return {
+        "mock": False,
+        "base_url": stub.base_url,
+        "feed_page_size": 12,
+        "max_retries": 2,
+        "retry_backoff_base": 0.01,
+        "retry_backoff_max": 0.02,
+    }
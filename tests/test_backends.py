@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from src.runner import Runner
+from src.utils.async_request_handler import AsyncRequestHandler
+from src.utils.request_handler import RequestHandler
+from src.utils.retry_policy import FetchError
+
+def _fetch(backend: str, settings: Dict[str, Any], username: str, **kwargs: Any) -> List[Dict[str, Any]]:
+    if backend == "async":
+        with AsyncRequestHandler(settings) as arh:
+            return arh.submit(arh.fetch_user_posts(username, **kwargs)).result()
+    return RequestHandler(settings).fetch_user_posts(username, **kwargs)
+
+def _shortcodes(posts: List[Dict[str, Any]]) -> List[str]:
+    return [p.get("node", p)["shortcode"] for p in posts]
+
+@pytest.mark.parametrize("backend", ["threads", "async"])
+def test_follows_cursor_through_every_page(backend, live_settings):
+    posts = _fetch(backend, live_settings, "natgeo")
+    assert len(posts) == 40
+    assert len(set(_shortcodes(posts))) == 40
+
+@pytest.mark.parametrize("kwargs", [{}, {"limit": 20}, {"limit": 5}])
+def test_backends_return_the_same_posts(live_settings, kwargs):
+    threads = _fetch("threads", live_settings, "nasa", **kwargs)
+    assert _shortcodes(_fetch("async", live_settings, "nasa", **kwargs)) == _shortcodes(threads)
+
+def test_since_checkpoint_stops_both_backends(live_settings):
+    everything = _fetch("threads", live_settings, "nasa")
+    node = everything[15].get("node", everything[15])
+    since = {"shortcode": node["shortcode"], "timestamp": node["taken_at_timestamp"]}
+    threads = _fetch("threads", live_settings, "nasa", since=since)
+    assert _shortcodes(threads) == _shortcodes(everything[:15])
+    assert _shortcodes(_fetch("async", live_settings, "nasa", since=since)) == _shortcodes(threads)
+
+@pytest.mark.parametrize("backend", ["threads", "async"])
+def test_pages_are_parsed_as_they_arrive(backend, live_settings, stub):
+    settings = dict(live_settings, prefetch_pages=0)
+    requests_seen: List[int] = []
+
+    def parse(page: List[Dict[str, Any]]) -> List[str]:
+        requests_seen.append(stub.requests)
+        return _shortcodes(page)
+
+    if backend == "async":
+        with AsyncRequestHandler(settings) as arh:
+            rows = arh.submit(arh.fetch_parsed("natgeo", parse=parse)).result()
+    else:
+        rows = RequestHandler(settings).fetch_parsed("natgeo", parse=parse)
+    # Each page is parsed before the next one is downloaded
+    assert requests_seen == [1, 2, 3, 4]
+    assert rows == _shortcodes(_fetch(backend, live_settings, "natgeo"))
+
+@pytest.mark.parametrize("backend", ["threads", "async"])
+@pytest.mark.parametrize("depth, requests", [(0, 1), (1, 3), (2, 4)])
+def test_prefetch_depth_is_the_same_on_both_backends(backend, live_settings, stub, depth, requests):
+    settings = dict(live_settings, prefetch_pages=depth)
+    if backend == "async":
+        async def first_page(arh: AsyncRequestHandler) -> None:
+            pages = arh._iter_user_posts_async("natgeo", None, None)
+            await pages.__anext__()
+            await asyncio.sleep(0.3)
+            await pages.aclose()
+
+        with AsyncRequestHandler(settings) as arh:
+            arh.submit(first_page(arh)).result()
+            seen = stub.requests
+    else:
+        pages = RequestHandler(settings).iter_user_posts("natgeo")
+        next(pages)
+        time.sleep(0.3)
+        seen = stub.requests
+        pages.close()
+    # `depth` pages wait ready, and one more has been downloaded when there is a cursor for it
+    assert seen == requests
+
+@pytest.mark.parametrize("backend", ["threads", "async"])
+@pytest.mark.parametrize("status", [404, 503])
+def test_partial_feed_raises_instead_of_returning_first_page(backend, live_settings, stub, status):
+    stub.feed_status = status
+    with pytest.raises(FetchError, match="stopped early"):
+        _fetch(backend, live_settings, "natgeo")
+
+def test_async_handler_keeps_the_base_handler_state(live_settings):
+    with AsyncRequestHandler(live_settings) as arh:
+        # The inherited sync transport still works on a warm async handler
+        assert arh.session is arh.session
+        assert RequestHandler._get_with_retries(arh, arh._profile_url("natgeo")).startswith(b"<")
+
+@pytest.mark.parametrize("backend", ["threads", "async"])
+def test_metrics_report_times_every_stage(backend, live_settings, tmp_path):
+    settings = dict(live_settings, http_backend=backend, output_path="out.json", metrics_report="report.json")
+    assert Runner(settings, str(tmp_path)).run(["natgeo"]) == 40
+    stages = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))["stages"]
+    assert {"http_request", "fetch", "extract", "normalize", "export"} <= set(stages)
+    # One extraction per timeline page
+    assert stages["extract"]["count"] == 4
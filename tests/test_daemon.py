@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+from typing import Any, Dict
+
+import pytest
+
+from src.daemon import _handle
+from src.runner import Runner
+
+def _reply(tmp_path, request: Dict[str, Any]) -> Dict[str, Any]:
+    runner = Runner({"mock": True, "max_posts_per_profile": 3}, str(tmp_path))
+    return _handle(runner, json.dumps(request))
+
+def test_job_writes_inside_the_data_directory(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "batch.txt").write_text("natgeo\nnasa\n", encoding="utf-8")
+    reply = _reply(tmp_path, {"id": 7, "input": "data/batch.txt", "output_path": "data/jobs/7.json"})
+    assert reply["ok"] and reply["id"] == 7 and reply["rows"] == 6
+    assert reply["output"] == str((tmp_path / "data" / "jobs" / "7.json").resolve())
+
+@pytest.mark.parametrize("request_", [
+    {"usernames": ["natgeo"], "output_path": "../outside.json"},
+    {"usernames": ["natgeo"], "output_path": "/tmp/outside.json"},
+    {"usernames": ["natgeo"], "output_path": "data/link/outside.json"},
+    {"input": "/etc/hostname"},
+    {"input": "data/../requests.txt"},
+])
+def test_paths_outside_the_data_directory_are_refused(tmp_path, request_):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "elsewhere").mkdir()
+    (tmp_path / "data" / "link").symlink_to(tmp_path / "elsewhere")
+    reply = _reply(tmp_path, request_)
+    assert not reply["ok"] and "must be inside" in reply["error"]
+    assert not list((tmp_path / "elsewhere").iterdir())
+    assert not (tmp_path / "outside.json").exists()
+
+def test_unknown_keys_are_refused(tmp_path):
+    reply = _reply(tmp_path, {"usernames": ["natgeo"], "cache_path": "/tmp/x.sqlite", "mock": False})
+    assert not reply["ok"]
+    assert reply["error"] == "ValueError: unknown request keys: cache_path, mock"
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from src.extractors.entity_registry import EntityRegistry
+from src.extractors.profile_posts_parser import normalize_posts
+
+def _node(n: int, tags):
+    return {
+        "id": str(n),
+        "shortcode": f"sc{n}",
+        "timestamp": 1_700_000_000 - n,
+        "tags": tags,
+        "location": {"id": "212988663", "name": " ".join(["Menlo", "Park"]), "slug": "menlo-park", "has_public_page": True},
+    }
+
+KRIS = {"fullName": "Kris Jenner", "profilePicUrl": "https://x/kris.jpg", "username": "krisjenner"}
+
+def test_normalizer_shares_tagged_users_and_locations_across_profiles():
+    entities = EntityRegistry()
+    first = normalize_posts("a", [_node(1, [dict(KRIS)]), _node(2, [dict(KRIS)])], entities)
+    second = normalize_posts("b", [_node(3, [dict(KRIS)])], entities)
+    posts = first + second
+    assert all(p.taggedUsers == [KRIS] for p in posts)
+    assert len({id(p.taggedUsers[0]) for p in posts}) == 1
+    assert len({id(p.locationName) for p in posts}) == 1
+    # Sharing never changes what a post says
+    plain = normalize_posts("a", [_node(1, [KRIS]), _node(2, [KRIS])]) + normalize_posts("b", [_node(3, [KRIS])])
+    assert [p.as_tuple() for p in posts] == [p.as_tuple() for p in plain]
+
+def test_differing_details_are_not_merged_into_one_shared_entry():
+    entities = EntityRegistry()
+    renamed = dict(KRIS, fullName="Kris")
+    a, b = normalize_posts("a", [_node(1, [dict(KRIS)]), _node(2, [renamed])], entities)
+    assert a.taggedUsers[0]["fullName"] == "Kris Jenner"
+    assert b.taggedUsers[0]["fullName"] == "Kris"
+
+def test_tags_without_a_username_are_left_out_of_the_users_table():
+    registry = EntityRegistry()
+    row = normalize_posts("a", [_node(1, [{"fullName": "No Handle", "profilePicUrl": "", "username": ""}, KRIS])])[0]
+    ref = registry.reference(row.as_dict())
+    assert ref["taggedUsernames"] == ["krisjenner"]
+    assert list(registry.users) == ["krisjenner"]
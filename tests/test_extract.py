@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from unittest import mock
+
+from src.utils import request_handler
+from src.utils.request_handler import RequestHandler
+
+def test_page_without_timeline_is_searched_once(live_settings, stub, monkeypatch):
+    monkeypatch.setattr(stub, "page", lambda username: b'<html><a href="/p/AAA/"><a href="/p/BBB/"></html>')
+    handler = RequestHandler(live_settings)
+    with mock.patch.object(request_handler, "_timeline_page", wraps=request_handler._timeline_page) as search:
+        posts = handler.fetch_user_posts("nasa")
+    assert [p["shortcode"] for p in posts] == ["AAA", "BBB"]
+    assert search.call_count == 1
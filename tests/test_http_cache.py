@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from src.utils.http_cache import HttpCache
+
+def test_evicts_least_recently_used_past_the_size_limit(tmp_path):
+    cache = HttpCache(tmp_path / "http.sqlite", max_bytes=250)
+    for n in range(3):
+        cache.put(f"https://x/{n}", b"x" * 100)
+    assert cache.get("https://x/0") is None
+    assert cache.get("https://x/2") is not None
+    assert cache.stats()["bytes"] == 200
+    assert cache.evictions == 1
+
+def test_replacing_an_entry_does_not_count_it_twice(tmp_path):
+    cache = HttpCache(tmp_path / "http.sqlite", max_bytes=250)
+    for _ in range(5):
+        cache.put("https://x/same", b"x" * 100)
+    assert cache.evictions == 0
+    assert cache.stats()["bytes"] == 100
+
+def test_running_total_survives_reopen(tmp_path):
+    path = tmp_path / "http.sqlite"
+    first = HttpCache(path, max_bytes=250)
+    first.put("https://x/a", b"x" * 100)
+    first.put("https://x/b", b"x" * 100)
+    first.close()
+    cache = HttpCache(path, max_bytes=250)
+    cache.put("https://x/c", b"x" * 100)
+    assert cache.get("https://x/a") is None
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+from typing import Any, Dict
+
+from src.runner import Runner
+
+def _runner(tmp_path, settings: Dict[str, Any]) -> Runner:
+    return Runner(dict(settings, incremental=True, output_path="out.json"), str(tmp_path))
+
+def _output(tmp_path) -> list:
+    return json.loads((tmp_path / "out.json").read_text(encoding="utf-8"))
+
+def test_second_run_without_new_posts_reports_none(tmp_path, live_settings):
+    # The stub pins the newest post of every profile
+    assert _runner(tmp_path, live_settings).run(["natgeo"]) == 40
+    assert _runner(tmp_path, live_settings).run(["natgeo"]) == 0
+    assert len(_output(tmp_path)) == 40
+
+def test_pinned_posts_are_remembered_by_shortcode(tmp_path, live_settings):
+    _runner(tmp_path, live_settings).run(["natgeo"])
+    checkpoint = json.loads((tmp_path / "data" / "checkpoints.json").read_text(encoding="utf-8"))["natgeo"]
+    pinned = [row for row in _output(tmp_path) if row["pinned"]]
+    assert checkpoint["pinned"] == [row["shortcode"] for row in pinned]
+    assert checkpoint["timestamp"] == max(row["timestamp"] for row in _output(tmp_path) if not row["pinned"])
+
+def test_failed_pagination_does_not_advance_the_checkpoint(tmp_path, live_settings, stub):
+    stub.feed_status = 404
+    assert _runner(tmp_path, live_settings).run(["natgeo"]) == 0
+    assert not (tmp_path / "data" / "checkpoints.json").exists()
+
+    stub.feed_status = None
+    assert _runner(tmp_path, live_settings).run(["natgeo"]) == 40
+    assert len(_output(tmp_path)) == 40
+
+def test_journal_cut_off_mid_row_is_still_merged(tmp_path, live_settings):
+    _runner(tmp_path, live_settings).run(["natgeo"])
+    saved = dict(_output(tmp_path)[0], id="interrupted", shortcode="interrupted")
+    # A run that crashed while appending its second row
+    line = json.dumps(saved) + "\n"
+    (tmp_path / "out.json.pending.ndjson").write_text(line + line[: len(line) // 2], encoding="utf-8")
+
+    assert _runner(tmp_path, live_settings).run(["natgeo"]) == 0
+    rows = _output(tmp_path)
+    assert len(rows) == 41
+    assert rows[0]["id"] == "interrupted"
+    assert not (tmp_path / "out.json.pending.ndjson").exists()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+import pytest
+import urllib3
+
+from benchmarks.static_server import StaticFileServer
+from src.utils.media_downloader import MediaDownloader
+
+SETTINGS = {"max_retries": 3, "retry_backoff_base": 0.01, "retry_backoff_max": 0.02}
+
+@pytest.mark.skipif(not hasattr(urllib3.response.HTTPResponse, "read1"), reason="urllib3 1.x keeps only whole chunks")
+@pytest.mark.parametrize("size", [40_000, 300_000])
+def test_interrupted_download_resumes_with_a_range_request(tmp_path, size):
+    body = os.urandom(size)
+    with StaticFileServer({"/a.jpg": body}, cut_after=size // 2) as server:
+        with MediaDownloader(dict(SETTINGS), tmp_path) as media:
+            media.submit([{"id": "1", "username": "natgeo", "displayUrl": server.base_url + "/a.jpg"}])
+        assert server.ranged == 1
+        # The second request only asked for what the first one did not deliver
+        assert server.bytes_sent == size
+    assert media.stats()["resumed"] == 1
+    digest = hashlib.sha256(body).hexdigest()
+    assert (tmp_path / "data" / "media" / "objects" / digest[:2] / f"{digest}.jpg").read_bytes() == body
+
+def test_manifest_cut_off_mid_entry_keeps_the_earlier_downloads(tmp_path):
+    body = os.urandom(10_000)
+    post = {"id": "1", "username": "natgeo"}
+    with StaticFileServer({"/a.jpg": body, "/b.jpg": body[::-1]}) as server:
+        with MediaDownloader(dict(SETTINGS), tmp_path) as media:
+            media.submit([dict(post, displayUrl=server.base_url + "/a.jpg")])
+        manifest = tmp_path / "data" / "media" / "manifest.ndjson"
+        # A run that died while recording its next post
+        with manifest.open("a", encoding="utf-8") as f:
+            f.write('{"id": "2", "username": "natgeo", "fil')
+
+        with MediaDownloader(dict(SETTINGS), tmp_path) as media:
+            media.submit([dict(post, displayUrl=server.base_url + "/a.jpg")])
+            media.submit([{"id": "2", "username": "natgeo", "displayUrl": server.base_url + "/b.jpg"}])
+        assert server.requests == 2
+    assert [json.loads(line)["id"] for line in manifest.read_text(encoding="utf-8").splitlines()] == ["1", "2"]
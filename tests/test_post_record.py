@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import pytest
+
+from src.extractors.profile_posts_parser import normalize_posts
+from src.utils.json_exporter import CsvWriter
+from src.utils.post_record import Post
+
+def _post(n: int = 1) -> Post:
+    return normalize_posts("natgeo", [{"id": f"id{n}", "shortcode": f"sc{n}", "timestamp": n}])[0]
+
+def test_posts_compare_by_value_but_are_not_hashable():
+    assert _post() == _post()
+    with pytest.raises(TypeError):
+        hash(_post())
+
+def test_single_column_csv_row_is_one_value():
+    assert _post().as_csv_row(["shortcode"]) == ["sc1"]
+    assert _post().as_csv_row(["taggedUsers"]) == ["[]"]
+
+def test_csv_writer_with_one_column(tmp_path):
+    out = tmp_path / "out.csv"
+    with CsvWriter(out, columns=["shortcode"]) as writer:
+        writer.write_rows([_post(1), _post(2)])
+    assert out.read_text(encoding="utf-8").splitlines() == ["shortcode", "sc1", "sc2"]
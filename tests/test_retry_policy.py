@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import random
+import time
+from email.utils import formatdate
+
+import pytest
+
+from src.utils.retry_policy import (
+    PERMANENT,
+    SUCCESS,
+    THROTTLED,
+    TRANSIENT,
+    FetchError,
+    PermanentFetchError,
+    RetryPolicy,
+    classify,
+    parse_retry_after,
+    status_error,
+)
+
+def _policy(**kwargs) -> RetryPolicy:
+    return RetryPolicy(**dict({"backoff_base": 1.0, "backoff_max": 30.0, "rng": random.Random(1)}, **kwargs))
+
+@pytest.mark.parametrize("status, outcome", [
+    (200, SUCCESS), (304, SUCCESS), (429, THROTTLED), (None, TRANSIENT),
+    (500, TRANSIENT), (503, TRANSIENT), (400, PERMANENT), (404, PERMANENT), (410, PERMANENT), (451, PERMANENT),
+])
+def test_classify(status, outcome):
+    assert classify(status) == outcome
+
+def test_not_found_is_permanent_and_never_retried():
+    err = status_error(404)
+    assert isinstance(err, PermanentFetchError) and err.status == 404
+    assert _policy(max_attempts=5).retry_delay(1, classify(404)) is None
+    assert type(status_error(503)) is FetchError
+
+def test_backoff_grows_with_jitter_and_stops_after_max_attempts():
+    policy = _policy(max_attempts=4, backoff_max=3.0)
+    for attempt, cap in [(1, 1.0), (2, 2.0), (3, 3.0)]:
+        assert cap / 2 <= policy.retry_delay(attempt, TRANSIENT) <= cap
+    assert policy.retry_delay(4, TRANSIENT) is None
+
+@pytest.mark.parametrize("value, seconds", [("120", 120.0), (" 0.5 ", 0.5), ("-3", 0.0), ("", None), (None, None), ("soon", None)])
+def test_parse_retry_after_seconds(value, seconds):
+    assert parse_retry_after(value) == seconds
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after(formatdate(time.time() + 60, usegmt=True)) == pytest.approx(60, abs=2)
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+def test_retry_after_is_honoured():
+    policy = _policy()
+    # Longer than any backoff of the first attempt
+    assert policy.retry_delay(1, THROTTLED, retry_after=10.0) == 10.0
+    # And it pauses every other request too
+    policy.record(THROTTLED, retry_after=10.0)
+    assert policy.paused_for() == pytest.approx(10.0, abs=0.5)
+    assert policy.reserve() == pytest.approx(10.0, abs=0.5)
+
+def test_breaker_opens_after_threshold_and_closes_after_cooldown():
+    policy = _policy(threshold=3, cooldown=0.2)
+    policy.record(THROTTLED)
+    policy.record(THROTTLED)
+    assert policy.paused_for() == 0.0
+    policy.record(THROTTLED)
+    assert policy.counts["breaker_trips"] == 1
+    assert 0.1 < policy.paused_for() <= 0.2
+    time.sleep(0.25)
+    assert policy.paused_for() == 0.0
+    # Another streak right away doubles the cool-down
+    for _ in range(3):
+        policy.record(THROTTLED)
+    assert 0.3 < policy.paused_for() <= 0.4
+
+def test_success_resets_the_throttle_streak():
+    policy = _policy(threshold=3, cooldown=0.2)
+    policy.record(THROTTLED)
+    policy.record(THROTTLED)
+    policy.record(SUCCESS)
+    policy.record(THROTTLED)
+    assert policy.counts["breaker_trips"] == 0
+    assert policy.paused_for() == 0.0
+
+def test_pacing_halves_on_throttle_and_recovers_additively():
+    policy = _policy(threshold=10)
+    assert policy.stats()["rate"] is None
+    policy.record(THROTTLED)
+    # Nothing sent yet: the observed rate counts as 1 request/second
+    assert policy.stats()["rate"] == 0.5
+    # A request sent before that slowdown was already in flight: ignored
+    policy.record(THROTTLED, sent_at=time.monotonic() - 1)
+    assert policy.stats()["rate"] == 0.5
+    policy.record(THROTTLED, sent_at=time.monotonic())
+    assert policy.stats()["rate"] == 0.25
+    policy.record(SUCCESS)
+    assert policy.stats()["rate"] == pytest.approx(0.25 + RetryPolicy.PACE_STEP)
+    for _ in range(20):
+        policy.record(THROTTLED)
+    assert policy.stats()["rate"] == RetryPolicy.MIN_RATE
+
+def test_paced_sends_are_spaced_by_the_rate():
+    policy = _policy(threshold=10)
+    policy.record(THROTTLED)
+    policy.record(SUCCESS)
+    policy.record(SUCCESS)
+    # 0.5 + 2 * 0.05 = 0.6 requests/second
+    first, second = policy.reserve(), policy.reserve()
+    assert second - first == pytest.approx(1 / 0.6, abs=0.05)
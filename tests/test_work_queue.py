@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from src.runner import Runner
+from src.utils.work_queue import WorkQueue
+
+def _runner(tmp_path, settings: Dict[str, Any]) -> Runner:
+    return Runner(
+        dict(settings, output_path="out.json", queue_backoff_base=0.05, queue_backoff_max=0.1, queue_poll_seconds=0.05),
+        str(tmp_path),
+    )
+
+def _item(queue, username: str):
+    return queue._db.execute(
+        "SELECT state, attempts, last_error FROM items WHERE username = ?", (username,)
+    ).fetchone()
+
+def test_live_failure_is_retried_instead_of_completed_with_mock_rows(tmp_path, live_settings, stub):
+    runner = _runner(tmp_path, live_settings)
+    with runner.open_queue() as queue:
+        queue.enqueue(["natgeo"])
+    stub.error_rate = 1.0
+    assert runner.run_worker("w1", wait=False) == 0
+    with runner.open_queue() as queue:
+        state, attempts, error = _item(queue, "natgeo")
+    assert (state, attempts) == ("pending", 1)
+    assert "FetchError" in error
+    out = runner._worker_output_dir() / "w1.ndjson"
+    assert not out.exists() or out.read_text(encoding="utf-8") == ""
+
+    stub.error_rate = 0.0
+    assert runner.run_worker("w1") == 1
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 40
+
+def test_expired_lease_is_claimed_again_until_attempts_run_out(tmp_path):
+    with WorkQueue(tmp_path / "q.sqlite", lease_seconds=0, max_attempts=2) as queue:
+        queue.enqueue(["natgeo"])
+        # Two workers that die holding the lease use up both attempts
+        assert queue.claim("crashed-1") == ["natgeo"]
+        assert queue.claim("crashed-2") == ["natgeo"]
+        assert queue.claim("w3") == []
+        assert _item(queue, "natgeo")[:2] == ("failed", 2)
+        assert queue.remaining() == 0
+
+def test_collect_skips_a_worker_file_cut_off_mid_row(tmp_path, live_settings):
+    runner = _runner(tmp_path, live_settings)
+    with runner.open_queue() as queue:
+        queue.enqueue(["natgeo"])
+    assert runner.run_worker("w1") == 1
+    out = runner._worker_output_dir() / "w1.ndjson"
+    # The worker died while writing one more row
+    with out.open("a", encoding="utf-8") as f:
+        f.write('{"id": "partial", "username": "nat')
+    assert runner.collect() == 40
+
+    # A restarted worker appends after the last complete row
+    with runner.open_queue() as queue:
+        queue.enqueue(["nasa"])
+    assert runner.run_worker("w1") == 1
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 80 and "partial" not in lines[40]
+
+def test_usernames_differing_only_in_case_are_one_item(tmp_path):
+    with WorkQueue(tmp_path / "q.sqlite") as queue:
+        assert queue.enqueue(["NatGeo", "@natgeo", " natgeo "]) == 1
+        assert queue.claim("w1", limit=5) == ["natgeo"]
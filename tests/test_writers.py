@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from src.runner import Runner
+
+def _run(tmp_path, **settings) -> str:
+    settings = dict({"mock": True, "max_posts_per_profile": 3, "output_path": "out.json"}, **settings)
+    Runner(settings, str(tmp_path)).run(["natgeo"])
+    return (tmp_path / "out.json").read_text(encoding="utf-8")
+
+@pytest.mark.parametrize("indent", [2, 4])
+def test_json_indent_reaches_the_json_writer(tmp_path, indent):
+    text = _run(tmp_path, json_indent=indent)
+    assert text == json.dumps(json.loads(text), indent=indent, ensure_ascii=False)
+
+def test_json_indent_zero_writes_one_compact_line(tmp_path):
+    text = _run(tmp_path, json_indent=0)
+    assert "\n" not in text
+    assert len(json.loads(text)) == 3
+
+@pytest.mark.parametrize("backend", ["stdlib", "orjson"])
+def test_json_backend_reaches_the_json_writer(tmp_path, backend):
+    if backend != "stdlib":
+        pytest.importorskip(backend)
+    runner = Runner({"mock": True, "json_backend": backend}, str(tmp_path))
+    with runner._open_output(tmp_path / "out.json") as writer:
+        assert writer.codec.name == backend